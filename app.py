@@ -1,5 +1,5 @@
 from flask import Flask, render_template, abort, request, jsonify
-from db import get_db, close_db, init_db, log_edit
+from db import get_db, close_db, init_db, log_edit, log_edits
 
 app = Flask(__name__)
 app.teardown_appcontext(close_db)
@@ -33,16 +33,18 @@ def _build_unit(row):
     }
 
 
+def _objective_dict(r):
+    return {"id": r["id"], "bloom": r["bloom"], "bloom_en": r["bloom_en"],
+            "objective": r["objective"], "outcome": r["outcome"]}
+
+
 def _attach_objectives(db, unit_dict, track_id, level_id, unit_id):
     rows = db.execute(
         "SELECT * FROM objectives WHERE track_id=? AND level_id=? AND unit_id=? ORDER BY sort_order",
         (track_id, level_id, unit_id)
     ).fetchall()
-    unit_dict["objectives"] = [
-        {"id": r["id"], "bloom": r["bloom"], "bloom_en": r["bloom_en"],
-         "objective": r["objective"], "outcome": r["outcome"]}
-        for r in rows
-    ]
+    unit_dict["objectives"] = [_objective_dict(r) for r in rows]
+    unit_dict["objective_count"] = len(rows)
 
 
 def _attach_skills(db, unit_dict, track_id, level_id, unit_id):
@@ -54,44 +56,68 @@ def _attach_skills(db, unit_dict, track_id, level_id, unit_id):
     unit_dict["skills_raw"] = [{"id": r["id"], "name": r["name"]} for r in rows]
 
 
-def _get_units_for_level(db, track_id, level_id, full=False):
-    rows = db.execute(
-        "SELECT * FROM units WHERE track_id=? AND level_id=? ORDER BY sort_order",
-        (track_id, level_id)
-    ).fetchall()
-    units = []
-    for r in rows:
+def _get_units(db, track_id, level_id=None, full=False):
+    """{level_id: [unit dict]} for a track (or one level), children loaded in bulk.
+
+    Objectives and skills come from one query each for the whole scope,
+    grouped here, so the query count does not grow with the number of units.
+    ``full`` attaches complete objective/skill rows for the editor; otherwise
+    cards get skill names and an objective count only.
+    """
+    scope, params = "track_id=?", (track_id,)
+    if level_id is not None:
+        scope, params = "track_id=? AND level_id=?", (track_id, level_id)
+
+    by_unit, units = {}, {}
+    for r in db.execute(f"SELECT * FROM units WHERE {scope} ORDER BY sort_order", params):
         u = _build_unit(r)
-        if full:
-            _attach_objectives(db, u, track_id, level_id, r["id"])
-            _attach_skills(db, u, track_id, level_id, r["id"])
-        else:
-            # Lightweight: just counts and skill names for cards
-            _attach_objectives(db, u, track_id, level_id, r["id"])
-            _attach_skills(db, u, track_id, level_id, r["id"])
-        units.append(u)
+        u.update(objectives=[], objective_count=0, skills=[], skills_raw=[])
+        by_unit[(r["level_id"], r["id"])] = u
+        units.setdefault(r["level_id"], []).append(u)
+    if not by_unit:
+        return units
+
+    if full:
+        for r in db.execute(
+            f"SELECT * FROM objectives WHERE {scope} ORDER BY sort_order, id", params
+        ):
+            u = by_unit.get((r["level_id"], r["unit_id"]))
+            if u is not None:
+                u["objectives"].append(_objective_dict(r))
+                u["objective_count"] += 1
+    else:
+        for r in db.execute(
+            f"SELECT level_id, unit_id, COUNT(*) AS n FROM objectives WHERE {scope} "
+            "GROUP BY level_id, unit_id", params
+        ):
+            u = by_unit.get((r["level_id"], r["unit_id"]))
+            if u is not None:
+                u["objective_count"] = r["n"]
+
+    columns = "id, level_id, unit_id, name" if full else "level_id, unit_id, name"
+    for r in db.execute(
+        f"SELECT {columns} FROM skills WHERE {scope} ORDER BY sort_order, id", params
+    ):
+        u = by_unit.get((r["level_id"], r["unit_id"]))
+        if u is not None:
+            u["skills"].append(r["name"])
+            if full:
+                u["skills_raw"].append({"id": r["id"], "name": r["name"]})
     return units
 
 
+def _get_units_for_level(db, track_id, level_id, full=False):
+    return _get_units(db, track_id, level_id, full).get(level_id, [])
+
+
 # ─── Page Routes ─────────────────────────────────────────────────────
 
 @app.route("/")
 def home():
     db = get_db()
+    # The home page only shows track cards; levels and units load on the track page
     track_rows = db.execute("SELECT * FROM tracks ORDER BY sort_order").fetchall()
-    tracks = []
-    for tr in track_rows:
-        t = _build_track(tr)
-        levels = []
-        level_rows = db.execute(
-            "SELECT * FROM levels WHERE track_id=? ORDER BY sort_order", (tr["id"],)
-        ).fetchall()
-        for lr in level_rows:
-            lvl = _build_level(lr)
-            lvl["units"] = _get_units_for_level(db, tr["id"], lr["id"])
-            levels.append(lvl)
-        t["levels"] = levels
-        tracks.append(t)
+    tracks = [_build_track(tr) for tr in track_rows]
     return render_template("home.html", tracks=tracks)
 
 
@@ -105,10 +131,11 @@ def track(track_id):
     level_rows = db.execute(
         "SELECT * FROM levels WHERE track_id=? ORDER BY sort_order", (track_id,)
     ).fetchall()
+    units = _get_units(db, track_id)
     levels = []
     for lr in level_rows:
         lvl = _build_level(lr)
-        lvl["units"] = _get_units_for_level(db, track_id, lr["id"])
+        lvl["units"] = units.get(lr["id"], [])
         levels.append(lvl)
     t["levels"] = levels
     return render_template("track.html", track=t)
@@ -145,7 +172,8 @@ def unit(track_id, level_id, unit_id):
     if not lr:
         abort(404)
     lvl = _build_level(lr)
-    lvl["units"] = _get_units_for_level(db, track_id, level_id, full=True)
+    # Sibling units only feed the prev/next navigation
+    lvl["units"] = _get_units_for_level(db, track_id, level_id)
 
     u_row = db.execute(
         "SELECT * FROM units WHERE track_id=? AND level_id=? AND id=?",
@@ -162,6 +190,11 @@ def unit(track_id, level_id, unit_id):
 
 # ─── API Endpoints ───────────────────────────────────────────────────
 
+def _assignments(fields):
+    # Field names come from the fixed whitelists below, never from the request
+    return ", ".join(f"{f}=?" for f in fields)
+
+
 @app.route("/api/track/<track_id>", methods=["PUT"])
 def api_update_track(track_id):
     db = get_db()
@@ -169,10 +202,13 @@ def api_update_track(track_id):
     if not tr:
         return jsonify({"error": "Track not found"}), 404
     data = request.get_json()
-    for field in ("name_ar", "description_ar"):
-        if field in data:
-            log_edit(db, "tracks", track_id, field, tr[field], data[field])
-            db.execute(f"UPDATE tracks SET {field}=? WHERE id=?", (data[field], track_id))
+    fields = [f for f in ("name_ar", "description_ar") if f in data]
+    if fields:
+        log_edits(db, "tracks", track_id, [(f, tr[f], data[f]) for f in fields])
+        db.execute(
+            f"UPDATE tracks SET {_assignments(fields)} WHERE id=?",
+            [data[f] for f in fields] + [track_id]
+        )
     db.commit()
     return jsonify({"ok": True})
 
@@ -187,13 +223,13 @@ def api_update_level(track_id, level_id):
         return jsonify({"error": "Level not found"}), 404
     data = request.get_json()
     key = f"{track_id}/{level_id}"
-    for field in ("name_ar", "slogan", "goal"):
-        if field in data:
-            log_edit(db, "levels", key, field, lr[field], data[field])
-            db.execute(
-                f"UPDATE levels SET {field}=? WHERE track_id=? AND id=?",
-                (data[field], track_id, level_id)
-            )
+    fields = [f for f in ("name_ar", "slogan", "goal") if f in data]
+    if fields:
+        log_edits(db, "levels", key, [(f, lr[f], data[f]) for f in fields])
+        db.execute(
+            f"UPDATE levels SET {_assignments(fields)} WHERE track_id=? AND id=?",
+            [data[f] for f in fields] + [track_id, level_id]
+        )
     db.commit()
     return jsonify({"ok": True})
 
@@ -209,13 +245,14 @@ def api_update_unit(track_id, level_id, unit_id):
         return jsonify({"error": "Unit not found"}), 404
     data = request.get_json()
     key = f"{track_id}/{level_id}/{unit_id}"
-    for field in ("name", "name_en", "description", "project_name", "project_description"):
-        if field in data:
-            log_edit(db, "units", key, field, u[field], data[field])
-            db.execute(
-                f"UPDATE units SET {field}=? WHERE track_id=? AND level_id=? AND id=?",
-                (data[field], track_id, level_id, unit_id)
-            )
+    fields = [f for f in ("name", "name_en", "description", "project_name", "project_description")
+              if f in data]
+    if fields:
+        log_edits(db, "units", key, [(f, u[f], data[f]) for f in fields])
+        db.execute(
+            f"UPDATE units SET {_assignments(fields)} WHERE track_id=? AND level_id=? AND id=?",
+            [data[f] for f in fields] + [track_id, level_id, unit_id]
+        )
     db.commit()
     return jsonify({"ok": True})
 
@@ -285,10 +322,13 @@ def api_update_objective(obj_id):
     if not obj:
         return jsonify({"error": "Objective not found"}), 404
     data = request.get_json()
-    for field in ("bloom", "bloom_en", "objective", "outcome"):
-        if field in data:
-            log_edit(db, "objectives", str(obj_id), field, obj[field], data[field])
-            db.execute(f"UPDATE objectives SET {field}=? WHERE id=?", (data[field], obj_id))
+    fields = [f for f in ("bloom", "bloom_en", "objective", "outcome") if f in data]
+    if fields:
+        log_edits(db, "objectives", str(obj_id), [(f, obj[f], data[f]) for f in fields])
+        db.execute(
+            f"UPDATE objectives SET {_assignments(fields)} WHERE id=?",
+            [data[f] for f in fields] + [obj_id]
+        )
     db.commit()
     return jsonify({"ok": True})
 
@@ -27,6 +27,9 @@ def create_app(config_name='development'):
     if on_railway:
         config_name = 'production'
 
+    from app.utils.boot import BootTimer
+    timer = BootTimer()
+
     app = Flask(__name__)
     app.config.from_object(config.get(config_name, config['default']))
 
@@ -52,28 +55,39 @@ def create_app(config_name='development'):
     jwt.init_app(app)
     csrf.init_app(app)
     cors.init_app(app)
+    socketio_options = {}
+    if app.config.get('SOCKETIO_TRANSPORTS'):
+        socketio_options['transports'] = app.config['SOCKETIO_TRANSPORTS']
     socketio.init_app(app, cors_allowed_origins='*',
-                      message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'))
+                      message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'),
+                      **socketio_options)
+    if app.config.get('WEB_CONCURRENCY', 1) > 1 and not (
+            app.config.get('SOCKETIO_MESSAGE_QUEUE') and app.config.get('REDIS_URL')):
+        print('[BOOT] WARNING: several workers without Redis; room broadcasts and '
+              'live-room state will not be shared between them')
+
+    timer.mark('extensions')
 
     # Import models so they are registered with SQLAlchemy
     from app import models  # noqa: F401
+    timer.mark('models')
 
     # Ensure journey columns/tables exist before ORM touches them
     with app.app_context():
-        _ensure_journey_schema()
-        db.create_all()
-        try:
-            _auto_seed_if_empty()
-        except Exception as e:
-            db.session.rollback()
-            print(f"[SEED] Skipped seeding (migration pending?): {e}")
+        _prepare_database(app, timer)
 
     # Register blueprints
     _register_blueprints(app)
+    timer.mark('blueprints')
 
     # Register error handlers
     _register_error_handlers(app)
 
+    # Register CLI commands
+    from app.cli import register_commands
+    register_commands(app)
+    timer.mark('cli')
+
     # Context processor: inject voice page key for Arabic encouragement
     VOICE_PAGE_MAP = {
         'student.dashboard': 'dashboard',
@@ -102,34 +116,75 @@ def create_app(config_name='development'):
         from flask_login import current_user
         from app.models.user import Role
         if current_user.is_authenticated and current_user.role == Role.STUDENT:
-            from app.models.gamification import StudentXP, Streak
-            from app.models.journey import StudentWallet
-            wallet = StudentWallet.query.filter_by(student_id=current_user.id).first()
-            total_xp = StudentXP.total_xp(current_user.id)
-            level = StudentXP.current_level(total_xp)
-            streak = Streak.query.filter_by(student_id=current_user.id).first()
-            thresholds = [0, 100, 300, 600, 1000, 1500, 2200, 3000, 4000, 5000,
-                          6500, 8000, 10000, 12500, 15000, 18000, 21000, 25000]
-            current_threshold = thresholds[level - 1] if level <= len(thresholds) else thresholds[-1]
-            next_threshold = thresholds[level] if level < len(thresholds) else thresholds[-1] + 5000
-            xp_progress = ((total_xp - current_threshold) / max(next_threshold - current_threshold, 1)) * 100
+            from app.utils.hud import get_hud
+            hud = get_hud(current_user.id)
             return dict(
-                coins=wallet.coins if wallet else 0,
-                gems=wallet.gems if wallet else 0,
-                g_total_xp=total_xp,
-                total_xp=total_xp,
-                g_level=level,
-                level=level,
-                g_xp_progress=min(xp_progress, 100),
-                xp_progress=min(xp_progress, 100),
-                g_streak=streak,
-                g_next_threshold=next_threshold,
+                coins=hud.coins,
+                gems=hud.gems,
+                g_total_xp=hud.total_xp,
+                total_xp=hud.total_xp,
+                g_level=hud.level,
+                level=hud.level,
+                g_xp_progress=hud.xp_progress,
+                xp_progress=hud.xp_progress,
+                g_streak=hud.streak,
+                g_hud=hud,
+                g_next_threshold=hud.next_threshold,
             )
         return {}
 
+    timer.report()
     return app
 
 
+def _prepare_database(app, timer):
+    """Schema DDL, create_all, seeding and rollup checks — only when the schema changed.
+
+    The fingerprint of the models, migrations and raw DDL below is compared
+    with the one stored by the last successful full check; a match costs one
+    primary-key read instead of dozens of probes and DDL statements.
+    """
+    from app.utils.boot import schema_fingerprint, stored_fingerprint, store_fingerprint
+    fingerprint = schema_fingerprint(_ensure_journey_schema, _XP_SOURCE_INDEXES)
+    if not app.config.get('BOOT_FULL_CHECK') and stored_fingerprint() == fingerprint:
+        timer.mark('schema check (fingerprint match)')
+        return
+
+    ok = _ensure_journey_schema()
+    timer.mark('schema DDL')
+    db.create_all()
+    if not ok:
+        # Fresh database: the tables the DDL alters exist only now
+        ok = _ensure_journey_schema()
+    timer.mark('create_all')
+    try:
+        _auto_seed_if_empty()
+    except Exception as e:
+        ok = False
+        db.session.rollback()
+        print(f"[SEED] Skipped seeding (migration pending?): {e}")
+    timer.mark('seed check')
+    try:
+        from app.utils.xp_rollup import ensure_xp_rollups
+        ensure_xp_rollups()
+    except Exception as e:
+        ok = False
+        db.session.rollback()
+        print(f"[ROLLUP] Could not build daily XP buckets: {e}")
+    timer.mark('rollups')
+
+    if ok:
+        store_fingerprint(fingerprint)
+        print(f"[SCHEMA] Fingerprint {fingerprint[:12]} stored; next boots skip these checks")
+
+
+_XP_SOURCE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_student_xp_student_track ON student_xp (student_id, track_id)",
+    "CREATE INDEX IF NOT EXISTS ix_student_xp_student_source ON student_xp (student_id, source_type)",
+    "CREATE INDEX IF NOT EXISTS ix_student_xp_session_id ON student_xp (session_id)",
+]
+
+
 def _ensure_journey_schema():
     """Add journey columns/tables directly via SQL so the ORM doesn't crash on old DBs."""
     from sqlalchemy import text
@@ -138,6 +193,10 @@ def _ensure_journey_schema():
         dialect = db.engine.dialect.name
 
         if dialect == 'postgresql':
+            had_xp_sources = conn.execute(text(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_name = 'student_xp' AND column_name = 'source_type'"
+            )).first() is not None
             # Add columns to existing tables
             for sql in [
                 "ALTER TABLE users ADD COLUMN IF NOT EXISTS bio TEXT",
@@ -150,9 +209,18 @@ def _ensure_journey_schema():
                 "ALTER TABLE lesson_contents ADD COLUMN IF NOT EXISTS pdf_file VARCHAR(300)",
                 "ALTER TABLE lesson_contents ADD COLUMN IF NOT EXISTS video_url VARCHAR(500)",
                 "ALTER TABLE lesson_contents ADD COLUMN IF NOT EXISTS activity_url VARCHAR(500)",
-            ]:
+                "ALTER TABLE student_xp ADD COLUMN IF NOT EXISTS source_type VARCHAR(20)",
+                "ALTER TABLE student_xp ADD COLUMN IF NOT EXISTS track_id VARCHAR(50)",
+                "ALTER TABLE student_xp ADD COLUMN IF NOT EXISTS level_id VARCHAR(50)",
+                "ALTER TABLE student_xp ADD COLUMN IF NOT EXISTS unit_id VARCHAR(50)",
+                "ALTER TABLE student_xp ADD COLUMN IF NOT EXISTS quest_id INTEGER",
+                "ALTER TABLE student_xp ADD COLUMN IF NOT EXISTS activity_id INTEGER",
+            ] + _XP_SOURCE_INDEXES:
                 conn.execute(text(sql))
-            conn.execute(text("COMMIT"))
+            if not had_xp_sources:
+                from app.utils.xp_sources import backfill_xp_sources
+                print(f"[SCHEMA] Backfilled XP sources ({backfill_xp_sources(conn)} updates)")
+            conn.commit()
             print("[SCHEMA] Journey columns ensured on PostgreSQL")
         else:
             # SQLite: check if columns exist first
@@ -185,18 +253,33 @@ def _ensure_journey_schema():
                 conn.execute(text("ALTER TABLE lesson_contents ADD COLUMN video_url VARCHAR(500)"))
             if 'activity_url' not in existing_lc:
                 conn.execute(text("ALTER TABLE lesson_contents ADD COLUMN activity_url VARCHAR(500)"))
-            conn.execute(text("COMMIT"))
+            # student_xp structured source columns
+            result_xp = conn.execute(text("PRAGMA table_info(student_xp)"))
+            existing_xp = {row[1] for row in result_xp}
+            for col, col_type in [('source_type', 'VARCHAR(20)'), ('track_id', 'VARCHAR(50)'),
+                                  ('level_id', 'VARCHAR(50)'), ('unit_id', 'VARCHAR(50)'),
+                                  ('quest_id', 'INTEGER'), ('activity_id', 'INTEGER')]:
+                if existing_xp and col not in existing_xp:
+                    conn.execute(text(f"ALTER TABLE student_xp ADD COLUMN {col} {col_type}"))
+            if existing_xp:
+                for sql in _XP_SOURCE_INDEXES:
+                    conn.execute(text(sql))
+            if existing_xp and 'source_type' not in existing_xp:
+                from app.utils.xp_sources import backfill_xp_sources
+                print(f"[SCHEMA] Backfilled XP sources ({backfill_xp_sources(conn)} updates)")
+            conn.commit()
             print("[SCHEMA] Journey columns ensured on SQLite")
 
         conn.close()
+        return True
     except Exception as e:
         print(f"[SCHEMA] Could not ensure journey columns: {e}")
+        return False
 
 
 def _auto_seed_if_empty():
     """Auto-seed the database on first deploy when tables are empty."""
     from app.models.user import User, Role
-    from app.models.curriculum import Track, Level, Unit, Objective, Skill
     from app.models.gamification import Badge, BadgeCriteria
     from app.models.classroom import Group, GroupStudent, Session, SessionStatus
     from app.models.resource import Resource, ResourceType
@@ -210,54 +293,13 @@ def _auto_seed_if_empty():
     print("[SEED] Empty database detected — seeding all data...")
 
     # --- 1. Curriculum ---
+    units = []
     try:
-        from data.coding_verse import CODING_VERSE
-        from data.computer_basics import COMPUTER_BASICS
-        from data.digital_safety import DIGITAL_SAFETY
-        from data.data_verse import DATA_VERSE
-
-        tracks_data = [CODING_VERSE, COMPUTER_BASICS, DIGITAL_SAFETY, DATA_VERSE]
-        for t_order, td in enumerate(tracks_data):
-            t = Track(
-                id=td['id'], name=td['name'], name_ar=td['name_ar'],
-                icon=td['icon'], color=td['color'],
-                description_ar=td.get('description_ar', td.get('description', '')),
-                sort_order=t_order,
-            )
-            db.session.add(t)
-            for l_order, ld in enumerate(td['levels']):
-                lvl = Level(
-                    id=ld['id'], track_id=td['id'],
-                    name=ld['name'], name_ar=ld['name_ar'],
-                    icon=ld['icon'], slogan=ld['slogan'],
-                    goal=ld['goal'], sort_order=l_order,
-                )
-                db.session.add(lvl)
-                for u_order, ud in enumerate(ld['units']):
-                    project = ud.get('project', {})
-                    u = Unit(
-                        id=ud['id'], level_id=ld['id'], track_id=td['id'],
-                        name=ud['name'], name_en=ud['name_en'],
-                        description=ud['description'],
-                        project_name=project.get('name', ''),
-                        project_description=project.get('description', ''),
-                        sort_order=u_order,
-                    )
-                    db.session.add(u)
-                    for o_order, od in enumerate(ud.get('objectives', [])):
-                        db.session.add(Objective(
-                            track_id=td['id'], level_id=ld['id'], unit_id=ud['id'],
-                            bloom=od['bloom'], bloom_en=od['bloom_en'],
-                            objective=od['objective'], outcome=od['outcome'],
-                            sort_order=o_order,
-                        ))
-                    for s_order, skill_name in enumerate(ud.get('skills', [])):
-                        db.session.add(Skill(
-                            track_id=td['id'], level_id=ld['id'], unit_id=ud['id'],
-                            name=skill_name, sort_order=s_order,
-                        ))
+        from app.utils.seeding import seed_curriculum
+        rows = seed_curriculum()
         db.session.commit()
-        print(f"[SEED] Curriculum: {len(tracks_data)} tracks seeded")
+        units = rows['units']
+        print(f"[SEED] Curriculum: {len(rows['tracks'])} tracks, {len(units)} units seeded")
     except Exception as e:
         db.session.rollback()
         print(f"[SEED] Curriculum error: {e}")
@@ -320,9 +362,15 @@ def _auto_seed_if_empty():
         ('parent1@shalaby-verse.com', 'والد أحمد', "Ahmed's Parent", Role.PARENT),
         ('assessor@shalaby-verse.com', 'د. أمل', 'Dr. Amal', Role.ASSESSOR),
     ]
+    demo_hash = None
     for email, name_ar, name_en, role in demo_users_data:
         u = User(email=email, name_ar=name_ar, name_en=name_en, role=role)
-        u.set_password('demo123')
+        # Demo accounts share one password: hash it once, not once per user
+        if demo_hash is None:
+            u.set_password('demo123')
+            demo_hash = u.password_hash
+        else:
+            u.password_hash = demo_hash
         db.session.add(u)
     db.session.commit()
     print("[SEED] Demo users: 7 created (password: demo123)")
@@ -378,19 +426,23 @@ def _auto_seed_if_empty():
     print(f"[SEED] Classroom: group '{group.name}', 2 sessions, 4 resources")
 
     # --- 6. Journey / Gamification Seed Data ---
-    _seed_journey_data()
+    _seed_journey_data(units)
     print("[SEED] All seeding complete!")
 
 
-def _seed_journey_data():
-    """Seed journey models: daily rewards, wallets, quests, activities, milestones."""
+def _seed_journey_data(units):
+    """Seed journey models: daily rewards, wallets, quests, activities, milestones.
+
+    ``units`` are the unit rows just seeded, in curriculum order; unit
+    activities and demo progress are built from them without re-querying.
+    """
     from app.models.user import User, Role
     from app.models.journey import (
-        DailyReward, RewardType, StudentWallet, Quest, QuestDifficulty, QuestCategory,
+        DailyReward, RewardType, Quest, QuestDifficulty, QuestCategory,
         Activity, ActivityType, ActivitySource, JourneyMilestone, MilestoneType,
         StudentUnitProgress,
     )
-    from app.models.curriculum import Track, Level, Unit
+    from app.models.curriculum import Track
 
     # Daily Rewards (5-day cycle)
     daily_rewards = [
@@ -409,10 +461,10 @@ def _seed_journey_data():
         db.session.add(dr)
 
     # Student Wallets (welcome bonus for demo students)
+    from app.utils.wallet import credit
     students = User.query.filter_by(role=Role.STUDENT).all()
     for s in students:
-        wallet = StudentWallet(student_id=s.id, coins=50, gems=2)
-        db.session.add(wallet)
+        credit(s.id, coins=50, gems=2, reason='مكافأة ترحيبية')
         # "Joined" milestone
         db.session.add(JourneyMilestone(
             student_id=s.id, milestone_type=MilestoneType.JOINED,
@@ -471,49 +523,26 @@ def _seed_journey_data():
         ))
 
     # Per-unit activities for all tracks (2-3 per unit)
-    activity_templates = [
-        (ActivityType.CODING, 'تمرين برمجي', 'Coding Exercise', 20, 10),
-        (ActivityType.QUIZ, 'اختبار قصير', 'Quick Quiz', 15, 8),
-        (ActivityType.GAME, 'لعبة تفاعلية', 'Interactive Game', 25, 12),
-    ]
-    all_tracks = Track.query.all()
-    act_sort = 100
-    for t in all_tracks:
-        units = Unit.query.filter_by(track_id=t.id).order_by(Unit.level_id, Unit.sort_order).all()
-        for unit in units:
-            for j, (atype, ar_label, en_label, xp, coins) in enumerate(activity_templates):
-                # Alternate: 2 or 3 activities per unit
-                if j == 2 and hash(unit.id) % 3 == 0:
-                    continue
-                db.session.add(Activity(
-                    title=f'{en_label}: {unit.name_en or unit.name}',
-                    title_ar=f'{ar_label}: {unit.name}',
-                    activity_type=atype,
-                    source=ActivitySource.SELF_PACED,
-                    difficulty=QuestDifficulty.BEGINNER,
-                    xp_reward=xp, coin_reward=coins,
-                    track_id=t.id, level_id=unit.level_id, unit_id=unit.id,
-                    estimated_minutes=10, sort_order=act_sort,
-                ))
-                act_sort += 1
+    from app.utils.seeding import seed_unit_activities
+    seed_unit_activities(units)
 
     # Student Unit Progress for demo students (adventure map backbone)
-    if coding_track:
-        units = Unit.query.filter_by(track_id=coding_track.id).order_by(
-            Unit.level_id, Unit.sort_order
-        ).all()
-        for s in students:
-            for idx, unit in enumerate(units[:6]):  # first 6 units
-                if idx < 2:
-                    status = 'completed'
-                elif idx == 2:
-                    status = 'current'
-                else:
-                    status = 'locked'
-                db.session.add(StudentUnitProgress(
-                    student_id=s.id, track_id=unit.track_id,
-                    level_id=unit.level_id, unit_id=unit.id, status=status,
-                ))
+    coding_units = [u for u in units if u['track_id'] == 'coding-verse'][:6]  # first 6 units
+    progress_rows = []
+    for s in students:
+        for idx, unit in enumerate(coding_units):
+            if idx < 2:
+                status = 'completed'
+            elif idx == 2:
+                status = 'current'
+            else:
+                status = 'locked'
+            progress_rows.append(dict(
+                student_id=s.id, track_id=unit['track_id'],
+                level_id=unit['level_id'], unit_id=unit['id'], status=status,
+            ))
+    if progress_rows:
+        db.session.execute(db.insert(StudentUnitProgress), progress_rows)
 
     db.session.commit()
     print("[SEED] Journey: daily rewards, wallets, quests, activities, milestones seeded")
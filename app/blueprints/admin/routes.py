@@ -11,6 +11,8 @@ from app.models.gamification import StudentXP
 from app.models.journey import Activity, ActivityType, ActivitySource, QuestDifficulty, LessonContent
 from app.utils.decorators import admin_required
 from app.utils.helpers import paginate, safe_int
+from app.utils.track_progress import unit_lesson_count
+from app.utils.curriculum_cache import get_curriculum
 from app.utils.uploads import (save_upload, get_upload_url, delete_upload,
                                 ALLOWED_DOCUMENTS, ALLOWED_IMAGES, ALLOWED_ALL)
 from datetime import datetime
@@ -663,10 +665,10 @@ def activity_delete(activity_id):
 @admin_required
 def api_levels(track_id):
     """Return levels and units for a given track (used by activity form cascading selects)."""
-    levels = Level.query.filter_by(track_id=track_id).order_by(Level.sort_order).all()
+    curriculum = get_curriculum()
     result = []
-    for lvl in levels:
-        units = Unit.query.filter_by(track_id=track_id, level_id=lvl.id).order_by(Unit.sort_order).all()
+    for lvl in curriculum.levels(track_id):
+        units = curriculum.level_units(track_id, lvl.id)
         result.append({
             'id': lvl.id,
             'name_ar': lvl.name_ar,
@@ -703,19 +705,15 @@ def settings():
 @bp.route('/library')
 @admin_required
 def library():
-    tracks = Track.query.order_by(Track.sort_order).all()
+    curriculum = get_curriculum()
     track_data = []
-    for track in tracks:
-        levels = Level.query.filter_by(track_id=track.id).order_by(Level.sort_order).all()
+    for track in curriculum.tracks:
         level_data = []
-        for level in levels:
-            units = Unit.query.filter_by(track_id=track.id, level_id=level.id).order_by(Unit.sort_order).all()
-            unit_data = []
-            for unit in units:
-                lesson_count = LessonContent.query.filter_by(
-                    track_id=track.id, level_id=level.id, unit_id=unit.id
-                ).count()
-                unit_data.append({'unit': unit, 'lesson_count': lesson_count})
+        for level in curriculum.levels(track.id):
+            unit_data = [
+                {'unit': unit, 'lesson_count': unit_lesson_count(track.id, level.id, unit.id)}
+                for unit in curriculum.level_units(track.id, level.id)
+            ]
             level_data.append({'level': level, 'units': unit_data})
         track_data.append({'track': track, 'levels': level_data})
     return render_template('admin/library.html', track_data=track_data)
@@ -4,12 +4,15 @@ from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.blueprints.api import bp
 from app.extensions import db
 from app.models.user import User, Role
-from app.models.gamification import StudentXP, Badge, Streak, StudentBadge
+from app.models.gamification import Badge, Streak, StudentBadge, XPSource
 from app.models.notification import Notification
-from app.models.classroom import Session, SessionStatus, Group
+from app.models.classroom import Session, SessionStatus, Group, GroupStudent
 from app.models.resource import Resource, ResourceFile, FileType
 from app.models.homework import Homework, HomeworkSubmission
 from app.utils.helpers import safe_int
+from app.utils.gamification_service import add_xp, check_and_award_badges
+from app.utils.badge_engine import BadgeEvent
+from app.utils.student_stats import get_student_stats
 from datetime import datetime, timezone
 
 
@@ -19,8 +22,9 @@ def me():
     total_xp = 0
     level = 1
     if current_user.role == Role.STUDENT:
-        total_xp = StudentXP.total_xp(current_user.id)
-        level = StudentXP.current_level(total_xp)
+        stats = get_student_stats(current_user.id)
+        total_xp = stats.total_xp
+        level = stats.level
     return jsonify({
         'id': current_user.id,
         'email': current_user.email,
@@ -91,17 +95,61 @@ def award_xp():
     if not student_id or amount <= 0:
         return jsonify({'error': 'Invalid data'}), 400
 
-    xp = StudentXP(student_id=student_id, amount=amount, reason=reason,
-                    session_id=session_id)
-    db.session.add(xp)
+    add_xp(student_id, amount, reason, source=XPSource.MANUAL, session_id=session_id)
     db.session.commit()
+    check_and_award_badges(student_id, BadgeEvent.XP_EARNED)
 
-    total = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(total)
+    stats = get_student_stats(student_id)
+    total, level = stats.total_xp, stats.level
 
     return jsonify({'ok': True, 'total_xp': total, 'level': level})
 
 
+@bp.route('/xp/daily')
+@login_required
+def xp_daily():
+    """Daily XP buckets for charts: ?student_id=&days=30 or ?start=YYYY-MM-DD&end=YYYY-MM-DD."""
+    from datetime import date, timedelta
+    from app.utils.xp_rollup import daily_xp, today
+
+    student_id = safe_int(request.args.get('student_id'), default=None) or current_user.id
+    if student_id != current_user.id:
+        if current_user.role == Role.ADMIN:
+            allowed = True
+        elif current_user.role == Role.TEACHER:
+            # Only students in one of the teacher's own groups
+            allowed = GroupStudent.query.join(Group).filter(
+                Group.teacher_id == current_user.id,
+                GroupStudent.student_id == student_id,
+            ).first() is not None
+        else:
+            allowed = (current_user.role == Role.PARENT
+                       and current_user.children.filter_by(id=student_id).first() is not None)
+        if not allowed:
+            return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else today()
+        if request.args.get('start'):
+            start = date.fromisoformat(request.args['start'])
+        else:
+            days = min(max(safe_int(request.args.get('days'), default=30), 1), 366)
+            start = end - timedelta(days=days - 1)
+    except ValueError:
+        return jsonify({'error': 'Invalid date'}), 400
+    if start > end or (end - start).days > 366:
+        return jsonify({'error': 'Invalid range'}), 400
+
+    series = daily_xp(student_id, start, end)
+    return jsonify({
+        'student_id': student_id,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'total': sum(xp for _, xp in series),
+        'days': [{'day': day.isoformat(), 'xp': xp} for day, xp in series],
+    })
+
+
 @bp.route('/session/<int:session_id>/start', methods=['POST'])
 @login_required
 def start_session(session_id):
@@ -139,34 +187,11 @@ def end_session(session_id):
     if not session:
         return jsonify({'error': 'Session not found'}), 404
 
-    session.status = SessionStatus.COMPLETED
-    db.session.commit()
+    from app.utils.session_finalizer import finalize_session, FINALIZE_QUEUED
+    finalized = finalize_session(session_id)
 
-    # Award XP to attending students
-    from app.models.classroom import Attendance, AttendanceStatus
-    from app.utils.wallet import get_or_create_wallet
-    from app.utils.gamification_service import update_student_streak, check_and_award_badges
-    attendees = Attendance.query.filter_by(
-        session_id=session_id, status=AttendanceStatus.PRESENT
-    ).all()
-    for att in attendees:
-        xp = StudentXP(student_id=att.student_id, amount=50,
-                        reason='حضور جلسة', session_id=session_id)
-        db.session.add(xp)
-        # Award coins for session attendance
-        wallet = get_or_create_wallet(att.student_id)
-        wallet.coins += 10
-    db.session.commit()
-
-    # Update streaks and badges for attendees
-    for att in attendees:
-        try:
-            update_student_streak(att.student_id)
-            check_and_award_badges(att.student_id)
-        except Exception:
-            pass
-
-    return jsonify({'ok': True})
+    return jsonify({'ok': True, 'already_completed': not finalized,
+                    'rewards_queued': finalized == FINALIZE_QUEUED})
 
 
 # ─────────────────────────────────────────────────────────────────────
@@ -269,8 +294,7 @@ def teacher_award_xp():
     if not student or student.role != Role.STUDENT:
         return jsonify({'error': 'Student not found'}), 404
 
-    xp = StudentXP(student_id=student_id, amount=amount, reason=reason)
-    db.session.add(xp)
+    add_xp(student_id, amount, reason, source=XPSource.MANUAL)
 
     # Create notification for the student
     try:
@@ -286,9 +310,10 @@ def teacher_award_xp():
         pass  # Notification is optional
 
     db.session.commit()
+    check_and_award_badges(student_id, BadgeEvent.XP_EARNED)
 
-    total = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(total)
+    stats = get_student_stats(student_id)
+    total, level = stats.total_xp, stats.level
 
     return jsonify({'ok': True, 'total_xp': total, 'level': level})
 
@@ -323,19 +348,20 @@ def teacher_grade_submission():
     # Award XP and coins based on grade
     if grade >= 50:
         xp_amount = 10 + (grade // 10) * 5  # 10-60 XP based on grade
-        xp = StudentXP(
-            student_id=submission.student_id,
-            amount=xp_amount,
-            reason=f'تقييم واجب: {submission.homework.title}',
-        )
-        db.session.add(xp)
+        add_xp(submission.student_id, xp_amount,
+               f'تقييم واجب: {submission.homework.title}',
+               source=XPSource.HOMEWORK, session_id=submission.homework.session_id,
+               track_id=submission.homework.group.track_id)
         # Award coins based on grade tier
-        from app.utils.wallet import get_or_create_wallet
+        from app.utils.wallet import credit
         coin_amount = 5 + (grade // 20) * 5  # 5-30 coins
-        wallet = get_or_create_wallet(submission.student_id)
-        wallet.coins += coin_amount
+        credit(submission.student_id, coins=coin_amount,
+               reason=f'تقييم واجب: {submission.homework.title}')
         db.session.commit()
 
+    check_and_award_badges(submission.student_id, BadgeEvent.ASSIGNMENT_GRADED,
+                           BadgeEvent.XP_EARNED)
+
     return jsonify({'ok': True, 'grade': grade, 'feedback': feedback})
 
 
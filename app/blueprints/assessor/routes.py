@@ -5,9 +5,9 @@ from app.extensions import db
 from app.models.user import User, Role
 from app.models.assessment import Assessment, AssessmentReport, AssessmentStatus
 from app.models.curriculum import Track
-from app.models.gamification import StudentXP
 from app.utils.decorators import assessor_required
 from app.utils.helpers import paginate, safe_int
+from app.utils.student_stats import get_student_stats
 from datetime import datetime, timezone
 
 
@@ -102,8 +102,8 @@ def student_profile(student_id):
     if not student or student.role != Role.STUDENT:
         flash('الطالب غير موجود', 'error')
         return redirect(url_for('assessor.dashboard'))
-    total_xp = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(total_xp)
+    stats = get_student_stats(student_id)
+    total_xp, level = stats.total_xp, stats.level
     assessment_history = Assessment.query.filter_by(student_id=student_id).order_by(
         Assessment.scheduled_at.desc()
     ).all()
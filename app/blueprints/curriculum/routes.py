@@ -2,69 +2,78 @@ from flask import render_template, abort, request, jsonify
 from app.blueprints.curriculum import bp
 from app.extensions import db
 from app.models.curriculum import Track, Level, Unit, Objective, Skill
+from app.utils.unit_progress import backfill_unit_progress
+from app.utils.curriculum_cache import get_curriculum
+from app.utils.curriculum_json import curriculum_payload, payload_response
 
 
 @bp.route('/')
 def home():
-    tracks = Track.query.order_by(Track.sort_order).all()
-    tracks_data = []
-    for t in tracks:
-        td = _track_dict(t)
-        td['levels'] = []
-        for lvl in t.levels.all():
-            ld = _level_dict(lvl)
-            ld['units'] = [_unit_dict_full(u) for u in lvl.units.all()]
-            td['levels'].append(ld)
-        tracks_data.append(td)
+    curriculum = get_curriculum()
+    tracks_data = [_track_tree(curriculum, t) for t in curriculum.tracks]
     return render_template('curriculum/home.html', tracks=tracks_data)
 
 
 @bp.route('/track/<track_id>')
 def track(track_id):
-    t = db.session.get(Track, track_id)
+    curriculum = get_curriculum()
+    t = curriculum.track(track_id)
     if not t:
         abort(404)
-    td = _track_dict(t)
-    td['levels'] = []
-    for lvl in t.levels.all():
-        ld = _level_dict(lvl)
-        ld['units'] = [_unit_dict_full(u) for u in lvl.units.all()]
-        td['levels'].append(ld)
-    return render_template('curriculum/track.html', track=td)
+    return render_template('curriculum/track.html', track=_track_tree(curriculum, t))
 
 
 @bp.route('/track/<track_id>/level/<level_id>')
 def level(track_id, level_id):
-    t = db.session.get(Track, track_id)
+    curriculum = get_curriculum()
+    t = curriculum.track(track_id)
     if not t:
         abort(404)
     td = _track_dict(t)
-    lvl = Level.query.filter_by(track_id=track_id, id=level_id).first()
+    lvl = curriculum.level(track_id, level_id)
     if not lvl:
         abort(404)
-    ld = _level_dict(lvl)
-    ld['units'] = [_unit_dict_full(u) for u in lvl.units.all()]
+    ld = _level_tree(curriculum, lvl)
     return render_template('curriculum/level.html', track=td, level=ld)
 
 
 @bp.route('/track/<track_id>/level/<level_id>/unit/<unit_id>')
 def unit(track_id, level_id, unit_id):
-    t = db.session.get(Track, track_id)
+    curriculum = get_curriculum()
+    t = curriculum.track(track_id)
     if not t:
         abort(404)
     td = _track_dict(t)
-    lvl = Level.query.filter_by(track_id=track_id, id=level_id).first()
+    lvl = curriculum.level(track_id, level_id)
     if not lvl:
         abort(404)
-    ld = _level_dict(lvl)
-    ld['units'] = [_unit_dict_full(u) for u in lvl.units.all()]
-    u = Unit.query.filter_by(track_id=track_id, level_id=level_id, id=unit_id).first()
+    ld = _level_tree(curriculum, lvl)
+    u = curriculum.unit(track_id, level_id, unit_id)
     if not u:
         abort(404)
     ud = _unit_dict_full(u)
     return render_template('curriculum/unit.html', track=td, level=ld, unit=ud)
 
 
+# === Read-only JSON (front-end editors and student maps) ===
+
+@bp.route('/api/curriculum')
+def api_curriculum():
+    payload = curriculum_payload('*', lambda curriculum: {
+        'tracks': [_track_tree(curriculum, t) for t in curriculum.tracks],
+    })
+    return payload_response(payload)
+
+
+@bp.route('/api/curriculum/<track_id>')
+def api_curriculum_track(track_id):
+    t = get_curriculum().track(track_id)
+    if not t:
+        return jsonify({'error': 'Track not found'}), 404
+    payload = curriculum_payload(track_id, lambda curriculum: _track_tree(curriculum, t))
+    return payload_response(payload)
+
+
 # === API endpoints for inline editing (migrated from old app.py) ===
 
 @bp.route('/api/track/<track_id>', methods=['PUT'])
@@ -125,6 +134,9 @@ def api_add_unit():
         sort_order=max_order + 1,
     )
     db.session.add(u)
+    db.session.flush()
+    # Students already on this track get the new unit now, not on their next map visit
+    backfill_unit_progress(track_id)
     db.session.commit()
     return jsonify({'ok': True, 'unit_id': unit_id})
 
@@ -228,8 +240,20 @@ def _unit_dict_full(u):
         'objectives': [
             {'id': o.id, 'bloom': o.bloom, 'bloom_en': o.bloom_en,
              'objective': o.objective, 'outcome': o.outcome}
-            for o in u.objectives.all()
+            for o in u.objectives
         ],
-        'skills': [s.name for s in u.skills.all()],
-        'skills_raw': [{'id': s.id, 'name': s.name} for s in u.skills.all()],
+        'skills': [s.name for s in u.skills],
+        'skills_raw': [{'id': s.id, 'name': s.name} for s in u.skills],
     }
+
+
+def _level_tree(curriculum, lvl):
+    ld = _level_dict(lvl)
+    ld['units'] = [_unit_dict_full(u) for u in curriculum.level_units(lvl.track_id, lvl.id)]
+    return ld
+
+
+def _track_tree(curriculum, t):
+    td = _track_dict(t)
+    td['levels'] = [_level_tree(curriculum, lvl) for lvl in curriculum.levels(t.id)]
+    return td
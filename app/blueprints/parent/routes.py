@@ -5,9 +5,11 @@ from app.extensions import db
 from app.models.user import User, Role
 from app.models.classroom import Attendance, Session, SessionStatus, GroupStudent
 from app.models.homework import HomeworkSubmission, Homework
-from app.models.gamification import StudentXP, Streak
+from app.models.gamification import StudentXP, Streak, StudentStats
 from app.models.assessment import Assessment
 from app.utils.decorators import parent_required
+from app.utils.student_stats import get_student_stats
+from app.utils.xp_rollup import xp_between, weekly_xp, recent_daily_xp, week_start
 
 
 @bp.route('/')
@@ -15,9 +17,13 @@ from app.utils.decorators import parent_required
 def dashboard():
     children = current_user.children.all()
     children_data = {}
+    stats_by_child = {s.student_id: s for s in StudentStats.query.filter(
+        StudentStats.student_id.in_([c.id for c in children])).all()} if children else {}
+    week_xp = xp_between([c.id for c in children], week_start()) if children else {}
     for child in children:
-        total_xp = StudentXP.total_xp(child.id)
-        level = StudentXP.current_level(total_xp)
+        stats = stats_by_child.get(child.id) or get_student_stats(child.id)
+        total_xp = stats.total_xp
+        level = stats.level
         streak = Streak.query.filter_by(student_id=child.id).first()
         group_ids = [gs.group_id for gs in GroupStudent.query.filter_by(student_id=child.id).all()]
         upcoming_count = Session.query.filter(
@@ -29,6 +35,7 @@ def dashboard():
             'level': level,
             'level_title': StudentXP.level_title(level),
             'streak': streak.current_streak if streak else 0,
+            'week_xp': week_xp.get(child.id, 0),
             'upcoming_sessions_count': upcoming_count,
         }
     return render_template('parent/dashboard.html', children=children, children_data=children_data)
@@ -49,8 +56,9 @@ def child_detail(child_id):
         flash('لا يمكنك الوصول إلى هذا الطالب', 'error')
         return redirect(url_for('parent.dashboard'))
 
-    xp_total = StudentXP.total_xp(child.id)
-    level = StudentXP.current_level(xp_total)
+    stats = get_student_stats(child.id)
+    xp_total = stats.total_xp
+    level = stats.level
     level_title_ar, _ = StudentXP.level_title(level)
     streak_obj = Streak.query.filter_by(student_id=child.id).first()
     streak = streak_obj.current_streak if streak_obj else 0
@@ -73,7 +81,8 @@ def child_detail(child_id):
 
     # Badges
     from app.models.gamification import StudentBadge, Badge
-    badge_ids = [sb.badge_id for sb in StudentBadge.query.filter_by(student_id=child.id).all()]
+    badge_ids = [bid for (bid,) in db.session.query(StudentBadge.c.badge_id).filter(
+        StudentBadge.c.student_id == child.id)]
     badges = Badge.query.filter(Badge.id.in_(badge_ids)).all() if badge_ids else []
 
     return render_template('parent/child_detail.html',
@@ -98,8 +107,14 @@ def child_reports(child_id):
     ).all()
     from app.models.assessment import AssessmentReport
     assessment_reports = [a.report for a in assessments if a.report]
+
+    # XP trend from the daily rollup: 8 weekly and 30 daily buckets
+    xp_weeks = weekly_xp(child.id, 8)
+    xp_days = recent_daily_xp(child.id, 30)
     return render_template('parent/child_reports.html', child=child,
                            assessment_reports=assessment_reports,
+                           xp_weeks=xp_weeks, xp_days=xp_days,
+                           xp_weeks_max=max([xp for _, xp in xp_weeks] + [1]),
                            session_reports=[])
 
 
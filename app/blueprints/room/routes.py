@@ -6,21 +6,11 @@ from flask import render_template, jsonify, request
 from flask_login import current_user, login_required
 from app.blueprints.room import bp
 from app.extensions import db, socketio, csrf
-from app.models.classroom import Session, SessionStatus, Attendance, AttendanceStatus, SessionResource
+from app.models.classroom import Session, SessionStatus, SessionResource
 from app.models.resource import Resource, ResourceType, ResourceFile, FileType
 from app.models.user import Role
-from app.models.gamification import StudentXP, Streak
+from app.utils import room_activities, room_attendance, room_outbox, room_state, room_sync
 from flask_socketio import emit, join_room, leave_room
-from datetime import datetime, timezone
-
-# Track current slide state per session: session_id -> {resource_id, slide_index}
-_session_slide_state = {}
-
-# Track whiteboard state per session: session_id -> {url}
-_session_whiteboard_state = {}
-
-# Track video state per session: session_id -> {youtube_url, current_time, is_playing}
-_session_video_state = {}
 
 
 @bp.route('/<int:session_id>')
@@ -188,10 +178,7 @@ def upload_slides(session_id):
     db.session.commit()
 
     # Update slide state
-    _session_slide_state[session_id] = {
-        'resource_id': resource.id,
-        'slide_index': 0,
-    }
+    room_state.set_slide(session_id, 0, resource.id)
 
     # Broadcast to all users in the room
     socketio.emit('resource_switch', {
@@ -219,13 +206,22 @@ def upload_slides(session_id):
 @login_required
 def current_slide(session_id):
     """Return the current slide index for late joiners."""
-    state = _session_slide_state.get(session_id, {})
+    state = room_state.get_slide(session_id) or {}
     return jsonify({
         'resource_id': state.get('resource_id'),
         'slide_index': state.get('slide_index', 0),
     })
 
 
+@bp.route('/<int:session_id>/outbox-stats')
+@login_required
+def outbox_stats(session_id):
+    """Room broadcast counters: events received vs frames actually emitted."""
+    if current_user.role not in (Role.TEACHER, Role.ADMIN):
+        return jsonify({'error': 'Unauthorized'}), 403
+    return jsonify(room_outbox.room_stats(session_id))
+
+
 @bp.route('/<int:session_id>/start-whiteboard', methods=['POST'])
 @login_required
 def start_whiteboard(session_id):
@@ -239,16 +235,14 @@ def start_whiteboard(session_id):
         return jsonify({'error': 'Session not found'}), 404
 
     # Reuse existing whiteboard if already active
-    existing = _session_whiteboard_state.get(session_id)
+    existing = room_state.get_whiteboard(session_id)
     if existing and existing.get('url'):
         return jsonify({'ok': True, 'url': existing['url']})
 
     # Generate WBO collaborative whiteboard URL (auto-creates room on visit)
     import secrets
     board_id = f'verse-{session_id}-{secrets.token_hex(4)}'
-    url = f'https://wbo.ophir.dev/boards/{board_id}'
-
-    _session_whiteboard_state[session_id] = {'url': url}
+    url = room_state.claim_whiteboard(session_id, f'https://wbo.ophir.dev/boards/{board_id}')
 
     return jsonify({'ok': True, 'url': url})
 
@@ -260,30 +254,9 @@ def handle_join(data):
     session_id = data.get('session_id')
     join_room(f'session_{session_id}')
 
-    # Record attendance for students
-    if current_user.is_authenticated and current_user.role == Role.STUDENT:
-        att = Attendance.query.filter_by(
-            session_id=session_id, student_id=current_user.id
-        ).first()
-        if not att:
-            att = Attendance(
-                session_id=session_id, student_id=current_user.id,
-                joined_at=datetime.now(timezone.utc),
-                status=AttendanceStatus.PRESENT,
-            )
-            db.session.add(att)
-        else:
-            att.joined_at = att.joined_at or datetime.now(timezone.utc)
-            att.status = AttendanceStatus.PRESENT
-        db.session.commit()
-
-        # Update streak
-        streak = Streak.query.filter_by(student_id=current_user.id).first()
-        if not streak:
-            streak = Streak(student_id=current_user.id)
-            db.session.add(streak)
-        streak.update_streak()
-        db.session.commit()
+    # Record attendance for students (buffered; flushed by room_attendance)
+    if session_id and current_user.is_authenticated and current_user.role == Role.STUDENT:
+        room_attendance.record_join(session_id, current_user.id)
 
     emit('user_joined', {
         'user_id': current_user.id if current_user.is_authenticated else 0,
@@ -291,18 +264,17 @@ def handle_join(data):
         'role': current_user.role.value if current_user.is_authenticated else 'guest',
     }, room=f'session_{session_id}')
 
-    # Send current slide state to the joining user (late joiner sync)
-    slide_state = _session_slide_state.get(session_id)
+    # Send current slide/whiteboard/video state to the joining user (late joiner sync)
+    state = room_state.late_join_state(session_id)
+    slide_state = state['slide']
     if slide_state:
         emit('slide_sync', slide_state)
 
-    # Send current whiteboard state to the joining user (late joiner sync)
-    wb_state = _session_whiteboard_state.get(session_id)
+    wb_state = state['whiteboard']
     if wb_state and wb_state.get('url'):
         emit('whiteboard_sync', {'url': wb_state['url']})
 
-    # Send current video state to the joining user (late joiner sync)
-    video_state = _session_video_state.get(session_id)
+    video_state = state['video']
     if video_state and video_state.get('youtube_url'):
         emit('video_sync', video_state)
 
@@ -312,15 +284,8 @@ def handle_leave(data):
     session_id = data.get('session_id')
     leave_room(f'session_{session_id}')
 
-    if current_user.is_authenticated and current_user.role == Role.STUDENT:
-        att = Attendance.query.filter_by(
-            session_id=session_id, student_id=current_user.id
-        ).first()
-        if att:
-            att.left_at = datetime.now(timezone.utc)
-            if att.joined_at:
-                att.duration_seconds = int((att.left_at - att.joined_at).total_seconds())
-            db.session.commit()
+    if session_id and current_user.is_authenticated and current_user.role == Role.STUDENT:
+        room_attendance.record_leave(session_id, current_user.id)
 
     emit('user_left', {
         'user_id': current_user.id if current_user.is_authenticated else 0,
@@ -332,14 +297,13 @@ def handle_slide_change(data):
     session_id = data.get('session_id')
     slide_index = data.get('slide_index', 0)
     resource_id = data.get('resource_id')
-    # Store current slide state for late joiners
-    if session_id:
-        state = _session_slide_state.get(session_id, {})
-        state['slide_index'] = slide_index
-        if resource_id:
-            state['resource_id'] = resource_id
-        _session_slide_state[session_id] = state
-    emit('slide_change', data, room=f'session_{session_id}', include_self=False)
+    if not session_id:
+        return
+    # Latest slide wins; stored and broadcast with its version by room_sync
+    fields = {'slide_index': slide_index}
+    if resource_id:
+        fields['resource_id'] = resource_id
+    room_sync.update(session_id, 'slide', fields, skip_sid=request.sid)
 
 
 @socketio.on('whiteboard_started')
@@ -351,9 +315,17 @@ def handle_whiteboard_started(data):
         emit('whiteboard_start', {'url': url}, room=f'session_{session_id}', include_self=False)
 
 
+def _publish(event, data, include_self=True):
+    """Queue a room broadcast on the outbound scheduler; tells the sender when it is throttled."""
+    user_key = current_user.id if current_user.is_authenticated else request.sid
+    if not room_outbox.publish(data.get('session_id'), event, data, user_key,
+                               sid=request.sid, include_self=include_self):
+        emit('error', {'message': 'Too many messages, please slow down', 'event': event})
+
+
 @socketio.on('code_broadcast')
 def handle_code_broadcast(data):
-    emit('code_broadcast', data, room=f'session_{data.get("session_id")}', include_self=False)
+    _publish('code_broadcast', data, include_self=False)
 
 
 @socketio.on('code_submit')
@@ -363,17 +335,17 @@ def handle_code_submit(data):
 
 @socketio.on('question_submit')
 def handle_question(data):
-    emit('question_submit', data, room=f'session_{data.get("session_id")}')
+    _publish('question_submit', data)
 
 
 @socketio.on('hand_raise')
 def handle_hand_raise(data):
-    emit('hand_raise', data, room=f'session_{data.get("session_id")}')
+    _publish('hand_raise', data)
 
 
 @socketio.on('chat_message')
 def handle_chat(data):
-    emit('chat_message', data, room=f'session_{data.get("session_id")}')
+    _publish('chat_message', data)
 
 
 @socketio.on('end_session_broadcast')
@@ -400,11 +372,6 @@ def handle_timer_stop(data):
 
 # === In-Class Activity Handlers ===
 
-# Track active activities per session: session_id -> activity_data
-_active_activities = {}
-# Track submissions per activity: activity_id -> {student_id: answer_data}
-_activity_submissions = {}
-
 
 @socketio.on('start_activity')
 def handle_start_activity(data):
@@ -420,9 +387,8 @@ def handle_start_activity(data):
     if not session_id or not activity:
         return
 
-    # Store the active activity
-    _active_activities[session_id] = activity
-    _activity_submissions[activity.get('id', '')] = {}
+    # Store the active activity with its compiled answer key
+    room_activities.start_activity(session_id, activity)
 
     # Broadcast to all users in the room (including teacher)
     emit('activity_start', activity, room=f'session_{session_id}')
@@ -443,92 +409,24 @@ def handle_activity_submit(data):
     if not session_id or not activity_id or answer is None:
         return
 
-    # Retrieve the active activity
-    activity = _active_activities.get(session_id)
-    if not activity or activity.get('id') != activity_id:
+    # Score against the answer key compiled at start_activity
+    key = room_activities.answer_key(session_id, activity_id)
+    if key is None:
         emit('activity_result', {
             'correct': 0, 'total': 1, 'xp_earned': 0,
             'message': 'Activity not found or expired',
         })
         return
 
-    # Track this submission
-    submissions = _activity_submissions.setdefault(activity_id, {})
-    submissions[student_id] = answer
-
-    # Check correctness based on activity type
-    correct_count = 0
-    total_count = 1
-    activity_type = activity.get('type', '')
-
-    if activity_type == 'mcq':
-        correct_answer = activity.get('correct')
-        selected = answer.get('selected', -1) if isinstance(answer, dict) else -1
-        if selected == correct_answer:
-            correct_count = 1
-        total_count = 1
-
-    elif activity_type == 'dragdrop':
-        correct_order = activity.get('correctOrder', [])
-        student_order = answer.get('order', []) if isinstance(answer, dict) else []
-        if student_order == correct_order:
-            correct_count = len(correct_order)
-        else:
-            # Count how many items are in the correct position
-            for i in range(min(len(student_order), len(correct_order))):
-                if student_order[i] == correct_order[i]:
-                    correct_count += 1
-        total_count = len(correct_order) if correct_order else 1
-
-    elif activity_type == 'fillblank':
-        answers_list = answer.get('answers', []) if isinstance(answer, dict) else []
-        lines = activity.get('lines', [])
-        total_count = 0
-        for line in lines:
-            blanks = line.get('blanks', [])
-            total_count += len(blanks)
-
-        for ans in answers_list:
-            line_idx = ans.get('line', 0)
-            blank_idx = ans.get('blank', 0)
-            value = ans.get('value', '').strip()
-            if line_idx < len(lines):
-                line_blanks = lines[line_idx].get('blanks', [])
-                if blank_idx < len(line_blanks):
-                    expected = line_blanks[blank_idx].get('answer', '').strip()
-                    if value == expected:
-                        correct_count += 1
-
-        if total_count == 0:
-            total_count = 1
-
-    elif activity_type == 'code':
-        # For code challenges, mark as submitted (teacher reviews manually)
-        correct_count = 1
-        total_count = 1
-
-    # Calculate XP (base: 10 per correct, bonus for full score)
-    xp_earned = correct_count * 10
-    if correct_count == total_count and total_count > 0:
-        xp_earned += 15  # Perfect score bonus
-
-    # Award XP in the database
+    # Track this submission; the count covers students on every worker
+    num_completions = room_state.record_submission(session_id, activity_id, student_id, answer)
+
+    correct_count, total_count = room_activities.score(key, answer)
+    xp_earned = room_activities.xp_for(correct_count, total_count)
+
+    # Queue the XP; it is written in bulk at end_activity or by the room flusher
     if xp_earned > 0 and current_user.role == Role.STUDENT:
-        try:
-            xp_record = StudentXP(
-                student_id=current_user.id,
-                amount=xp_earned,
-                reason=f'نشاط: {activity.get("title", "نشاط")}',
-                session_id=session_id,
-            )
-            db.session.add(xp_record)
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            print(f'XP award error: {e}')
-
-    # Count total completions for progress
-    num_completions = len(submissions)
+        room_activities.queue_xp(session_id, key, current_user.id, xp_earned)
 
     # Send result back to the submitting student
     emit('activity_result', {
@@ -566,11 +464,8 @@ def handle_end_activity(data):
     if not session_id:
         return
 
-    # Clean up stored activity data
-    if session_id in _active_activities:
-        del _active_activities[session_id]
-    if activity_id and activity_id in _activity_submissions:
-        del _activity_submissions[activity_id]
+    # Clean up stored activity data and write the XP it earned
+    room_activities.end_activity(session_id, activity_id)
 
     emit('activity_end', {
         'session_id': session_id,
@@ -651,56 +546,42 @@ def handle_video_load(data):
     youtube_url = data.get('youtube_url', '')
     if not session_id or not youtube_url:
         return
-    _session_video_state[session_id] = {
-        'youtube_url': youtube_url,
-        'current_time': 0,
-        'is_playing': False,
-    }
-    emit('video_load', {'youtube_url': youtube_url}, room=f'session_{session_id}')
+    room_sync.discard(session_id, 'video')
+    state = room_state.load_video(session_id, youtube_url)
+    emit('video_load', state, room=f'session_{session_id}')
 
 
 @socketio.on('video_play')
 def handle_video_play(data):
-    """Teacher plays video — broadcast to room."""
+    """Teacher plays video — synced to the room by room_sync."""
     if not current_user.is_authenticated or current_user.role not in (Role.TEACHER, Role.ADMIN):
         return
     session_id = data.get('session_id')
     current_time = data.get('current_time', 0)
     if not session_id:
         return
-    state = _session_video_state.get(session_id, {})
-    state['is_playing'] = True
-    state['current_time'] = current_time
-    _session_video_state[session_id] = state
-    emit('video_play', {'current_time': current_time}, room=f'session_{session_id}', include_self=False)
+    room_sync.update(session_id, 'video', {'is_playing': True, 'current_time': current_time}, skip_sid=request.sid)
 
 
 @socketio.on('video_pause')
 def handle_video_pause(data):
-    """Teacher pauses video — broadcast to room."""
+    """Teacher pauses video — synced to the room by room_sync."""
     if not current_user.is_authenticated or current_user.role not in (Role.TEACHER, Role.ADMIN):
         return
     session_id = data.get('session_id')
     current_time = data.get('current_time', 0)
     if not session_id:
         return
-    state = _session_video_state.get(session_id, {})
-    state['is_playing'] = False
-    state['current_time'] = current_time
-    _session_video_state[session_id] = state
-    emit('video_pause', {'current_time': current_time}, room=f'session_{session_id}', include_self=False)
+    room_sync.update(session_id, 'video', {'is_playing': False, 'current_time': current_time}, skip_sid=request.sid)
 
 
 @socketio.on('video_seek')
 def handle_video_seek(data):
-    """Teacher seeks video — broadcast to room."""
+    """Teacher seeks video — synced to the room by room_sync."""
     if not current_user.is_authenticated or current_user.role not in (Role.TEACHER, Role.ADMIN):
         return
     session_id = data.get('session_id')
     current_time = data.get('current_time', 0)
     if not session_id:
         return
-    state = _session_video_state.get(session_id, {})
-    state['current_time'] = current_time
-    _session_video_state[session_id] = state
-    emit('video_seek', {'current_time': current_time}, room=f'session_{session_id}', include_self=False)
+    room_sync.update(session_id, 'video', {'current_time': current_time}, skip_sid=request.sid)
@@ -5,9 +5,8 @@ from app.extensions import db
 from app.models.user import User, Role
 from app.models.classroom import Group, GroupStudent, Session, SessionStatus, Attendance
 from app.models.homework import Homework, HomeworkSubmission
-from app.models.gamification import StudentXP, Badge, Streak, StudentBadge
+from app.models.gamification import StudentXP, Badge, Streak, StudentBadge, XPSource
 from app.models.notification import Notification
-from app.models.curriculum import Track, Level, Unit
 from app.models.journey import (
     StudentWallet, Quest, StudentQuest, QuestStatus, QuestDifficulty, QuestCategory,
     Activity, StudentActivity, ActivitySource,
@@ -19,11 +18,22 @@ from app.utils.decorators import student_required
 from app.utils.helpers import safe_int
 from app.utils.uploads import (save_upload, get_upload_url, delete_upload,
                                 ALLOWED_IMAGES, ALLOWED_DOCUMENTS, ALLOWED_ALL)
-from app.utils.wallet import get_or_create_wallet, award_coins, award_gems
+from app.utils.wallet import get_or_create_wallet, credit
 from app.utils.gamification_service import (
     award_quest_rewards, award_activity_rewards, record_milestone,
-    check_and_award_badges, get_student_journey_stats,
+    check_and_award_badges, get_student_journey_stats, add_xp, track_xp,
 )
+from app.utils.student_stats import get_student_stats
+from app.utils.hud import get_hud
+from app.utils.student_dashboard import dashboard_context
+from app.utils.unit_progress import init_unit_progress
+from app.utils.curriculum_cache import get_curriculum
+from app.utils.track_progress import (
+    track_progress as get_track_progress, unit_lesson_count, completed_lessons_by_unit,
+)
+from app.utils import leaderboard as lb
+from app.utils.xp_rollup import recent_daily_xp, xp_between, week_start
+from app.utils.badge_engine import BadgeEvent
 from datetime import datetime, date, timezone, timedelta
 from sqlalchemy import func
 import json
@@ -46,126 +56,7 @@ def check_onboarding():
 @bp.route('/')
 @student_required
 def dashboard():
-    student_id = current_user.id
-    total_xp = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(total_xp)
-    level_title_ar, level_title_en = StudentXP.level_title(level)
-
-    # Streak
-    streak = Streak.query.filter_by(student_id=student_id).first()
-    current_streak = streak.current_streak if streak else 0
-
-    # My groups
-    group_ids = [gs.group_id for gs in GroupStudent.query.filter_by(student_id=student_id).all()]
-
-    # Upcoming sessions
-    upcoming_sessions = Session.query.filter(
-        Session.group_id.in_(group_ids),
-        Session.status == SessionStatus.SCHEDULED,
-    ).order_by(Session.scheduled_at).limit(3).all() if group_ids else []
-
-    # Recent XP
-    recent_xp = StudentXP.query.filter_by(student_id=student_id).order_by(
-        StudentXP.created_at.desc()
-    ).limit(10).all()
-
-    # Badges
-    badges_earned = current_user.badges_earned.all()
-    all_badges = Badge.query.all()
-
-    # Leaderboard - get top 10 students by XP
-    leaderboard = db.session.query(
-        User.id, User.name_ar, User.avatar_url,
-        func.coalesce(func.sum(StudentXP.amount), 0).label('total_xp')
-    ).outerjoin(StudentXP, User.id == StudentXP.student_id).filter(
-        User.role == Role.STUDENT
-    ).group_by(User.id).order_by(func.sum(StudentXP.amount).desc()).limit(10).all()
-
-    # My rank
-    my_rank_query = db.session.query(func.count()).filter(
-        StudentXP.student_id != student_id
-    ).group_by(StudentXP.student_id).having(
-        func.sum(StudentXP.amount) > total_xp
-    )
-    my_rank = my_rank_query.count() + 1
-
-    # Pending homework
-    pending_homework = HomeworkSubmission.query.join(Homework).filter(
-        HomeworkSubmission.student_id == student_id,
-        HomeworkSubmission.grade.is_(None),
-    ).all() if group_ids else []
-
-    # Homework due soon (not yet submitted)
-    my_submission_hw_ids = [s.homework_id for s in HomeworkSubmission.query.filter_by(
-        student_id=student_id
-    ).all()]
-    homework_due = Homework.query.filter(
-        Homework.group_id.in_(group_ids),
-        ~Homework.id.in_(my_submission_hw_ids) if my_submission_hw_ids else Homework.id.isnot(None),
-    ).order_by(Homework.due_date).limit(3).all() if group_ids else []
-
-    # Notifications count
-    unread_count = Notification.query.filter_by(user_id=student_id, is_read=False).count()
-
-    # XP thresholds for level progress bar
-    thresholds = [0, 100, 300, 600, 1000, 1500, 2200, 3000, 4000, 5000,
-                  6500, 8000, 10000, 12500, 15000, 18000, 21000, 25000]
-    current_threshold = thresholds[level - 1] if level <= len(thresholds) else thresholds[-1]
-    next_threshold = thresholds[level] if level < len(thresholds) else thresholds[-1] + 5000
-    xp_progress = ((total_xp - current_threshold) / max(next_threshold - current_threshold, 1)) * 100
-
-    # Curriculum tracks (universes)
-    tracks = Track.query.order_by(Track.sort_order).all()
-
-    # Per-track progress for universe cards
-    track_progress = {}
-    for track in tracks:
-        total_units = Unit.query.filter_by(track_id=track.id).count()
-        completed = StudentUnitProgress.query.filter_by(
-            student_id=student_id, track_id=track.id, status='completed').count()
-        pct = int((completed / total_units * 100)) if total_units > 0 else 0
-        track_progress[track.id] = {'total': total_units, 'completed': completed, 'pct': pct}
-
-    # Live sessions the student can join now
-    live_sessions = Session.query.filter(
-        Session.group_id.in_(group_ids),
-        Session.status == SessionStatus.LIVE,
-    ).all() if group_ids else []
-
-    # My groups with details
-    my_groups = Group.query.filter(Group.id.in_(group_ids)).all() if group_ids else []
-
-    # Adventure map data
-    adventure_nodes = StudentUnitProgress.query.filter_by(
-        student_id=student_id
-    ).order_by(StudentUnitProgress.id).all()
-    adventure_completed = sum(1 for n in adventure_nodes if n.status == 'completed')
-    adventure_total = len(adventure_nodes) if adventure_nodes else 1
-
-    # Wallet
-    wallet = get_or_create_wallet(student_id)
-
-    return render_template('student/dashboard.html',
-                           total_xp=total_xp, level=level,
-                           level_title_ar=level_title_ar, level_title_en=level_title_en,
-                           current_streak=current_streak,
-                           upcoming_sessions=upcoming_sessions,
-                           live_sessions=live_sessions,
-                           recent_xp=recent_xp,
-                           badges_earned=badges_earned, all_badges=all_badges,
-                           leaderboard=leaderboard, my_rank=my_rank,
-                           pending_homework=pending_homework,
-                           homework_due=homework_due,
-                           unread_count=unread_count,
-                           xp_progress=min(xp_progress, 100),
-                           next_threshold=next_threshold,
-                           tracks=tracks,
-                           track_progress=track_progress,
-                           my_groups=my_groups,
-                           adventure_nodes=adventure_nodes,
-                           adventure_completed=adventure_completed,
-                           adventure_total=adventure_total,
-                           wallet=wallet)
+    return render_template('student/dashboard.html', **dashboard_context(current_user.id))
 
 
 # ─── Quests ─────────────────────────────────────────────────────────────────
@@ -174,8 +65,7 @@ def dashboard():
 @student_required
 def quests():
     student_id = current_user.id
-    total_xp = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(total_xp)
+    level = get_student_stats(student_id).level
 
     difficulty = request.args.get('difficulty', '')
     category = request.args.get('category', '')
@@ -275,21 +165,9 @@ def complete_quest(quest_id):
 def activities():
     student_id = current_user.id
 
-    # Fetch tracks + per-track progress (same as verses_map)
-    tracks = Track.query.order_by(Track.sort_order).all()
-    track_progress = {}
-    for track in tracks:
-        total_units = Unit.query.filter_by(track_id=track.id).count()
-        completed_units = StudentUnitProgress.query.filter_by(
-            student_id=student_id, track_id=track.id, status='completed'
-        ).count()
-        pct = (completed_units / total_units * 100) if total_units > 0 else 0
-        track_progress[track.id] = {
-            'total': total_units, 'completed': completed_units, 'pct': int(pct)
-        }
-
-    return render_template('student/activities.html',
-                           tracks=tracks, track_progress=track_progress)
+    tracks = get_curriculum().tracks
+    return render_template('student/activities.html', tracks=tracks,
+                           track_progress=get_track_progress(student_id, tracks))
 
 
 @bp.route('/activity/<int:activity_id>')
@@ -341,7 +219,7 @@ def complete_activity(activity_id):
     wants_json = (request.headers.get('X-Requested-With') == 'XMLHttpRequest'
                   or 'application/json' in (request.accept_mimetypes or ''))
     if wants_json:
-        total_xp = StudentXP.total_xp(current_user.id)
+        total_xp = get_student_stats(current_user.id).total_xp
         wallet = get_or_create_wallet(current_user.id)
         return jsonify({
             'success': True,
@@ -439,25 +317,20 @@ def claim_daily_reward():
     db.session.add(claim)
 
     # Award based on type
+    reason = f'مكافأة اليوم {next_day}'
     if reward.reward_type == RewardType.COINS:
-        wallet = get_or_create_wallet(student_id)
-        wallet.coins += reward.amount
+        credit(student_id, coins=reward.amount, reason=reason)
     elif reward.reward_type == RewardType.GEMS:
-        wallet = get_or_create_wallet(student_id)
-        wallet.gems += reward.amount
+        credit(student_id, gems=reward.amount, reason=reason)
     elif reward.reward_type == RewardType.MYSTERY:
         # Mystery: random coins 10-50
         import random
         bonus = random.choice([10, 15, 20, 25, 30, 50])
-        wallet = get_or_create_wallet(student_id)
-        wallet.coins += bonus
+        credit(student_id, coins=bonus, reason=reason)
     elif reward.reward_type == RewardType.CHEST:
         # Chest: coins + gems + XP
-        wallet = get_or_create_wallet(student_id)
-        wallet.coins += 50
-        wallet.gems += 3
-        xp = StudentXP(student_id=student_id, amount=30, reason='صندوق كنز يومي')
-        db.session.add(xp)
+        credit(student_id, coins=50, gems=3, reason='صندوق كنز يومي')
+        add_xp(student_id, 30, 'صندوق كنز يومي', source=XPSource.DAILY_REWARD)
 
     db.session.commit()
     flash(f'حصلت على مكافأة اليوم {next_day}!', 'success')
@@ -470,62 +343,30 @@ def claim_daily_reward():
 @student_required
 def library():
     student_id = current_user.id
-    tracks = Track.query.order_by(Track.sort_order).all()
-
-    # Per-track progress
-    track_progress = {}
-    for track in tracks:
-        total_units = Unit.query.filter_by(track_id=track.id).count()
-        completed_units = StudentUnitProgress.query.filter_by(
-            student_id=student_id, track_id=track.id, status='completed'
-        ).count()
-        pct = (completed_units / total_units * 100) if total_units > 0 else 0
-        # Count lessons with content (PDF/video/activity)
-        lesson_count = LessonContent.query.filter(
-            LessonContent.track_id == track.id,
-            db.or_(
-                LessonContent.pdf_file.isnot(None),
-                LessonContent.video_url.isnot(None),
-                LessonContent.activity_url.isnot(None),
-            )
-        ).count()
-        track_progress[track.id] = {
-            'total': total_units, 'completed': completed_units, 'pct': int(pct),
-            'lesson_count': lesson_count,
-        }
-
-    return render_template('student/library.html',
-                           tracks=tracks, track_progress=track_progress)
+    tracks = get_curriculum().tracks
+    # Per-track progress plus the number of lessons with content (PDF/video/activity)
+    return render_template('student/library.html', tracks=tracks,
+                           track_progress=get_track_progress(student_id, tracks, with_lessons=True))
 
 
 @bp.route('/library/<track_id>')
 @student_required
 def library_track(track_id):
     student_id = current_user.id
-    track = Track.query.get(track_id)
+    curriculum = get_curriculum()
+    track = curriculum.track(track_id)
     if not track:
         flash('المسار غير موجود', 'error')
         return redirect(url_for('student.library'))
 
-    levels = Level.query.filter_by(track_id=track_id).order_by(Level.sort_order).all()
+    completed = completed_lessons_by_unit(student_id, track_id)
+
     level_data = []
-    for level in levels:
-        units = Unit.query.filter_by(track_id=track_id, level_id=level.id).order_by(Unit.sort_order).all()
+    for level in curriculum.levels(track_id):
         unit_data = []
-        for unit in units:
-            total_lessons = LessonContent.query.filter_by(
-                track_id=track_id, level_id=level.id, unit_id=unit.id
-            ).count()
-            completed_lessons = 0
-            if total_lessons > 0:
-                lesson_ids = [l.id for l in LessonContent.query.filter_by(
-                    track_id=track_id, level_id=level.id, unit_id=unit.id
-                ).all()]
-                completed_lessons = LessonProgress.query.filter(
-                    LessonProgress.student_id == student_id,
-                    LessonProgress.lesson_id.in_(lesson_ids),
-                    LessonProgress.completed == True
-                ).count() if lesson_ids else 0
+        for unit in curriculum.level_units(track_id, level.id):
+            total_lessons = unit_lesson_count(track_id, level.id, unit.id)
+            completed_lessons = completed.get((track_id, level.id, unit.id), 0)
             pct = int(completed_lessons / total_lessons * 100) if total_lessons > 0 else 0
             unit_data.append({
                 'unit': unit, 'total': total_lessons,
@@ -541,15 +382,14 @@ def library_track(track_id):
 @student_required
 def library_unit(track_id, level_id, unit_id):
     student_id = current_user.id
-    unit = Unit.query.filter_by(
-        track_id=track_id, level_id=level_id, id=unit_id
-    ).first()
+    curriculum = get_curriculum()
+    unit = curriculum.unit(track_id, level_id, unit_id)
     if not unit:
         flash('الوحدة غير موجودة', 'error')
         return redirect(url_for('student.library'))
 
-    track = Track.query.get(track_id)
-    level = Level.query.filter_by(track_id=track_id, id=level_id).first()
+    track = curriculum.track(track_id)
+    level = curriculum.level(track_id, level_id)
 
     lessons = LessonContent.query.filter_by(
         track_id=track_id, level_id=level_id, unit_id=unit_id
@@ -578,11 +418,10 @@ def library_lesson(lesson_id):
         flash('الدرس غير موجود', 'error')
         return redirect(url_for('student.library'))
 
-    track = Track.query.get(lesson.track_id)
-    level = Level.query.filter_by(track_id=lesson.track_id, id=lesson.level_id).first()
-    unit = Unit.query.filter_by(
-        track_id=lesson.track_id, level_id=lesson.level_id, id=lesson.unit_id
-    ).first()
+    curriculum = get_curriculum()
+    track = curriculum.track(lesson.track_id)
+    level = curriculum.level(lesson.track_id, lesson.level_id)
+    unit = curriculum.unit(lesson.track_id, lesson.level_id, lesson.unit_id)
 
     # Check completion
     progress = LessonProgress.query.filter_by(
@@ -623,17 +462,14 @@ def complete_lesson(lesson_id):
     # Award XP + coins
     xp_amount = 10
     coin_amount = 5
-    db.session.add(StudentXP(
-        student_id=student_id, amount=xp_amount,
-        reason=f'إكمال درس: {lesson.title_ar}'
-    ))
-    wallet = get_or_create_wallet(student_id)
-    wallet.coins += coin_amount
+    add_xp(student_id, xp_amount, f'إكمال درس: {lesson.title_ar}', source=XPSource.LESSON,
+           track_id=lesson.track_id, level_id=lesson.level_id, unit_id=lesson.unit_id)
+    credit(student_id, coins=coin_amount, reason=f'إكمال درس: {lesson.title_ar}')
 
     db.session.commit()
-    check_and_award_badges(student_id)
+    check_and_award_badges(student_id, BadgeEvent.XP_EARNED)
 
-    new_total_xp = StudentXP.total_xp(student_id)
+    new_total_xp = get_student_stats(student_id).total_xp
     updated_wallet = get_or_create_wallet(student_id)
 
     return jsonify({
@@ -651,73 +487,39 @@ def complete_lesson(lesson_id):
 @student_required
 def verses_map():
     student_id = current_user.id
-    tracks = Track.query.order_by(Track.sort_order).all()
-
-    track_progress = {}
-    for track in tracks:
-        total_units = Unit.query.filter_by(track_id=track.id).count()
-        completed_units = StudentUnitProgress.query.filter_by(
-            student_id=student_id, track_id=track.id, status='completed'
-        ).count()
-        pct = (completed_units / total_units * 100) if total_units > 0 else 0
-        track_progress[track.id] = {
-            'total': total_units, 'completed': completed_units, 'pct': int(pct)
-        }
-
-    return render_template('student/verses_map.html',
-                           tracks=tracks, track_progress=track_progress)
+    tracks = get_curriculum().tracks
+    return render_template('student/verses_map.html', tracks=tracks,
+                           track_progress=get_track_progress(student_id, tracks))
 
 
 @bp.route('/verses/<track_id>')
 @student_required
 def verse_adventure(track_id):
     student_id = current_user.id
-    track = Track.query.get(track_id)
+    curriculum = get_curriculum()
+    track = curriculum.track(track_id)
     if not track:
         flash('العالم غير موجود', 'error')
         return redirect(url_for('student.verses_map'))
 
-    # Get all levels and units for this track, ordered
-    levels = Level.query.filter_by(track_id=track_id).order_by(Level.sort_order).all()
-    units = Unit.query.filter_by(track_id=track_id).order_by(Unit.level_id, Unit.sort_order).all()
+    # Levels and units of this track in curriculum order (Level.sort_order, Unit.sort_order)
+    levels = curriculum.levels(track_id)
+    units = curriculum.units(track_id)
 
     if not units:
         flash('لا توجد وحدات في هذا العالم', 'error')
         return redirect(url_for('student.verses_map'))
 
-    # Lazy-initialize StudentUnitProgress on first visit
     existing = StudentUnitProgress.query.filter_by(
         student_id=student_id, track_id=track_id
     ).all()
-    existing_keys = {(p.level_id, p.unit_id) for p in existing}
-
-    if not existing:
-        # First visit: create all progress records
-        for idx, unit in enumerate(units):
-            status = 'current' if idx == 0 else 'locked'
-            db.session.add(StudentUnitProgress(
-                student_id=student_id, track_id=track_id,
-                level_id=unit.level_id, unit_id=unit.id, status=status,
-            ))
+    if len(existing) < len(units):
+        # First visit (or units the backfill has not reached yet): one INSERT ... SELECT
+        init_unit_progress(student_id, track_id, (units[0].level_id, units[0].id))
         db.session.commit()
         existing = StudentUnitProgress.query.filter_by(
             student_id=student_id, track_id=track_id
         ).all()
-    else:
-        # Add missing units (in case new units were added to curriculum)
-        added = False
-        for unit in units:
-            if (unit.level_id, unit.id) not in existing_keys:
-                db.session.add(StudentUnitProgress(
-                    student_id=student_id, track_id=track_id,
-                    level_id=unit.level_id, unit_id=unit.id, status='locked',
-                ))
-                added = True
-        if added:
-            db.session.commit()
-            existing = StudentUnitProgress.query.filter_by(
-                student_id=student_id, track_id=track_id
-            ).all()
 
     # Build progress lookup
     progress_map = {(p.level_id, p.unit_id): p for p in existing}
@@ -746,11 +548,7 @@ def verse_adventure(track_id):
     total_count = len(nodes)
 
     # XP earned in this track
-    from app.models.gamification import StudentXP
-    track_xp = db.session.query(func.coalesce(func.sum(StudentXP.amount), 0)).filter(
-        StudentXP.student_id == student_id,
-        StudentXP.reason.like(f'%{track.name_ar}%')
-    ).scalar() or 0
+    xp_in_track = track_xp(student_id, track_id)
 
     return render_template('student/verse_adventure.html',
                            track=track, nodes=nodes, levels=levels,
@@ -758,7 +556,7 @@ def verse_adventure(track_id):
                            current_node_index=current_node_index,
                            completed_count=completed_count,
                            total_count=total_count,
-                           track_xp=track_xp)
+                           track_xp=xp_in_track)
 
 
 @bp.route('/verses/<track_id>/<level_id>/<unit_id>')
@@ -766,9 +564,8 @@ def verse_adventure(track_id):
 def verse_unit(track_id, level_id, unit_id):
     student_id = current_user.id
 
-    unit = Unit.query.filter_by(
-        track_id=track_id, level_id=level_id, id=unit_id
-    ).first()
+    curriculum = get_curriculum()
+    unit = curriculum.unit(track_id, level_id, unit_id)
     if not unit:
         flash('الوحدة غير موجودة', 'error')
         return redirect(url_for('student.verse_adventure', track_id=track_id))
@@ -782,8 +579,8 @@ def verse_unit(track_id, level_id, unit_id):
         flash('هذه الوحدة مقفلة', 'error')
         return redirect(url_for('student.verse_adventure', track_id=track_id))
 
-    track = Track.query.get(track_id)
-    level = Level.query.filter_by(track_id=track_id, id=level_id).first()
+    track = curriculum.track(track_id)
+    level = curriculum.level(track_id, level_id)
 
     # Get unit activities
     unit_activities = Activity.query.filter_by(
@@ -832,39 +629,36 @@ def complete_verse_unit():
     if not all([track_id, level_id, unit_id]):
         return jsonify({'error': 'Missing parameters'}), 400
 
-    progress = StudentUnitProgress.query.filter_by(
-        student_id=student_id, track_id=track_id,
-        level_id=level_id, unit_id=unit_id
-    ).first()
-
-    if not progress or progress.status != 'current':
+    node = get_curriculum().unit(track_id, level_id, unit_id)
+    if node is None:
         return jsonify({'error': 'Cannot complete this unit'}), 400
 
-    # Mark as completed
-    progress.status = 'completed'
-    progress.completed_at = datetime.now(timezone.utc)
+    # Mark as completed; the status guard makes a double submit a no-op
+    completed = db.session.execute(
+        db.update(StudentUnitProgress).where(
+            StudentUnitProgress.student_id == student_id,
+            StudentUnitProgress.track_id == track_id,
+            StudentUnitProgress.level_id == level_id,
+            StudentUnitProgress.unit_id == unit_id,
+            StudentUnitProgress.status == 'current',
+        ).values(status='completed', completed_at=datetime.now(timezone.utc))
+    ).rowcount
+    if not completed:
+        return jsonify({'error': 'Cannot complete this unit'}), 400
 
     # Unlock next unit
-    units = Unit.query.filter_by(track_id=track_id).order_by(
-        Unit.level_id, Unit.sort_order
-    ).all()
-    unit_ids = [(u.level_id, u.id) for u in units]
-    current_idx = None
-    for i, (lid, uid) in enumerate(unit_ids):
-        if lid == level_id and uid == unit_id:
-            current_idx = i
-            break
-
     next_unlocked = False
-    if current_idx is not None and current_idx + 1 < len(unit_ids):
-        next_lid, next_uid = unit_ids[current_idx + 1]
-        next_progress = StudentUnitProgress.query.filter_by(
-            student_id=student_id, track_id=track_id,
-            level_id=next_lid, unit_id=next_uid
-        ).first()
-        if next_progress and next_progress.status == 'locked':
-            next_progress.status = 'current'
-            next_unlocked = True
+    if node.next:
+        next_lid, next_uid = node.next
+        next_unlocked = bool(db.session.execute(
+            db.update(StudentUnitProgress).where(
+                StudentUnitProgress.student_id == student_id,
+                StudentUnitProgress.track_id == track_id,
+                StudentUnitProgress.level_id == next_lid,
+                StudentUnitProgress.unit_id == next_uid,
+                StudentUnitProgress.status == 'locked',
+            ).values(status='current')
+        ).rowcount)
 
     # Award XP + coins
     xp_amount = 50
@@ -872,35 +666,29 @@ def complete_verse_unit():
     bonus_xp = 0
     bonus_coins = 0
 
-    # Level boundary bonus (every 4 units)
-    completed_count = StudentUnitProgress.query.filter_by(
-        student_id=student_id, track_id=track_id, status='completed'
-    ).count()
-    if completed_count % 4 == 0:
+    # Level boundary bonus: this was the last unit of its level. Units unlock
+    # in order, so this unit's position in the track is the number completed.
+    completed_count = node.ordinal + 1
+    if node.next is None or node.next[0] != node.level_id:
         bonus_xp = 100
         bonus_coins = 50
 
-    from app.models.gamification import StudentXP
-    track = Track.query.get(track_id)
+    track = get_curriculum().track(track_id)
     track_name = track.name_ar if track else track_id
 
-    db.session.add(StudentXP(
-        student_id=student_id, amount=xp_amount + bonus_xp,
-        reason=f'إكمال وحدة في {track_name}'
-    ))
-    wallet = get_or_create_wallet(student_id)
-    wallet.coins += coin_amount + bonus_coins
+    add_xp(student_id, xp_amount + bonus_xp, f'إكمال وحدة في {track_name}',
+           source=XPSource.VERSE_UNIT, track_id=track_id, level_id=level_id, unit_id=unit_id)
+    credit(student_id, coins=coin_amount + bonus_coins, reason=f'إكمال وحدة في {track_name}')
 
     record_milestone(student_id, MilestoneType.QUEST_COMPLETED,
                      f'أكملت وحدة في {track_name}',
                      f'Completed unit in {track_id}')
 
     db.session.commit()
-    check_and_award_badges(student_id)
+    check_and_award_badges(student_id, BadgeEvent.XP_EARNED)
 
     # Return updated totals for topbar
-    from app.models.gamification import StudentXP as SXP
-    new_total_xp = SXP.total_xp(student_id)
+    new_total_xp = get_student_stats(student_id).total_xp
     updated_wallet = get_or_create_wallet(student_id)
 
     return jsonify({
@@ -924,7 +712,7 @@ def onboarding():
     if current_user.onboarding_completed:
         return redirect(url_for('student.dashboard'))
 
-    tracks = Track.query.order_by(Track.sort_order).all()
+    tracks = get_curriculum().tracks
     return render_template('student/onboarding.html', tracks=tracks)
 
 
@@ -952,8 +740,7 @@ def onboarding_submit():
     # Create wallet with welcome bonus
     wallet = get_or_create_wallet(current_user.id)
     if wallet.coins == 0 and wallet.gems == 0:
-        wallet.coins = 50
-        wallet.gems = 2
+        credit(current_user.id, coins=50, gems=2, reason='مكافأة ترحيبية')
 
     # Record joined milestone
     existing_ms = JourneyMilestone.query.filter_by(
@@ -1018,17 +805,19 @@ def sessions():
 @student_required
 def progress():
     student_id = current_user.id
-    total_xp = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(total_xp)
-    xp_history = StudentXP.query.filter_by(student_id=student_id).order_by(
-        StudentXP.created_at.desc()
-    ).limit(50).all()
+    stats = get_student_stats(student_id)
+    total_xp = stats.total_xp
+    level = stats.level
+    xp_days = recent_daily_xp(student_id, 30)
+    week_xp = xp_between([student_id], week_start()).get(student_id, 0)
     attendance_records = Attendance.query.filter_by(student_id=student_id).all()
     total_sessions = len(attendance_records)
     attended = sum(1 for a in attendance_records if a.status.value in ('present', 'late'))
     attendance_pct = (attended / total_sessions * 100) if total_sessions > 0 else 0
     return render_template('student/progress.html', total_xp=total_xp, level=level,
-                           xp_history=xp_history, attendance_pct=attendance_pct,
+                           xp_days=xp_days, week_xp=week_xp,
+                           xp_days_max=max([xp for _, xp in xp_days] + [1]),
+                           attendance_pct=attendance_pct,
                            total_sessions=total_sessions, attended=attended)
 
 
@@ -1042,24 +831,13 @@ def badges():
 @student_required
 def leaderboard():
     period = request.args.get('period', 'all_time')
-    rows = db.session.query(
-        User.id, User.name_ar, User.avatar_url,
-        func.coalesce(func.sum(StudentXP.amount), 0).label('total_xp')
-    ).outerjoin(StudentXP, User.id == StudentXP.student_id).filter(
-        User.role == Role.STUDENT
-    ).group_by(User.id).order_by(func.sum(StudentXP.amount).desc()).limit(50).all()
-
-    leaderboard_data = []
-    student_rank = None
-    for i, row in enumerate(rows):
-        level = StudentXP.current_level(row.total_xp)
-        entry = {
-            'rank': i + 1, 'name': row.name_ar, 'name_ar': row.name_ar,
-            'avatar': row.avatar_url, 'xp': row.total_xp, 'level': level,
-        }
-        leaderboard_data.append(type('Entry', (), entry)())
-        if row.id == current_user.id:
-            student_rank = i + 1
+    if period not in lb.PERIODS:
+        period = 'all_time'
+    group_id = safe_int(request.args.get('group'), default=None)
+    track_id = request.args.get('track') or None
+
+    leaderboard_data = lb.top(period, limit=50, group_id=group_id, track_id=track_id)
+    student_rank = lb.rank(current_user.id, period, group_id=group_id, track_id=track_id)
 
     return render_template('student/leaderboard.html',
                            leaderboard=leaderboard_data, period=period,
@@ -1141,8 +919,9 @@ def profile():
         flash('تم تحديث الملف الشخصي', 'success')
 
     student_id = current_user.id
-    xp_total = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(xp_total)
+    stats = get_student_stats(student_id)
+    xp_total = stats.total_xp
+    level = stats.level
     _title_ar, _title_en = StudentXP.level_title(level)
     level_title = _title_ar
 
@@ -1153,31 +932,20 @@ def profile():
     badges_earned = current_user.badges_earned.all()
     all_badges = Badge.query.all()
     earned_ids = {b.id for b in badges_earned}
-    badges_count = len(badges_earned)
-    sessions_attended = Attendance.query.filter_by(student_id=student_id).count()
+    badges_count = stats.badges_earned
+    sessions_attended = stats.sessions_attended
 
     # Wallet
     wallet = get_or_create_wallet(student_id)
 
     # Journey stats
-    quests_completed = StudentQuest.query.filter_by(
-        student_id=student_id, status=QuestStatus.COMPLETED
-    ).count()
+    quests_completed = stats.quests_completed
     total_quests = Quest.query.count()
 
     # Track progress
-    tracks = Track.query.order_by(Track.sort_order).all()
-    tracks_with_progress = []
-    for track in tracks:
-        total_units = Unit.query.filter_by(track_id=track.id).count()
-        completed_units = StudentUnitProgress.query.filter_by(
-            student_id=student_id, track_id=track.id, status='completed'
-        ).count()
-        pct = (completed_units / total_units * 100) if total_units > 0 else 0
-        tracks_with_progress.append({
-            'track': track, 'completed': completed_units,
-            'total': total_units, 'pct': int(pct)
-        })
+    tracks = get_curriculum().tracks
+    progress = get_track_progress(student_id, tracks)
+    tracks_with_progress = [dict(progress[track.id], track=track) for track in tracks]
 
     # Milestones (last 20)
     milestones = JourneyMilestone.query.filter_by(student_id=student_id).order_by(
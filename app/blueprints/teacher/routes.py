@@ -5,9 +5,13 @@ from app.extensions import db
 from app.models.user import User, Role
 from app.models.classroom import Group, Session, SessionStatus, Attendance, AttendanceStatus
 from app.models.homework import Homework, HomeworkSubmission
-from app.models.gamification import StudentXP
+from app.models.gamification import XPSource
 from app.utils.decorators import teacher_required
 from app.utils.helpers import paginate, safe_int
+from app.utils.gamification_service import add_xp, check_and_award_badges
+from app.utils.badge_engine import BadgeEvent
+from app.utils.student_stats import get_student_stats
+from app.utils.session_finalizer import finalize_session, FINALIZE_QUEUED, ATTENDANCE_XP
 from datetime import datetime, date, timedelta, timezone
 
 
@@ -182,11 +186,6 @@ def session_end(session_id):
         flash('لا يمكن إنهاء هذه الجلسة - الحالة الحالية: ' + session.status.value, 'error')
         return redirect(url_for('teacher.session_detail', session_id=session_id))
 
-    now = datetime.now(timezone.utc)
-
-    # Mark session as completed
-    session.status = SessionStatus.COMPLETED
-
     # End 100ms room if exists
     if session.hundredms_room_id:
         try:
@@ -195,34 +194,19 @@ def session_end(session_id):
         except Exception:
             pass  # Non-critical: room may already be ended
 
-    # Update attendance: set left_at for anyone still connected
-    open_attendance = Attendance.query.filter_by(session_id=session_id).filter(
-        Attendance.left_at.is_(None),
-        Attendance.joined_at.isnot(None),
-    ).all()
-    for att in open_attendance:
-        att.left_at = now
-        if att.joined_at:
-            joined = att.joined_at.replace(tzinfo=timezone.utc) if att.joined_at.tzinfo is None else att.joined_at
-            att.duration_seconds = int((now - joined).total_seconds())
-
-    db.session.commit()
-
-    # Award +50 XP to each student who attended
+    # Mark completed, close open attendance and reward attendees in bulk
+    result = finalize_session(session_id)
+    if not result:
+        flash('هذه الجلسة منتهية بالفعل', 'info')
+        return redirect(url_for('teacher.session_detail', session_id=session_id))
     attended = Attendance.query.filter_by(session_id=session_id).filter(
         Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE])
-    ).all()
-    for att in attended:
-        xp = StudentXP(
-            student_id=att.student_id,
-            amount=50,
-            reason=f'حضور جلسة: {session.title}',
-            session_id=session.id,
-        )
-        db.session.add(xp)
-    db.session.commit()
+    ).count()
 
-    flash(f'تم إنهاء الجلسة بنجاح - تم منح 50 XP لـ {len(attended)} طالب', 'success')
+    if result == FINALIZE_QUEUED:
+        flash(f'تم إنهاء الجلسة بنجاح - جارٍ منح {ATTENDANCE_XP} XP لـ {attended} طالب', 'success')
+    else:
+        flash(f'تم إنهاء الجلسة بنجاح - تم منح {ATTENDANCE_XP} XP لـ {attended} طالب', 'success')
     return redirect(url_for('teacher.session_detail', session_id=session_id))
 
 
@@ -333,13 +317,10 @@ def homework_grade(hw_id, submission_id):
     else:
         xp_amount = 10
 
-    xp = StudentXP(
-        student_id=sub.student_id,
-        amount=xp_amount,
-        reason=f'واجب: {hw.title} (درجة: {sub.grade})',
-    )
-    db.session.add(xp)
+    add_xp(sub.student_id, xp_amount, f'واجب: {hw.title} (درجة: {sub.grade})',
+           source=XPSource.HOMEWORK, session_id=hw.session_id, track_id=hw.group.track_id)
     db.session.commit()
+    check_and_award_badges(sub.student_id, BadgeEvent.ASSIGNMENT_GRADED, BadgeEvent.XP_EARNED)
 
     flash(f'تم تقييم الواجب بنجاح - تم منح {xp_amount} XP', 'success')
     return redirect(url_for('teacher.homework_detail', hw_id=hw_id))
@@ -352,7 +333,6 @@ def student_profile(student_id):
     if not student or student.role != Role.STUDENT:
         flash('الطالب غير موجود', 'error')
         return redirect(url_for('teacher.dashboard'))
-    total_xp = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(total_xp)
+    stats = get_student_stats(student_id)
     return render_template('teacher/student_profile.html', student=student,
-                           total_xp=total_xp, level=level)
+                           total_xp=stats.total_xp, level=stats.level)
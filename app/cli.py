@@ -0,0 +1,161 @@
+import click
+from flask.cli import AppGroup
+from app.extensions import db
+
+stats_cli = AppGroup('stats', help='Maintain the student_stats summary table.')
+
+
+@stats_cli.command('rebuild')
+@click.option('--student', 'student_ids', type=int, multiple=True,
+              help='Only rebuild these student ids (repeatable).')
+def stats_rebuild(student_ids):
+    """Recompute student_stats from the XP/quest/activity/attendance/badge tables."""
+    from app.utils.student_stats import rebuild_student_stats
+    count = rebuild_student_stats(list(student_ids) or None)
+    db.session.commit()
+    click.echo(f'[STATS] Rebuilt {count} student rows')
+
+
+@stats_cli.command('reconcile')
+@click.option('--fix', is_flag=True, help='Rebuild the rows that drifted.')
+def stats_reconcile(fix):
+    """Report students whose stored counters differ from the source tables."""
+    from app.utils.student_stats import reconcile_student_stats
+    drift = reconcile_student_stats(fix=fix)
+    for student_id, field, stored, expected in drift:
+        click.echo(f'  student={student_id} {field}: stored={stored} expected={expected}')
+    if fix:
+        db.session.commit()
+    click.echo(f'[STATS] {len(drift)} mismatched fields'
+               f'{" (fixed)" if fix and drift else ""}')
+
+
+leaderboard_cli = AppGroup('leaderboard', help='Maintain the Redis leaderboards.')
+
+
+@leaderboard_cli.command('rebuild')
+def leaderboard_rebuild():
+    """Recreate all-time/weekly/monthly (group and track) boards from the daily XP buckets."""
+    from app.utils.leaderboard import rebuild_leaderboards
+    count = rebuild_leaderboards()
+    click.echo(f'[LEADERBOARD] Rebuilt boards for {count} students')
+
+
+wallet_cli = AppGroup('wallet', help='Check wallet balances against the currency ledger.')
+
+
+@wallet_cli.command('reconcile')
+@click.option('--fix', is_flag=True, help='Rewrite balances from the ledger.')
+@click.option('--adopt-balances', is_flag=True,
+              help='Record opening-balance ledger rows for wallets that predate the ledger.')
+def wallet_reconcile(fix, adopt_balances):
+    """Report wallets whose balance differs from SUM(currency_transactions)."""
+    from app.utils.wallet import reconcile_wallets
+    drift = reconcile_wallets(fix=fix, adopt_balances=adopt_balances)
+    for student_id, currency, balance, ledger in drift:
+        click.echo(f'  student={student_id} {currency}: balance={balance} ledger={ledger}')
+    if fix or adopt_balances:
+        db.session.commit()
+    click.echo(f'[WALLET] {len(drift)} mismatched balances')
+
+
+xp_cli = AppGroup('xp', help='Maintain the daily XP rollup (student_xp_daily).')
+
+
+@xp_cli.command('compact')
+@click.option('--days', type=int, default=None,
+              help='Only re-derive the last N days (default: the compaction window).')
+@click.option('--all', 'everything', is_flag=True, help='Re-derive every bucket.')
+def xp_compact(days, everything):
+    """Recompute daily XP buckets from the student_xp ledger."""
+    from app.utils.xp_rollup import compact_xp_rollups, COMPACT_DAYS
+    count = compact_xp_rollups(days=None if everything else (days or COMPACT_DAYS))
+    db.session.commit()
+    click.echo(f'[ROLLUP] Wrote {count} daily XP buckets')
+
+
+sessions_cli = AppGroup('sessions', help='Live-session maintenance.')
+
+
+@sessions_cli.command('reconcile-awards')
+@click.option('--days', type=int, default=None,
+              help='Look back N days (default: the reconcile window).')
+@click.option('--dry-run', is_flag=True, help='Only list the unpaid sessions.')
+def sessions_reconcile_awards(days, dry_run):
+    """Pay attendance rewards for completed sessions that never received them."""
+    from app.utils.session_finalizer import (
+        sessions_pending_awards, reconcile_session_awards, RECONCILE_DAYS)
+    days = days or RECONCILE_DAYS
+    if dry_run:
+        pending = sessions_pending_awards(days)
+        for session_id in pending:
+            click.echo(f'  session={session_id}')
+        click.echo(f'[SESSION] {len(pending)} sessions pending attendance awards')
+        return
+    paid = reconcile_session_awards(days)
+    for session_id, count in paid.items():
+        click.echo(f'  session={session_id}: {count} students')
+    click.echo(f'[SESSION] Paid attendance awards for {len(paid)} sessions')
+
+
+curriculum_cli = AppGroup('curriculum', help='Curriculum maintenance.')
+
+
+@curriculum_cli.command('backfill-progress')
+@click.option('--track', 'track_id', default=None, help='Only this track id.')
+def curriculum_backfill_progress(track_id):
+    """Add locked unit-progress rows for units added after students started a track."""
+    from app.utils.unit_progress import backfill_unit_progress
+    count = backfill_unit_progress(track_id)
+    db.session.commit()
+    click.echo(f'[CURRICULUM] Added {count} unit progress rows')
+
+
+@curriculum_cli.command('sync')
+@click.option('--dry-run', is_flag=True, help='Only report the changes.')
+@click.option('--track', 'track_ids', multiple=True,
+              help='Only sync these track ids (repeatable).')
+@click.option('--prune', is_flag=True,
+              help='Delete rows that are missing from data/ (kept by default).')
+@click.option('--force', is_flag=True,
+              help='With --prune, also delete tracks/levels/units that still have '
+                   'student progress, lessons or sessions attached.')
+@click.option('-v', '--verbose', is_flag=True, help='List every changed key.')
+def curriculum_sync(dry_run, track_ids, prune, force, verbose):
+    """Bring the curriculum tables in line with data/*.py in one transaction."""
+    from app.utils.curriculum_sync import sync_curriculum
+    diff = sync_curriculum(list(track_ids) or None, prune=prune, force=force, dry_run=dry_run)
+    for name, changes in diff.items():
+        click.echo(f'  {name}: +{len(changes.inserts)} ~{len(changes.updates)} '
+                   f'-{len(changes.deletes)} ={len(changes.kept)} kept')
+        if verbose:
+            for key, changed, _row in changes.updates:
+                for field, (old, new) in changed.items():
+                    click.echo(f'    ~ {key} {field}: {old!r} -> {new!r}')
+            for key in changes.deletes:
+                click.echo(f'    - {key}')
+        # Always name DB-only rows that live data still depends on
+        for key, attached in changes.kept.items():
+            if attached:
+                uses = ', '.join(f'{n} {kind}' for kind, n in sorted(attached.items()))
+                click.echo(f'    ! {key} not in data/ but has {uses}')
+    total = sum(len(c.inserts) + len(c.updates) + len(c.deletes) for c in diff.values())
+    in_use = sum(1 for c in diff.values() for attached in c.kept.values() if attached)
+    if in_use:
+        click.echo(f'[CURRICULUM] {in_use} rows missing from data/ are still in use '
+                   f'and were kept (--prune --force deletes them)')
+    if dry_run:
+        db.session.rollback()
+        click.echo(f'[CURRICULUM] {total} changes (dry run, nothing written)')
+    else:
+        db.session.commit()
+        click.echo(f'[CURRICULUM] Applied {total} changes')
+
+
+def register_commands(app):
+    app.cli.add_command(stats_cli)
+    app.cli.add_command(leaderboard_cli)
+    app.cli.add_command(wallet_cli)
+    app.cli.add_command(xp_cli)
+    app.cli.add_command(sessions_cli)
+    app.cli.add_command(curriculum_cli)
@@ -3,9 +3,10 @@ from app.models.curriculum import Track, Level, Unit, Objective, Skill
 from app.models.classroom import Group, GroupStudent, Session, Attendance, SessionResource
 from app.models.resource import Resource, ResourceFile
 from app.models.assessment import Assessment, AssessmentReport
-from app.models.gamification import StudentXP, Badge, StudentBadge, Streak
+from app.models.gamification import StudentXP, Badge, StudentBadge, Streak, StudentStats, StudentXPDaily
 from app.models.homework import Homework, HomeworkSubmission
 from app.models.notification import Notification
+from app.models.system import SchemaState
 from app.models.journey import (
     StudentWallet, CurrencyTransaction, Quest, StudentQuest,
     Activity, StudentActivity, DailyReward, StudentDailyReward,
@@ -20,9 +21,10 @@ __all__ = [
     'Group', 'GroupStudent', 'Session', 'Attendance', 'SessionResource',
     'Resource', 'ResourceFile',
     'Assessment', 'AssessmentReport',
-    'StudentXP', 'Badge', 'StudentBadge', 'Streak',
+    'StudentXP', 'Badge', 'StudentBadge', 'Streak', 'StudentStats', 'StudentXPDaily',
     'Homework', 'HomeworkSubmission',
     'Notification',
+    'SchemaState',
     'StudentWallet', 'CurrencyTransaction', 'Quest', 'StudentQuest',
     'Activity', 'StudentActivity', 'DailyReward', 'StudentDailyReward',
     'StudentUnitProgress', 'JourneyMilestone', 'LessonContent', 'LessonProgress',
@@ -1,6 +1,8 @@
 import enum
 from datetime import datetime, date, timezone
+from sqlalchemy import event
 from app.extensions import db
+from app.models.user import User, Role
 
 
 class BadgeCriteria(enum.Enum):
@@ -12,6 +14,22 @@ class BadgeCriteria(enum.Enum):
     CUSTOM = 'custom'
 
 
+class XPSource(enum.Enum):
+    QUEST = 'quest'
+    ACTIVITY = 'activity'
+    LESSON = 'lesson'
+    VERSE_UNIT = 'verse_unit'
+    ATTENDANCE = 'attendance'
+    ROOM_ACTIVITY = 'room_activity'
+    HOMEWORK = 'homework'
+    DAILY_REWARD = 'daily_reward'
+    MANUAL = 'manual'
+
+
+LEVEL_THRESHOLDS = [0, 100, 300, 600, 1000, 1500, 2200, 3000, 4000, 5000,
+                    6500, 8000, 10000, 12500, 15000, 18000, 21000, 25000]
+
+
 class StudentXP(db.Model):
     __tablename__ = 'student_xp'
 
@@ -19,11 +37,23 @@ class StudentXP(db.Model):
     student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
     amount = db.Column(db.Integer, nullable=False)
     reason = db.Column(db.String(200), nullable=False)
-    session_id = db.Column(db.Integer, db.ForeignKey('sessions.id', ondelete='SET NULL'), nullable=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('sessions.id', ondelete='SET NULL'), nullable=True, index=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Structured attribution; ``reason`` is display text only
+    source_type = db.Column(db.String(20), nullable=True)  # XPSource value
+    track_id = db.Column(db.String(50), nullable=True)
+    level_id = db.Column(db.String(50), nullable=True)
+    unit_id = db.Column(db.String(50), nullable=True)
+    quest_id = db.Column(db.Integer, nullable=True)
+    activity_id = db.Column(db.Integer, nullable=True)
 
     student = db.relationship('User', backref=db.backref('xp_records', lazy='dynamic'))
 
+    __table_args__ = (
+        db.Index('ix_student_xp_student_track', 'student_id', 'track_id'),
+        db.Index('ix_student_xp_student_source', 'student_id', 'source_type'),
+    )
+
     @staticmethod
     def total_xp(student_id):
         from sqlalchemy import func
@@ -34,10 +64,8 @@ class StudentXP(db.Model):
 
     @staticmethod
     def current_level(total_xp):
-        thresholds = [0, 100, 300, 600, 1000, 1500, 2200, 3000, 4000, 5000,
-                      6500, 8000, 10000, 12500, 15000, 18000, 21000, 25000]
         level = 1
-        for i, t in enumerate(thresholds):
+        for i, t in enumerate(LEVEL_THRESHOLDS):
             if total_xp >= t:
                 level = i + 1
             else:
@@ -122,3 +150,47 @@ class Streak(db.Model):
         self.last_activity_date = today
         if self.current_streak > (self.longest_streak or 0):
             self.longest_streak = self.current_streak
+
+
+class StudentStats(db.Model):
+    """Per-student counters kept in step with every award path (see app.utils.student_stats)."""
+    __tablename__ = 'student_stats'
+
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total_xp = db.Column(db.Integer, nullable=False, default=0)
+    level = db.Column(db.Integer, nullable=False, default=1)
+    quests_completed = db.Column(db.Integer, nullable=False, default=0)
+    activities_completed = db.Column(db.Integer, nullable=False, default=0)
+    sessions_attended = db.Column(db.Integer, nullable=False, default=0)
+    badges_earned = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+
+    student = db.relationship('User', backref=db.backref('stats', uselist=False))
+
+    def __repr__(self):
+        return f'<StudentStats student={self.student_id} xp={self.total_xp} level={self.level}>'
+
+
+@event.listens_for(User, 'after_insert')
+def _create_student_stats(mapper, connection, target):
+    """New students start with an all-zero stats row; they have no ledger yet."""
+    if target.role == Role.STUDENT:
+        connection.execute(StudentStats.__table__.insert().values(student_id=target.id))
+
+
+class StudentXPDaily(db.Model):
+    """XP per student, UTC day and track (``''`` = no track); see app.utils.xp_rollup."""
+    __tablename__ = 'student_xp_daily'
+
+    student_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    track_id = db.Column(db.String(50), primary_key=True, default='', server_default='')
+    xp = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_student_xp_daily_day', 'day'),
+    )
+
+    def __repr__(self):
+        return f'<StudentXPDaily student={self.student_id} day={self.day} xp={self.xp}>'
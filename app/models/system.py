@@ -0,0 +1,15 @@
+from datetime import datetime, timezone
+from app.extensions import db
+
+
+class SchemaState(db.Model):
+    """Key/value markers about the database itself; see app.utils.boot."""
+    __tablename__ = 'schema_state'
+
+    key = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.String(128), nullable=False)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc),
+                           onupdate=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<SchemaState {self.key}={self.value}>'
@@ -2,13 +2,23 @@
 
 let socket = null;
 let socketConnected = false;
+// Newest slide/video state version seen; older broadcasts are dropped
+let syncVersions = { slide: 0, video: 0 };
+
+function isStaleSync(part, data) {
+    if (!data || typeof data.version !== 'number') return false;
+    if (data.version <= syncVersions[part]) return true;
+    syncVersions[part] = data.version;
+    return false;
+}
 
 function initSocketIO(sessionId) {
     if (socket && socketConnected) return socket;
 
     try {
         socket = io({
-            transports: ['websocket', 'polling'],
+            // Multi-worker deployments serve WebSocket only (see docs/scaling.md)
+            transports: window.SOCKETIO_TRANSPORTS || ['websocket', 'polling'],
             reconnection: true,
             reconnectionAttempts: 10,
             reconnectionDelay: 1000,
@@ -47,6 +57,16 @@ function initSocketIO(sessionId) {
         socket.emit('join_session', { session_id: sessionId });
     });
 
+    // === Batched room events (chat, Q&A, hand raise, code broadcast) ===
+    // The server sends them every ~50ms as [event, data, skipSid] entries;
+    // skipSid marks events the sender should not see (include_self=False).
+    socket.on('room_frame', (frame) => {
+        frame.forEach(([event, data, skipSid]) => {
+            if (skipSid && skipSid === socket.id) return;
+            socket.listeners(event).forEach((handler) => handler(data));
+        });
+    });
+
     // === User Events ===
     socket.on('user_joined', (data) => {
         console.log('User joined:', data.name);
@@ -100,12 +120,16 @@ function initSocketIO(sessionId) {
     });
 
     // === Slide Sync ===
+    // Debounced by the server: carries the room's latest slide and its version
     socket.on('slide_change', (data) => {
+        if (isStaleSync('slide', data)) return;
         if (typeof setSlideIndex === 'function') setSlideIndex(data.slide_index);
     });
 
     // === Slide Sync for Late Joiners ===
+    // The stored state is authoritative, so it always applies and resets the version
     socket.on('slide_sync', (data) => {
+        if (data && typeof data.version === 'number') syncVersions.slide = data.version;
         if (typeof handleSlideSync === 'function') handleSlideSync(data);
     });
 
@@ -183,23 +207,23 @@ function initSocketIO(sessionId) {
     // === YouTube Video Sync ===
     socket.on('video_load', (data) => {
         console.log('video_load received:', data);
+        if (isStaleSync('video', data)) return;
         if (typeof handleVideoLoad === 'function') handleVideoLoad(data);
     });
 
-    socket.on('video_play', (data) => {
-        if (typeof handleVideoPlay === 'function') handleVideoPlay(data);
-    });
-
-    socket.on('video_pause', (data) => {
-        if (typeof handleVideoPause === 'function') handleVideoPause(data);
-    });
-
-    socket.on('video_seek', (data) => {
-        if (typeof handleVideoSeek === 'function') handleVideoSeek(data);
+    // Play/pause/seek arrive debounced as the full latest state
+    socket.on('video_state', (data) => {
+        if (isStaleSync('video', data)) return;
+        if (data.is_playing) {
+            if (typeof handleVideoPlay === 'function') handleVideoPlay(data);
+        } else if (typeof handleVideoPause === 'function') {
+            handleVideoPause(data);
+        }
     });
 
     socket.on('video_sync', (data) => {
         console.log('video_sync (late joiner):', data);
+        if (data && typeof data.version === 'number') syncVersions.video = data.version;
         if (typeof handleVideoSync === 'function') handleVideoSync(data);
     });
 
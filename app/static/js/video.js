@@ -116,11 +116,6 @@ function handleVideoPause(data) {
     }
 }
 
-function handleVideoSeek(data) {
-    if (!ytPlayer || typeof ytPlayer.seekTo !== 'function') return;
-    ytPlayer.seekTo(data.current_time || 0, true);
-}
-
 function handleVideoSync(data) {
     // Late joiner: load video and sync position
     var url = data.youtube_url;
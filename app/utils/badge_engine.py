@@ -0,0 +1,170 @@
+import enum
+import time
+import threading
+from bisect import bisect_right
+from collections import namedtuple
+from sqlalchemy import event, func
+from app.extensions import db
+from app.models.gamification import Badge, BadgeCriteria, StudentBadge, Streak, StudentStats
+from app.models.journey import MilestoneType
+from app.models.homework import HomeworkSubmission
+from app.models.notification import Notification, NotificationType
+from app.utils.student_stats import get_student_stats, bump_stats_many
+
+
+class BadgeEvent(enum.Enum):
+    XP_EARNED = 'xp_earned'
+    SESSION_ATTENDED = 'session_attended'
+    STREAK_UPDATED = 'streak_updated'
+    ASSIGNMENT_GRADED = 'assignment_graded'
+
+
+EVENT_CRITERIA = {
+    BadgeEvent.XP_EARNED: BadgeCriteria.XP_EARNED,
+    BadgeEvent.SESSION_ATTENDED: BadgeCriteria.SESSIONS_ATTENDED,
+    BadgeEvent.STREAK_UPDATED: BadgeCriteria.STREAK_DAYS,
+    BadgeEvent.ASSIGNMENT_GRADED: BadgeCriteria.ASSIGNMENTS_COMPLETED,
+}
+
+INDEX_TTL = 300  # seconds; badges are edited rarely and only via seeds/shell
+
+_BadgeInfo = namedtuple('_BadgeInfo', 'id name name_ar description_ar')
+_index = {'built_at': 0.0, 'by_criteria': {}}
+_index_lock = threading.Lock()
+
+
+# ─── Badge index ────────────────────────────────────────────────────────────
+
+def _badge_index():
+    """{criteria: (thresholds, badges)} with both tuples sorted by criteria_value."""
+    if time.monotonic() - _index['built_at'] < INDEX_TTL:
+        return _index['by_criteria']
+    with _index_lock:
+        rows = db.session.query(
+            Badge.id, Badge.name, Badge.name_ar, Badge.description_ar,
+            Badge.criteria_type, Badge.criteria_value,
+        ).order_by(Badge.criteria_value, Badge.id).all()
+        grouped = {}
+        for row in rows:
+            thresholds, badges = grouped.setdefault(row.criteria_type, ([], []))
+            thresholds.append(row.criteria_value)
+            badges.append(_BadgeInfo(row.id, row.name, row.name_ar, row.description_ar))
+        _index['by_criteria'] = {k: (tuple(t), tuple(b)) for k, (t, b) in grouped.items()}
+        _index['built_at'] = time.monotonic()
+    return _index['by_criteria']
+
+
+def invalidate_badge_index(*_args):
+    _index['built_at'] = 0.0
+
+
+for _evt in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Badge, _evt, invalidate_badge_index)
+
+
+# ─── Counters ───────────────────────────────────────────────────────────────
+
+def _counters(student_ids, criteria):
+    """{student_id: current counter} for one criteria type, in a single query."""
+    if criteria in (BadgeCriteria.XP_EARNED, BadgeCriteria.SESSIONS_ATTENDED):
+        column = (StudentStats.total_xp if criteria == BadgeCriteria.XP_EARNED
+                  else StudentStats.sessions_attended)
+        rows = db.session.query(StudentStats.student_id, column).filter(
+            StudentStats.student_id.in_(student_ids))
+    elif criteria == BadgeCriteria.STREAK_DAYS:
+        rows = db.session.query(Streak.student_id, Streak.longest_streak).filter(
+            Streak.student_id.in_(student_ids))
+    elif criteria == BadgeCriteria.ASSIGNMENTS_COMPLETED:
+        rows = db.session.query(
+            HomeworkSubmission.student_id, func.count(HomeworkSubmission.id)
+        ).filter(
+            HomeworkSubmission.student_id.in_(student_ids),
+            HomeworkSubmission.grade.isnot(None),
+        ).group_by(HomeworkSubmission.student_id)
+    else:
+        return {}
+    return {sid: value or 0 for sid, value in rows}
+
+
+# ─── Engine ─────────────────────────────────────────────────────────────────
+
+def _award(criteria, counters):
+    """Insert every reachable, unearned badge of ``criteria``: {student_id: [badges]}."""
+    thresholds, badges = _badge_index().get(criteria, ((), ()))
+    reachable = {}
+    for student_id, value in counters.items():
+        upto = bisect_right(thresholds, value)
+        if upto:
+            reachable[student_id] = badges[:upto]
+    if not reachable:
+        return {}
+
+    badge_ids = {b.id for bs in reachable.values() for b in bs}
+    earned = set(db.session.query(StudentBadge.c.student_id, StudentBadge.c.badge_id).filter(
+        StudentBadge.c.student_id.in_(list(reachable)),
+        StudentBadge.c.badge_id.in_(badge_ids),
+    ))
+    awarded = {}
+    for student_id, bs in reachable.items():
+        new_badges = [b for b in bs if (student_id, b.id) not in earned]
+        if new_badges:
+            awarded[student_id] = new_badges
+    if not awarded:
+        return {}
+
+    from app.utils.gamification_service import record_milestone
+    db.session.execute(StudentBadge.insert(), [
+        {'student_id': sid, 'badge_id': b.id} for sid, bs in awarded.items() for b in bs
+    ])
+    by_count = {}
+    for student_id, bs in awarded.items():
+        by_count.setdefault(len(bs), []).append(student_id)
+        for badge in bs:
+            record_milestone(student_id, MilestoneType.BADGE_EARNED,
+                             f'حصلت على شارة {badge.name_ar}',
+                             f'Earned badge: {badge.name}',
+                             badge.name)
+            db.session.add(Notification(
+                user_id=student_id,
+                title=f'شارة جديدة: {badge.name_ar}',
+                message=badge.description_ar or '',
+                type=NotificationType.BADGE,
+            ))
+    for count, student_ids in by_count.items():
+        bump_stats_many(student_ids, badges_earned=count)
+    return awarded
+
+
+def handle_event(student_id, badge_event, value=None):
+    """Award every badge of the event's criteria whose threshold ``value`` now reaches.
+
+    ``value`` is the student's current counter if the caller already has it.
+    Only badges of one criteria type are considered; a bisect over their sorted
+    thresholds picks the reachable ones, so students below the lowest threshold
+    cost a single counter lookup. The caller owns the commit.
+    """
+    criteria = EVENT_CRITERIA[badge_event]
+    if criteria not in _badge_index():
+        return []
+    if value is None:
+        if criteria in (BadgeCriteria.XP_EARNED, BadgeCriteria.SESSIONS_ATTENDED):
+            get_student_stats(student_id)  # make sure the stats row exists
+        value = _counters([student_id], criteria).get(student_id, 0)
+    return _award(criteria, {student_id: value}).get(student_id, [])
+
+
+def handle_event_many(student_ids, badge_event):
+    """``handle_event`` for a batch of students with a fixed number of queries."""
+    criteria = EVENT_CRITERIA[badge_event]
+    student_ids = list(student_ids)
+    if not student_ids or criteria not in _badge_index():
+        return {}
+    return _award(criteria, _counters(student_ids, criteria))
+
+
+def handle_events(student_id, *badge_events):
+    """Run several events for one student (all of them when none are given)."""
+    awarded = []
+    for badge_event in badge_events or tuple(BadgeEvent):
+        awarded.extend(handle_event(student_id, badge_event))
+    return awarded
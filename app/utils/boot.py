@@ -0,0 +1,77 @@
+import os
+import time
+import hashlib
+import inspect
+from app.extensions import db
+
+FINGERPRINT_KEY = 'schema_fingerprint'
+_MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+                               'migrations', 'versions')
+
+
+# ─── Schema fingerprint ─────────────────────────────────────────────────────
+
+def schema_fingerprint(*schema_code):
+    """Hash of everything that shapes the schema: model metadata, migration
+    files, and the source of ``schema_code`` (raw DDL helpers such as
+    ``_ensure_journey_schema``). Pure Python, no database access.
+    """
+    h = hashlib.sha256()
+    for table in sorted(db.metadata.tables.values(), key=lambda t: t.name):
+        h.update(table.name.encode())
+        for col in table.columns:
+            h.update(f'|{col.name}:{col.type!r}:{col.nullable}:{col.primary_key}'.encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ''):
+            h.update(f'|ix:{index.name}:{[c.name for c in index.columns]}:{index.unique}'.encode())
+    if os.path.isdir(_MIGRATIONS_DIR):
+        for name in sorted(os.listdir(_MIGRATIONS_DIR)):
+            if name.endswith('.py'):
+                h.update(name.encode())
+    for obj in schema_code:
+        try:
+            h.update(inspect.getsource(obj).encode())
+        except (OSError, TypeError):
+            h.update(repr(obj).encode())
+    return h.hexdigest()
+
+
+def stored_fingerprint():
+    """The fingerprint saved by the last full boot check, or None (one primary-key read)."""
+    from app.models.system import SchemaState
+    try:
+        state = db.session.get(SchemaState, FINGERPRINT_KEY)
+        return state.value if state else None
+    except Exception:
+        # schema_state does not exist yet
+        db.session.rollback()
+        return None
+
+
+def store_fingerprint(fingerprint):
+    from app.models.system import SchemaState
+    state = db.session.get(SchemaState, FINGERPRINT_KEY)
+    if state is None:
+        db.session.add(SchemaState(key=FINGERPRINT_KEY, value=fingerprint))
+    else:
+        state.value = fingerprint
+    db.session.commit()
+
+
+# ─── Boot timing ────────────────────────────────────────────────────────────
+
+class BootTimer:
+    """Collects per-phase wall time of ``create_app`` and prints one summary line."""
+
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, (now - self._last) * 1000))
+        self._last = now
+
+    def report(self):
+        total = (time.perf_counter() - self.started) * 1000
+        detail = ', '.join(f'{phase} {ms:.0f}ms' for phase, ms in self.phases)
+        print(f'[BOOT] Ready in {total:.0f}ms ({detail})')
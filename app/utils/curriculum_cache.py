@@ -0,0 +1,187 @@
+import time
+import threading
+from collections import namedtuple
+from sqlalchemy import event
+from app.extensions import db
+from app.models.curriculum import Track, Level, Unit, Objective, Skill
+from app.utils.redis_client import get_redis
+
+VERSION_KEY = 'curriculum:version'
+CHECK_INTERVAL = 2  # seconds between shared-version checks within one worker
+
+TrackNode = namedtuple('TrackNode', 'id name name_ar icon color description_ar sort_order')
+LevelNode = namedtuple('LevelNode', 'track_id id name name_ar icon slogan goal sort_order ordinal')
+# ``ordinal`` is the 0-based position of the unit in its whole track (levels by
+# Level.sort_order, then units by Unit.sort_order); ``prev``/``next`` are the
+# (level_id, unit_id) keys of its neighbours in that order, or None.
+UnitNode = namedtuple('UnitNode', 'track_id level_id id name name_en description project_name '
+                                  'project_description sort_order ordinal prev next objectives skills')
+ObjectiveNode = namedtuple('ObjectiveNode', 'id bloom bloom_en objective outcome sort_order')
+SkillNode = namedtuple('SkillNode', 'id name sort_order')
+
+_TRACK_COLUMNS = [getattr(Track, f) for f in TrackNode._fields]
+_LEVEL_COLUMNS = [getattr(Level, f) for f in LevelNode._fields[:-1]]
+_UNIT_COLUMNS = [getattr(Unit, f) for f in UnitNode._fields[:9]]
+
+
+class CurriculumGraph:
+    """Immutable, ordered snapshot of tracks → levels → units → objectives/skills.
+
+    Built once per curriculum version and shared by every request of the
+    worker; all lookups are dict hits on the prebuilt indexes.
+    """
+    __slots__ = ('version', 'tracks', '_tracks', '_levels', '_level_by_key', '_units',
+                 '_level_units', '_by_key')
+
+    def __init__(self, version, tracks, levels, units):
+        self.version = version
+        self.tracks = tuple(tracks)
+        self._tracks = {t.id: t for t in self.tracks}
+        self._levels = levels   # {track_id: (LevelNode, ...)}
+        self._units = units     # {track_id: (UnitNode, ...)}
+        self._level_by_key = {(lvl.track_id, lvl.id): lvl
+                              for nodes in levels.values() for lvl in nodes}
+        level_units = {}
+        for nodes in units.values():
+            for u in nodes:
+                level_units.setdefault((u.track_id, u.level_id), []).append(u)
+        self._level_units = {k: tuple(v) for k, v in level_units.items()}
+        self._by_key = {(u.track_id, u.level_id, u.id): u
+                        for nodes in units.values() for u in nodes}
+
+    def track(self, track_id):
+        return self._tracks.get(track_id)
+
+    def levels(self, track_id):
+        return self._levels.get(track_id, ())
+
+    def level(self, track_id, level_id):
+        return self._level_by_key.get((track_id, level_id))
+
+    def units(self, track_id):
+        return self._units.get(track_id, ())
+
+    def level_units(self, track_id, level_id):
+        return self._level_units.get((track_id, level_id), ())
+
+    def unit(self, track_id, level_id, unit_id):
+        return self._by_key.get((track_id, level_id, unit_id))
+
+    def first_unit(self, track_id):
+        units = self.units(track_id)
+        return units[0] if units else None
+
+    def next_unit(self, track_id, level_id, unit_id):
+        node = self.unit(track_id, level_id, unit_id)
+        return self._by_key[(track_id, *node.next)] if node and node.next else None
+
+    def prev_unit(self, track_id, level_id, unit_id):
+        node = self.unit(track_id, level_id, unit_id)
+        return self._by_key[(track_id, *node.prev)] if node and node.prev else None
+
+
+def _children(model, node_type):
+    """{(track_id, level_id, unit_id): (node, ...)} for objectives or skills, in one query."""
+    grouped = {}
+    for row in db.session.execute(db.select(
+        model.track_id, model.level_id, model.unit_id,
+        *[getattr(model, f) for f in node_type._fields],
+    ).order_by(model.sort_order, model.id)):
+        grouped.setdefault(tuple(row[:3]), []).append(node_type(*row[3:]))
+    return {k: tuple(v) for k, v in grouped.items()}
+
+
+def _build(version):
+    """Load the whole curriculum in four queries: tracks+levels, units, objectives, skills."""
+    tracks, levels = {}, {}
+    n_track = len(_TRACK_COLUMNS)
+    for row in db.session.execute(db.select(*_TRACK_COLUMNS, *_LEVEL_COLUMNS).outerjoin(
+        Level, Level.track_id == Track.id,
+    ).order_by(Track.sort_order, Track.id, Level.sort_order, Level.id)):
+        track = tracks.setdefault(row[0], TrackNode(*row[:n_track]))
+        track_levels = levels.setdefault(track.id, [])
+        if row[n_track] is not None:
+            track_levels.append(LevelNode(*row[n_track:], len(track_levels)))
+    level_rank = {(lvl.track_id, lvl.id): lvl.ordinal
+                  for nodes in levels.values() for lvl in nodes}
+
+    objectives = _children(Objective, ObjectiveNode)
+    skills = _children(Skill, SkillNode)
+
+    rows = {}
+    for u in db.session.execute(db.select(*_UNIT_COLUMNS).order_by(Unit.sort_order, Unit.id)):
+        rank = level_rank.get((u.track_id, u.level_id))
+        if rank is not None:
+            rows.setdefault(u.track_id, []).append((rank, u))
+
+    units = {}
+    for track_id, ranked in rows.items():
+        ranked.sort(key=lambda pair: pair[0])  # stable: keeps Unit.sort_order inside a level
+        keys = [(u.level_id, u.id) for _, u in ranked]
+        units[track_id] = tuple(
+            UnitNode(*u, i,
+                     keys[i - 1] if i > 0 else None,
+                     keys[i + 1] if i + 1 < len(keys) else None,
+                     objectives.get((u.track_id, u.level_id, u.id), ()),
+                     skills.get((u.track_id, u.level_id, u.id), ()))
+            for i, (_, u) in enumerate(ranked)
+        )
+    return CurriculumGraph(version, tracks.values(),
+                           {k: tuple(v) for k, v in levels.items()}, units)
+
+
+_state = {'graph': None, 'checked_at': 0.0}
+_lock = threading.Lock()
+
+
+def get_curriculum():
+    """The worker's CurriculumGraph, rebuilt after a version bump."""
+    graph = _state['graph']
+    now = time.monotonic()
+    if graph is not None and now - _state['checked_at'] < CHECK_INTERVAL:
+        return graph
+    version = get_redis().get(VERSION_KEY) or '0'
+    if graph is None or graph.version != version:
+        with _lock:
+            graph = _state['graph']
+            if graph is None or graph.version != version:
+                graph = _build(version)
+                _state['graph'] = graph
+    _state['checked_at'] = now
+    return graph
+
+
+# ─── Invalidation ───────────────────────────────────────────────────────────
+
+def bump_curriculum_version():
+    """Mark the curriculum as edited; every worker rebuilds once the transaction commits.
+
+    ORM writes to any curriculum model (the ``/api/...`` edit endpoints,
+    admin forms, seeding) call it through the mapper events below; call it
+    directly after bulk statements that bypass the mappers.
+    """
+    db.session.info['curriculum_stale'] = True
+
+
+def _mark_stale(*_args):
+    bump_curriculum_version()
+
+
+for _model in (Track, Level, Unit, Objective, Skill):
+    for _evt in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _evt, _mark_stale)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _publish_version(session):
+    if session.info.pop('curriculum_stale', None):
+        _state['graph'] = None
+        try:
+            get_redis().incr(VERSION_KEY)
+        except Exception as e:
+            print(f'[CURRICULUM] version bump failed: {e}')
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_stale(session):
+    session.info.pop('curriculum_stale', None)
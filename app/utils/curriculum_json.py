@@ -0,0 +1,75 @@
+import gzip
+import json
+import hashlib
+import threading
+from collections import namedtuple
+from flask import current_app, request
+from app.utils.curriculum_cache import get_curriculum
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# ``bodies`` maps a content coding ('identity', 'gzip', 'br') to its bytes;
+# ``etags`` maps it to that representation's strong ETag.
+Payload = namedtuple('Payload', 'bodies etags')
+
+_payloads = {}  # {(curriculum version, key): Payload}
+_lock = threading.Lock()
+
+
+def _encode(data):
+    body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    bodies = {'identity': body, 'gzip': gzip.compress(body, 9, mtime=0)}
+    if brotli is not None:
+        bodies['br'] = brotli.compress(body)
+    # Strong validators must differ per content coding
+    etags = {coding: digest if coding == 'identity' else f'{digest}-{coding}' for coding in bodies}
+    return Payload(bodies, etags)
+
+
+def curriculum_payload(key, build):
+    """The serialized, precompressed ``build(graph)`` for the current curriculum version.
+
+    ``key`` names the document (e.g. a track id); each document is encoded
+    once per version per worker and older versions are dropped.
+    """
+    graph = get_curriculum()
+    cache_key = (graph.version, key)
+    payload = _payloads.get(cache_key)
+    if payload is None:
+        payload = _encode(build(graph))
+        with _lock:
+            for stale in [k for k in _payloads if k[0] != graph.version]:
+                del _payloads[stale]
+            _payloads[cache_key] = payload
+    return payload
+
+
+def payload_response(payload):
+    """304 when the client already holds any representation, else the best encoding it accepts."""
+    response_class = current_app.response_class
+    coding = _pick_coding(payload)
+    if any(request.if_none_match.contains(etag) for etag in payload.etags.values()):
+        response = response_class(status=304)
+    else:
+        response = response_class(payload.bodies[coding], mimetype='application/json')
+        if coding != 'identity':
+            response.headers['Content-Encoding'] = coding
+    response.set_etag(payload.etags[coding])
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'no-cache'  # always revalidate; a 304 is free
+    return response
+
+
+def _pick_coding(payload):
+    accepted = request.accept_encodings
+    for coding in ('br', 'gzip'):
+        if coding in payload.bodies and accepted[coding]:
+            return coding
+    return 'identity'
@@ -0,0 +1,175 @@
+from collections import namedtuple
+from app.extensions import db
+from app.models.curriculum import Track, Level, Unit, Objective, Skill
+from app.models.classroom import Session
+from app.models.journey import StudentUnitProgress, LessonContent
+
+# (table in ``data.flatten_curriculum``, model, diff key). Objectives and skills have no natural
+# key, so they are matched by position inside their unit.
+TABLES = [
+    ('tracks', Track, ('id',)),
+    ('levels', Level, ('track_id', 'id')),
+    ('units', Unit, ('track_id', 'level_id', 'id')),
+    ('objectives', Objective, ('track_id', 'level_id', 'unit_id', 'sort_order')),
+    ('skills', Skill, ('track_id', 'level_id', 'unit_id', 'sort_order')),
+]
+_SURROGATE = {'objectives', 'skills'}
+
+# ``inserts``: rows to add; ``updates``: (key, {field: (old, new)}, row);
+# ``deletes``: keys (or ids for objectives/skills) to remove; ``kept``: keys
+# of rows that exist only in the DB but stay, mapped to what still uses them
+# ({'progress': n, 'lessons': n, 'sessions': n}, empty when nothing does)
+TableDiff = namedtuple('TableDiff', 'inserts updates deletes kept')
+
+# Tables whose rows hang off a track/level/unit: student progress and lessons
+# cascade when the unit goes, sessions would be left pointing at nothing
+_ATTACHED = {
+    'progress': (StudentUnitProgress.track_id, StudentUnitProgress.level_id,
+                 StudentUnitProgress.unit_id),
+    'lessons': (LessonContent.track_id, LessonContent.level_id, LessonContent.unit_id),
+    'sessions': (Session.unit_track_id, Session.unit_level_id, Session.unit_id),
+}
+
+
+def _db_rows(name, model, key, track_ids):
+    query = db.select(*model.__table__.columns)
+    track_col = model.id if name == 'tracks' else model.track_id
+    if track_ids:
+        query = query.where(track_col.in_(track_ids))
+    rows, duplicates = {}, []
+    for row in db.session.execute(query.order_by(*[getattr(model, c) for c in key])):
+        row = row._asdict()
+        k = tuple(row[c] for c in key)
+        if k in rows:
+            duplicates.append(row['id'])  # two objectives/skills at one position
+        else:
+            rows[k] = row
+    return rows, duplicates
+
+
+def _attachments(track_ids):
+    """{(track_id, level_id, unit_id): {kind: n}} for everything that uses a unit."""
+    counts = {}
+    for kind, (track, level, unit) in _ATTACHED.items():
+        query = db.select(track, level, unit, db.func.count()).where(
+            track.isnot(None)).group_by(track, level, unit)
+        if track_ids:
+            query = query.where(track.in_(track_ids))
+        for t, l, u, n in db.session.execute(query):
+            counts.setdefault((t, l, u), {})[kind] = n
+    return counts
+
+
+def _attached_to(attachments, prefix):
+    """Summed attachment counts of every unit under ``prefix`` (a track, level or unit key)."""
+    total = {}
+    for key, kinds in attachments.items():
+        if key[:len(prefix)] == prefix:
+            for kind, n in kinds.items():
+                total[kind] = total.get(kind, 0) + n
+    return total
+
+
+def diff_curriculum(track_ids=None, prune=False, force=False):
+    """{table: TableDiff} turning the DB curriculum into the one in ``data/*.py``.
+
+    Reads each table once; nothing is written. ``track_ids`` limits both
+    sides to those tracks. Rows that exist only in the DB (e.g. objectives
+    added in the editor, or a unit that moved to another level) are kept
+    unless ``prune``; even then a track, level or unit that still has
+    student progress, lessons or sessions attached is kept (with its
+    objectives and skills) unless ``force``, since deleting it would
+    cascade away live student data.
+    """
+    from data import all_tracks, flatten_curriculum
+    tracks = all_tracks()
+    wanted = flatten_curriculum(tracks)
+    if track_ids:
+        track_ids = set(track_ids)
+        for name, _model, _key in TABLES:
+            track_field = 'id' if name == 'tracks' else 'track_id'
+            wanted[name] = [r for r in wanted[name] if r[track_field] in track_ids]
+
+    attachments = _attachments(track_ids)
+    protected = set()  # kept track/level/unit keys; their children stay too
+    diff = {}
+    for name, model, key in TABLES:
+        current, duplicates = _db_rows(name, model, key, track_ids)
+        inserts, updates = [], []
+        seen = set()
+        for row in wanted[name]:
+            k = tuple(row[c] for c in key)
+            seen.add(k)
+            existing = current.get(k)
+            if existing is None:
+                inserts.append(row)
+                continue
+            changed = {f: (existing[f], v) for f, v in row.items() if existing[f] != v}
+            if changed:
+                update = {f: new for f, (_old, new) in changed.items()}
+                if name in _SURROGATE:
+                    update['id'] = existing['id']
+                else:
+                    update.update(zip(key, k))
+                updates.append((k, changed, update))
+        deletes, kept = [], {}
+        for k in current:
+            if k in seen:
+                continue
+            parent = k[:3] if name in _SURROGATE else k[:-1]
+            attached = {} if name in _SURROGATE else _attached_to(attachments, k)
+            if not prune or (not force and (attached or parent in protected)):
+                kept[k] = attached
+                if name not in _SURROGATE:
+                    protected.add(k)
+            else:
+                deletes.append(current[k]['id'] if name in _SURROGATE else k)
+        if prune:
+            deletes += duplicates
+        diff[name] = TableDiff(inserts, updates, deletes, kept)
+    return diff
+
+
+def apply_curriculum_diff(diff):
+    """Write a ``diff_curriculum`` result in bulk (caller commits, so it is one transaction).
+
+    Deletes run children first and inserts parents first; each kind of
+    change is one statement per table. Students who already started a track
+    get locked progress rows for its new units.
+    """
+    from app.utils.curriculum_cache import bump_curriculum_version
+    from app.utils.track_progress import invalidate_count_index
+    from app.utils.unit_progress import backfill_unit_progress
+
+    for name, model, key in reversed(TABLES):
+        deletes = diff[name].deletes
+        if not deletes:
+            continue
+        if name in _SURROGATE:
+            where = model.id.in_(deletes)
+        else:
+            where = db.tuple_(*[getattr(model, c) for c in key]).in_(deletes)
+        db.session.execute(db.delete(model).where(where))
+
+    for name, model, _key in TABLES:
+        if diff[name].inserts:
+            db.session.execute(db.insert(model), diff[name].inserts)
+        # Rows carry the primary key, so this is an executemany UPDATE by PK
+        updates = [update for _k, _changed, update in diff[name].updates]
+        for fields in {frozenset(u) for u in updates}:
+            db.session.execute(db.update(model), [u for u in updates if frozenset(u) == fields])
+
+    if any(d.inserts or d.updates or d.deletes for d in diff.values()):
+        # Bulk statements bypass the mapper events that keep the caches fresh
+        bump_curriculum_version()
+        invalidate_count_index()
+    for track_id in sorted({u['track_id'] for u in diff['units'].inserts}):
+        backfill_unit_progress(track_id)
+
+
+def sync_curriculum(track_ids=None, prune=False, force=False, dry_run=False):
+    """Diff ``data/*.py`` against the DB and, unless ``dry_run``, apply it (caller commits)."""
+    diff = diff_curriculum(track_ids, prune, force)
+    if not dry_run:
+        apply_curriculum_diff(diff)
+    return diff
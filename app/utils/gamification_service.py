@@ -1,52 +1,69 @@
-from datetime import datetime, timezone
+from datetime import datetime, date, timedelta, timezone
+from sqlalchemy import case, func, or_
 from app.extensions import db
-from app.models.gamification import StudentXP, Badge, StudentBadge, Streak, BadgeCriteria
+from app.models.gamification import StudentXP, Streak, XPSource
 from app.models.journey import (
     JourneyMilestone, MilestoneType, Quest, StudentQuest, QuestStatus,
     Activity, StudentActivity, StudentWallet
 )
-from app.models.classroom import Attendance
-from app.models.homework import HomeworkSubmission
-from app.utils.wallet import get_or_create_wallet, award_coins, award_gems
-
-
-def check_and_award_badges(student_id):
-    """Check all badge criteria and award any missing badges."""
-    earned_ids = {row.badge_id for row in
-                  db.session.query(StudentBadge.c.badge_id).filter(
-                      StudentBadge.c.student_id == student_id).all()}
-    all_badges = Badge.query.all()
-    total_xp = StudentXP.total_xp(student_id)
-
-    for badge in all_badges:
-        if badge.id in earned_ids:
-            continue
-
-        earned = False
-        if badge.criteria_type == BadgeCriteria.XP_EARNED:
-            earned = total_xp >= badge.criteria_value
-        elif badge.criteria_type == BadgeCriteria.SESSIONS_ATTENDED:
-            count = Attendance.query.filter_by(student_id=student_id).count()
-            earned = count >= badge.criteria_value
-        elif badge.criteria_type == BadgeCriteria.STREAK_DAYS:
-            streak = Streak.query.filter_by(student_id=student_id).first()
-            earned = streak and streak.longest_streak >= badge.criteria_value
-        elif badge.criteria_type == BadgeCriteria.ASSIGNMENTS_COMPLETED:
-            count = HomeworkSubmission.query.filter(
-                HomeworkSubmission.student_id == student_id,
-                HomeworkSubmission.grade.isnot(None)
-            ).count()
-            earned = count >= badge.criteria_value
-
-        if earned:
-            db.session.execute(StudentBadge.insert().values(
-                student_id=student_id, badge_id=badge.id
-            ))
-            record_milestone(student_id, MilestoneType.BADGE_EARNED,
-                             f'حصلت على شارة {badge.name_ar}',
-                             f'Earned badge: {badge.name}',
-                             badge.name)
-
+from app.utils.wallet import get_or_create_wallet, credit
+from app.utils.student_stats import get_student_stats, bump_stats
+from app.utils.leaderboard import record_xp
+from app.utils.xp_rollup import record_daily_xp
+from app.utils.badge_engine import BadgeEvent, handle_events
+from app.utils.hud import get_hud, invalidate_hud
+
+
+def add_xp(student_id, amount, reason, session_id=None, track_id=None, source=None,
+           level_id=None, unit_id=None, quest_id=None, activity_id=None, **counters):
+    """Append an XP ledger row and bump the student's stats in the same transaction.
+
+    Every XP award goes through here; the caller owns the commit. ``source``
+    (an XPSource) and the track/unit/quest/activity/session ids are stored as
+    columns so per-track and per-source totals never depend on ``reason``.
+    Extra stats counters earned by the same action (``quests_completed=1`` ...)
+    are passed through so the stats row is touched exactly once. The daily
+    rollup bucket is upserted at commit; leaderboards after it succeeds.
+    """
+    xp = StudentXP(student_id=student_id, amount=amount, reason=reason, session_id=session_id,
+                   source_type=(source or XPSource.MANUAL).value, track_id=track_id,
+                   level_id=level_id, unit_id=unit_id, quest_id=quest_id, activity_id=activity_id)
+    db.session.add(xp)
+    bump_stats(student_id, xp=amount, **counters)
+    record_daily_xp(student_id, amount, track_id=track_id)
+    record_xp(student_id, amount, track_id=track_id)
+    return xp
+
+
+def session_attribution(session_id):
+    """add_xp keyword ids for XP earned in a live session (track/level/unit of the session)."""
+    from app.models.classroom import Session, Group
+    row = db.session.query(
+        Session.unit_track_id, Session.unit_level_id, Session.unit_id, Group.track_id,
+    ).outerjoin(Group, Group.id == Session.group_id).filter(Session.id == session_id).first()
+    if row is None:
+        return {'session_id': session_id}
+    return {'session_id': session_id, 'track_id': row.unit_track_id or row.track_id,
+            'level_id': row.unit_level_id, 'unit_id': row.unit_id}
+
+
+def track_xp(student_id, track_id):
+    """XP a student earned in one track (range scan on ix_student_xp_student_track)."""
+    return db.session.query(func.coalesce(func.sum(StudentXP.amount), 0)).filter(
+        StudentXP.student_id == student_id, StudentXP.track_id == track_id,
+    ).scalar() or 0
+
+
+def xp_by_source(student_id):
+    """{XPSource value: total XP} for one student."""
+    rows = db.session.query(StudentXP.source_type, func.sum(StudentXP.amount)).filter(
+        StudentXP.student_id == student_id).group_by(StudentXP.source_type)
+    return {source or XPSource.MANUAL.value: int(total or 0) for source, total in rows}
+
+
+def check_and_award_badges(student_id, *events):
+    """Run badge events for a student (every criteria type when none are given) and commit."""
+    handle_events(student_id, *events)
     db.session.commit()
 
 
@@ -57,8 +74,44 @@ def update_student_streak(student_id):
         streak = Streak(student_id=student_id)
         db.session.add(streak)
     streak.update_streak()
+    invalidate_hud(student_id)
     db.session.commit()
-    check_and_award_badges(student_id)
+    check_and_award_badges(student_id, BadgeEvent.STREAK_UPDATED)
+
+
+def update_streaks_many(student_ids, today=None):
+    """Set-based ``Streak.update_streak`` for many students (caller commits).
+
+    ``today`` is the day the activity happened (default: now), so buffered
+    activity is credited to its own day. A streak already past that day is
+    left alone.
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    invalidate_hud(*student_ids)
+    today = today or date.today()
+    existing = {sid for (sid,) in db.session.query(Streak.student_id).filter(
+        Streak.student_id.in_(student_ids))}
+    missing = [sid for sid in student_ids if sid not in existing]
+    if missing:
+        db.session.execute(db.insert(Streak).values([
+            {'student_id': sid, 'current_streak': 0, 'longest_streak': 0} for sid in missing
+        ]))
+    new_current = case(
+        (Streak.last_activity_date == today - timedelta(days=1), Streak.current_streak + 1),
+        else_=1,
+    )
+    db.session.execute(
+        db.update(Streak)
+        .where(Streak.student_id.in_(student_ids),
+               or_(Streak.last_activity_date.is_(None), Streak.last_activity_date < today))
+        .values(current_streak=new_current,
+                longest_streak=case((new_current > Streak.longest_streak, new_current),
+                                    else_=Streak.longest_streak),
+                last_activity_date=today)
+        .execution_options(synchronize_session=False)
+    )
 
 
 def record_milestone(student_id, milestone_type, title_ar, title_en='', detail=None):
@@ -80,24 +133,21 @@ def award_quest_rewards(student_id, quest_id):
         return
 
     if quest.xp_reward:
-        xp = StudentXP(student_id=student_id, amount=quest.xp_reward,
-                        reason=f'إكمال مهمة: {quest.title_ar}')
-        db.session.add(xp)
-
-    if quest.coin_reward:
-        wallet = get_or_create_wallet(student_id)
-        wallet.coins += quest.coin_reward
+        add_xp(student_id, quest.xp_reward, f'إكمال مهمة: {quest.title_ar}',
+               source=XPSource.QUEST, track_id=quest.track_id, quest_id=quest.id,
+               quests_completed=1)
+    else:
+        bump_stats(student_id, quests_completed=1)
 
-    if quest.gem_reward:
-        wallet = get_or_create_wallet(student_id)
-        wallet.gems += quest.gem_reward
+    credit(student_id, coins=quest.coin_reward or 0, gems=quest.gem_reward or 0,
+           reason=f'إكمال مهمة: {quest.title_ar}')
 
     record_milestone(student_id, MilestoneType.QUEST_COMPLETED,
                      f'أكملت مهمة: {quest.title_ar}',
                      f'Completed quest: {quest.title}',
                      quest.title)
     db.session.commit()
-    check_and_award_badges(student_id)
+    check_and_award_badges(student_id, BadgeEvent.XP_EARNED)
 
 
 def award_activity_rewards(student_id, activity_id):
@@ -107,49 +157,38 @@ def award_activity_rewards(student_id, activity_id):
         return
 
     if activity.xp_reward:
-        xp = StudentXP(student_id=student_id, amount=activity.xp_reward,
-                        reason=f'إكمال نشاط: {activity.title_ar}')
-        db.session.add(xp)
+        add_xp(student_id, activity.xp_reward, f'إكمال نشاط: {activity.title_ar}',
+               source=XPSource.ACTIVITY, track_id=activity.track_id,
+               level_id=activity.level_id, unit_id=activity.unit_id,
+               quest_id=activity.quest_id, activity_id=activity.id,
+               session_id=activity.session_id, activities_completed=1)
+    else:
+        bump_stats(student_id, activities_completed=1)
 
-    if activity.coin_reward:
-        wallet = get_or_create_wallet(student_id)
-        wallet.coins += activity.coin_reward
+    credit(student_id, coins=activity.coin_reward or 0,
+           reason=f'إكمال نشاط: {activity.title_ar}')
 
     db.session.commit()
-    check_and_award_badges(student_id)
+    check_and_award_badges(student_id, BadgeEvent.XP_EARNED)
 
 
 def get_student_journey_stats(student_id):
     """Get aggregated stats for the student journey."""
-    total_xp = StudentXP.total_xp(student_id)
-    level = StudentXP.current_level(total_xp)
-    level_title_ar, level_title_en = StudentXP.level_title(level)
-    wallet = get_or_create_wallet(student_id)
-    streak = Streak.query.filter_by(student_id=student_id).first()
-
-    quests_completed = StudentQuest.query.filter_by(
-        student_id=student_id, status=QuestStatus.COMPLETED).count()
-    activities_completed = StudentActivity.query.filter_by(
-        student_id=student_id, status='completed').count()
-
-    # XP thresholds for progress
-    thresholds = [0, 100, 300, 600, 1000, 1500, 2200, 3000, 4000, 5000,
-                  6500, 8000, 10000, 12500, 15000, 18000, 21000, 25000]
-    current_threshold = thresholds[level - 1] if level <= len(thresholds) else thresholds[-1]
-    next_threshold = thresholds[level] if level < len(thresholds) else thresholds[-1] + 5000
-    xp_progress = ((total_xp - current_threshold) / max(next_threshold - current_threshold, 1)) * 100
+    hud = get_hud(student_id)
+    stats = get_student_stats(student_id)
+    level_title_ar, level_title_en = StudentXP.level_title(hud.level)
 
     return {
-        'total_xp': total_xp,
-        'level': level,
+        'total_xp': hud.total_xp,
+        'level': hud.level,
         'level_title_ar': level_title_ar,
         'level_title_en': level_title_en,
-        'coins': wallet.coins,
-        'gems': wallet.gems,
-        'current_streak': streak.current_streak if streak else 0,
-        'longest_streak': streak.longest_streak if streak else 0,
-        'quests_completed': quests_completed,
-        'activities_completed': activities_completed,
-        'xp_progress': min(xp_progress, 100),
-        'next_threshold': next_threshold,
+        'coins': hud.coins,
+        'gems': hud.gems,
+        'current_streak': hud.current_streak,
+        'longest_streak': hud.longest_streak,
+        'quests_completed': stats.quests_completed,
+        'activities_completed': stats.activities_completed,
+        'xp_progress': hud.xp_progress,
+        'next_threshold': hud.next_threshold,
     }
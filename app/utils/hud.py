@@ -0,0 +1,116 @@
+import json
+from collections import namedtuple
+from flask import g, has_app_context
+from sqlalchemy import event
+from app.extensions import db
+from app.models.gamification import StudentStats, Streak, LEVEL_THRESHOLDS
+from app.models.journey import StudentWallet
+from app.utils.redis_client import get_redis, REDIS_ERRORS
+
+HUD_TTL = 30  # seconds; award/spend paths invalidate explicitly, the TTL is a safety net
+
+StreakSnapshot = namedtuple('StreakSnapshot', 'current_streak longest_streak')
+
+
+class HudSnapshot(namedtuple('HudSnapshot', 'coins gems total_xp level xp_progress '
+                                            'next_threshold current_streak longest_streak')):
+    __slots__ = ()
+
+    @property
+    def streak(self):
+        """The streak part, read like a ``Streak`` row (``.current_streak``)."""
+        return StreakSnapshot(self.current_streak, self.longest_streak)
+
+
+def _key(student_id):
+    return f'hud:{student_id}'
+
+
+def level_progress(total_xp, level):
+    """(percent through the current level, XP needed for the next one)."""
+    thresholds = LEVEL_THRESHOLDS
+    current_threshold = thresholds[level - 1] if level <= len(thresholds) else thresholds[-1]
+    next_threshold = thresholds[level] if level < len(thresholds) else thresholds[-1] + 5000
+    xp_progress = ((total_xp - current_threshold) / max(next_threshold - current_threshold, 1)) * 100
+    return min(xp_progress, 100), next_threshold
+
+
+def _compute(student_id):
+    row = db.session.query(
+        StudentStats.total_xp, StudentStats.level,
+        StudentWallet.coins, StudentWallet.gems,
+        Streak.current_streak, Streak.longest_streak,
+    ).select_from(StudentStats).outerjoin(
+        StudentWallet, StudentWallet.student_id == StudentStats.student_id
+    ).outerjoin(
+        Streak, Streak.student_id == StudentStats.student_id
+    ).filter(StudentStats.student_id == student_id).first()
+    if row is None:
+        from app.utils.student_stats import get_student_stats
+        if get_student_stats(student_id) is None:
+            return HudSnapshot(0, 0, 0, 1, 0, LEVEL_THRESHOLDS[1], 0, 0)
+        return _compute(student_id)
+
+    xp_progress, next_threshold = level_progress(row.total_xp, row.level)
+    return HudSnapshot(
+        coins=row.coins or 0, gems=row.gems or 0,
+        total_xp=row.total_xp, level=row.level,
+        xp_progress=xp_progress, next_threshold=next_threshold,
+        current_streak=row.current_streak or 0, longest_streak=row.longest_streak or 0,
+    )
+
+
+def get_hud(student_id):
+    """Coins, gems, XP, level, progress and streak for the top bar.
+
+    Memoized on ``g`` for the request and cached in Redis for ``HUD_TTL``
+    seconds; a miss costs one joined query. Redis is only a cache here, so
+    when it is down the snapshot is computed from the database instead.
+    """
+    memo = g.setdefault('_hud', {})
+    if student_id in memo:
+        return memo[student_id]
+
+    r = get_redis()
+    try:
+        raw = r.get(_key(student_id))
+    except REDIS_ERRORS as e:
+        print(f'[HUD] cache read failed: {e}')
+        raw = r = None
+    if raw:
+        snapshot = HudSnapshot(*json.loads(raw))
+    else:
+        snapshot = _compute(student_id)
+        if r is not None:
+            try:
+                r.set(_key(student_id), json.dumps(list(snapshot)), ex=HUD_TTL)
+            except REDIS_ERRORS as e:
+                print(f'[HUD] cache write failed: {e}')
+    memo[student_id] = snapshot
+    return snapshot
+
+
+def invalidate_hud(*student_ids):
+    """Drop cached snapshots; the shared tier is cleared when the transaction ends.
+
+    Clearing on rollback too means a snapshot cached from uncommitted rows
+    never outlives the transaction.
+    """
+    if has_app_context():
+        memo = g.get('_hud')
+        if memo:
+            for student_id in student_ids:
+                memo.pop(student_id, None)
+    db.session.info.setdefault('hud_stale', set()).update(student_ids)
+
+
+@event.listens_for(db.session, 'after_commit')
+@event.listens_for(db.session, 'after_rollback')
+def _clear_stale(session):
+    stale = session.info.pop('hud_stale', None)
+    if not stale:
+        return
+    try:
+        get_redis().delete(*[_key(sid) for sid in stale])
+    except Exception as e:
+        print(f'[HUD] cache invalidation failed: {e}')
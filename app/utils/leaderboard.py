@@ -0,0 +1,201 @@
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, func
+from app.extensions import db
+from app.models.user import User, Role
+from app.models.gamification import StudentXP, StudentStats, StudentXPDaily
+from app.models.classroom import GroupStudent
+from app.utils.redis_client import get_redis
+
+PERIODS = ('all_time', 'weekly', 'monthly')
+PERIOD_TTL = {'weekly': 15 * 86400, 'monthly': 62 * 86400}
+BUILT_KEY = 'lb:built'
+
+LeaderboardRow = namedtuple('LeaderboardRow', 'rank student_id name name_ar avatar xp level')
+
+
+# ─── Keys ───────────────────────────────────────────────────────────────────
+
+def _period_suffix(period, now=None):
+    now = now or datetime.now(timezone.utc)
+    if period == 'weekly':
+        year, week, _ = now.isocalendar()
+        return f'{year}-W{week:02d}'
+    if period == 'monthly':
+        return now.strftime('%Y-%m')
+    return ''
+
+
+def _period_start(period, now=None):
+    now = now or datetime.now(timezone.utc)
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+    if period == 'weekly':
+        return day - timedelta(days=day.weekday())
+    if period == 'monthly':
+        return day.replace(day=1)
+    return None
+
+
+def board_key(period='all_time', group_id=None, track_id=None, now=None):
+    """Redis key of one board, e.g. ``lb:weekly:2026-W42:group:3``."""
+    key = f'lb:{period}'
+    suffix = _period_suffix(period, now)
+    if suffix:
+        key += f':{suffix}'
+    if group_id is not None:
+        key += f':group:{group_id}'
+    elif track_id is not None:
+        key += f':track:{track_id}'
+    return key
+
+
+def _scopes(group_ids, track_id):
+    yield {}
+    for gid in group_ids:
+        yield {'group_id': gid}
+    if track_id:
+        yield {'track_id': track_id}
+
+
+# ─── Writes ─────────────────────────────────────────────────────────────────
+
+def record_xp(student_id, amount, track_id=None):
+    """Queue an XP award for the boards; applied only once the DB transaction commits."""
+    group_ids = [gid for (gid,) in db.session.query(GroupStudent.group_id).filter_by(
+        student_id=student_id)]
+    db.session.info.setdefault('leaderboard_pending', []).append(
+        (student_id, amount, group_ids, track_id))
+
+
+def record_xp_many(student_ids, amount, track_id=None):
+    """``record_xp`` for a batch of students sharing one award (one membership query)."""
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    groups = {}
+    for gid, sid in db.session.query(GroupStudent.group_id, GroupStudent.student_id).filter(
+            GroupStudent.student_id.in_(student_ids)):
+        groups.setdefault(sid, []).append(gid)
+    db.session.info.setdefault('leaderboard_pending', []).extend(
+        (sid, amount, groups.get(sid, []), track_id) for sid in student_ids)
+
+
+def _apply(pending):
+    now = datetime.now(timezone.utc)
+    pipe = get_redis().pipeline(transaction=False)
+    for student_id, amount, group_ids, track_id in pending:
+        for period in PERIODS:
+            for scope in _scopes(group_ids, track_id):
+                key = board_key(period, now=now, **scope)
+                pipe.zincrby(key, amount, student_id)
+                if period in PERIOD_TTL:
+                    pipe.expire(key, PERIOD_TTL[period])
+    pipe.execute()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _flush_pending(session):
+    pending = session.info.pop('leaderboard_pending', None)
+    if not pending:
+        return
+    try:
+        _apply(pending)
+    except Exception as e:
+        # Boards are derived data; `flask leaderboard rebuild` repairs them
+        print(f'[LEADERBOARD] update failed: {e}')
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_pending(session):
+    session.info.pop('leaderboard_pending', None)
+
+
+def rebuild_leaderboards():
+    """Recreate the all-time, current weekly and current monthly boards.
+
+    Scores come from the daily XP buckets (student_xp_daily), so a weekly
+    board sums at most seven rows per student instead of scanning the ledger.
+    Global and group boards use per-student totals, track boards per-(student,
+    track) totals.
+    """
+    r = get_redis()
+    now = datetime.now(timezone.utc)
+    students = [sid for (sid,) in db.session.query(User.id).filter(User.role == Role.STUDENT)]
+    memberships = db.session.query(GroupStudent.group_id, GroupStudent.student_id).all()
+
+    pipe = r.pipeline()
+    for period in PERIODS:
+        start = _period_start(period, now)
+        buckets = db.session.query(
+            StudentXPDaily.student_id, StudentXPDaily.track_id, func.sum(StudentXPDaily.xp),
+        )
+        if start is not None:
+            buckets = buckets.filter(StudentXPDaily.day >= start.date())
+        scores, by_track = {}, []
+        for sid, track_id, total in buckets.group_by(StudentXPDaily.student_id,
+                                                     StudentXPDaily.track_id):
+            scores[sid] = scores.get(sid, 0) + int(total or 0)
+            if track_id:
+                by_track.append((sid, track_id, int(total or 0)))
+        if period == 'all_time':
+            scores = {sid: scores.get(sid, 0) for sid in students}
+
+        boards = {board_key(period, now=now): scores}
+        for gid, sid in memberships:
+            if sid in scores:
+                boards.setdefault(board_key(period, group_id=gid, now=now), {})[sid] = scores[sid]
+
+        for sid, track_id, total in by_track:
+            boards.setdefault(board_key(period, track_id=track_id, now=now), {})[sid] = total
+
+        for key, mapping in boards.items():
+            pipe.delete(key)
+            if mapping:
+                pipe.zadd(key, mapping)
+                if period in PERIOD_TTL:
+                    pipe.expire(key, PERIOD_TTL[period])
+    pipe.set(BUILT_KEY, now.isoformat())
+    pipe.execute()
+    return len(students)
+
+
+def _ensure_built(r):
+    if not r.exists(BUILT_KEY):
+        rebuild_leaderboards()
+
+
+# ─── Reads ──────────────────────────────────────────────────────────────────
+
+def top(period='all_time', limit=50, group_id=None, track_id=None):
+    """Top ``limit`` students of a board as LeaderboardRow tuples."""
+    r = get_redis()
+    _ensure_built(r)
+    ranked = r.zrevrange(board_key(period, group_id, track_id), 0, limit - 1, withscores=True)
+    if not ranked:
+        return []
+
+    ids = [int(member) for member, _ in ranked]
+    users = {row.id: row for row in db.session.query(
+        User.id, User.name_ar, User.avatar_url, StudentStats.level
+    ).outerjoin(StudentStats, StudentStats.student_id == User.id).filter(User.id.in_(ids))}
+
+    rows = []
+    for member, score in ranked:
+        user = users.get(int(member))
+        if user is None:
+            continue
+        xp = int(score)
+        rows.append(LeaderboardRow(
+            rank=len(rows) + 1, student_id=user.id, name=user.name_ar,
+            name_ar=user.name_ar, avatar=user.avatar_url, xp=xp,
+            level=user.level or StudentXP.current_level(xp),
+        ))
+    return rows
+
+
+def rank(student_id, period='all_time', group_id=None, track_id=None):
+    """1-based rank of a student on a board, or None if they are not on it."""
+    r = get_redis()
+    _ensure_built(r)
+    position = r.zrevrank(board_key(period, group_id, track_id), student_id)
+    return position + 1 if position is not None else None
@@ -0,0 +1,253 @@
+"""Shared Redis connection with an in-process fallback for local development.
+
+``get_redis()`` returns a client for ``REDIS_URL``. Only when no URL is
+configured (development/testing) does it fall back to ``fakeredis`` if
+installed, otherwise to ``MemoryRedis`` — a small thread-safe stand-in that
+implements the subset of commands this app uses. The fallback lives in the
+worker process, so it is only suitable for single-worker setups. A configured
+but unreachable server is never replaced by the fallback: each worker would
+silently serve its own leaderboards, HUD cache and room state.
+"""
+import threading
+import time
+from flask import current_app
+
+try:
+    from redis import RedisError
+except ImportError:  # only the in-process fallback is usable
+    RedisError = ConnectionError
+
+# What a Redis-backed cache should treat as "cache unavailable"
+REDIS_ERRORS = (RedisError, ConnectionError)
+
+
+class MemoryRedis:
+    """In-process subset of the redis-py API (strings, hashes, sorted sets, TTLs, pipelines)."""
+
+    def __init__(self):
+        self._data = {}
+        self._expiry = {}
+        self._lock = threading.RLock()
+
+    # ─── Internals ───────────────────────────────────────────────────────
+
+    def _alive(self, key):
+        deadline = self._expiry.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return key in self._data
+
+    def _zset(self, key, create=False):
+        if self._alive(key):
+            return self._data[key]
+        if create:
+            self._data[key] = {}
+            return self._data[key]
+        return {}
+
+    def _hash(self, key, create=False):
+        if self._alive(key):
+            return self._data[key]
+        if create:
+            self._data[key] = {}
+            return self._data[key]
+        return {}
+
+    def _sorted(self, key, desc):
+        items = self._zset(key).items()
+        return sorted(items, key=lambda kv: (kv[1], kv[0]), reverse=desc)
+
+    @staticmethod
+    def _slice(items, start, end):
+        end = len(items) if end == -1 else end + 1
+        return items[start:end]
+
+    # ─── Keys / strings ──────────────────────────────────────────────────
+
+    def ping(self):
+        return True
+
+    def get(self, key):
+        with self._lock:
+            return self._data.get(key) if self._alive(key) else None
+
+    def set(self, key, value, ex=None, nx=False):
+        with self._lock:
+            if nx and self._alive(key):
+                return None
+            self._data[key] = str(value)
+            self._expiry.pop(key, None)
+            if ex:
+                self._expiry[key] = time.monotonic() + ex
+            return True
+
+    def incr(self, key, amount=1):
+        with self._lock:
+            value = int(self._data.get(key, 0) if self._alive(key) else 0) + amount
+            self._data[key] = str(value)
+            return value
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expiry.pop(key, None)
+            return removed
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expiry[key] = time.monotonic() + seconds
+            return True
+
+    # ─── Hashes ──────────────────────────────────────────────────────────
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        with self._lock:
+            fields = dict(mapping or {})
+            if field is not None:
+                fields[field] = value
+            h = self._hash(key, create=True)
+            added = sum(1 for f in fields if str(f) not in h)
+            for f, v in fields.items():
+                h[str(f)] = str(v)
+            return added
+
+    def hsetnx(self, key, field, value):
+        with self._lock:
+            h = self._hash(key, create=True)
+            if str(field) in h:
+                return False
+            h[str(field)] = str(value)
+            return True
+
+    def hget(self, key, field):
+        with self._lock:
+            return self._hash(key).get(str(field))
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._hash(key))
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            h = self._hash(key, create=True)
+            h[str(field)] = str(int(h.get(str(field), 0)) + amount)
+            return int(h[str(field)])
+
+    def hdel(self, key, *fields):
+        with self._lock:
+            h = self._hash(key)
+            return sum(1 for f in fields if h.pop(str(f), None) is not None)
+
+    def hlen(self, key):
+        with self._lock:
+            return len(self._hash(key))
+
+    # ─── Sorted sets ─────────────────────────────────────────────────────
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            zset = self._zset(key, create=True)
+            added = sum(1 for member in mapping if str(member) not in zset)
+            for member, score in mapping.items():
+                zset[str(member)] = float(score)
+            return added
+
+    def zincrby(self, key, amount, member):
+        with self._lock:
+            zset = self._zset(key, create=True)
+            zset[str(member)] = zset.get(str(member), 0.0) + float(amount)
+            return zset[str(member)]
+
+    def zscore(self, key, member):
+        with self._lock:
+            return self._zset(key).get(str(member))
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._zset(key))
+
+    def zrevrank(self, key, member):
+        with self._lock:
+            for i, (m, _score) in enumerate(self._sorted(key, desc=True)):
+                if m == str(member):
+                    return i
+            return None
+
+    def zrevrange(self, key, start, end, withscores=False):
+        with self._lock:
+            items = self._slice(self._sorted(key, desc=True), start, end)
+            return list(items) if withscores else [m for m, _ in items]
+
+    def pipeline(self, transaction=True):
+        return _MemoryPipeline(self)
+
+
+class _MemoryPipeline:
+    """Buffers commands and runs them under the store lock on ``execute()``."""
+
+    def __init__(self, store):
+        self._store = store
+        self._calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._store, name)
+
+        def queue(*args, **kwargs):
+            self._calls.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._store._lock:
+            results = [method(*args, **kwargs) for method, args, kwargs in self._calls]
+        self._calls = []
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._calls = []
+
+
+def _fallback_client():
+    try:
+        import fakeredis
+        return fakeredis.FakeRedis(decode_responses=True)
+    except ImportError:
+        return MemoryRedis()
+
+
+def get_redis():
+    """Return the app-wide Redis client, creating it on first use."""
+    app = current_app._get_current_object()
+    client = app.extensions.get('redis')
+    if client is not None:
+        return client
+
+    url = app.config.get('REDIS_URL')
+    if url:
+        import redis
+        client = redis.Redis.from_url(url, decode_responses=True,
+                                      socket_connect_timeout=2)
+        try:
+            client.ping()
+        except redis.RedisError as e:
+            # Keep the real client: it reconnects on the next command, so
+            # callers fail loudly until Redis is back instead of diverging
+            print(f'[REDIS] ERROR: {url} unreachable ({e}); commands will fail until it is back')
+    else:
+        client = _fallback_client()
+    app.extensions['redis'] = client
+    return client
@@ -0,0 +1,203 @@
+"""Scoring and XP for in-class activities started by the teacher.
+
+``start_activity`` compiles the activity into an ``AnswerKey`` once: the MCQ
+choice, the drag-drop order as a tuple and a {(line, blank): answer} lookup
+for fill-in-the-blank. The key is stored next to the activity in Redis and
+memoized per worker, so scoring a submission is a few lookups. XP earned is
+added to a shared Redis hash and written to the ledger in one bulk insert at
+``end_activity`` or by the room flusher, not one commit per answer.
+"""
+import json
+from collections import namedtuple
+from app.extensions import db
+from app.utils import room_state
+from app.utils.redis_client import get_redis
+from app.utils.room_flush import ensure_room_flusher
+
+XP_PER_CORRECT = 10
+PERFECT_BONUS = 15
+PENDING_XP_KEY = 'room:pending:xp'          # [session_id, activity_id, student_id] -> XP
+PENDING_TITLES_KEY = 'room:pending:xp:titles'  # [session_id, activity_id] -> title
+
+# ``order`` is a tuple for drag-drop; ``blanks`` maps (line, blank) to the
+# stripped expected answer for fill-in-the-blank; ``total`` is never 0.
+AnswerKey = namedtuple('AnswerKey', 'activity_id type title correct order blanks total')
+
+_keys = {}  # {(session_id, activity_id): AnswerKey}, this worker's memo
+_MAX_KEYS = 256
+
+
+def compile_answer_key(activity):
+    atype = activity.get('type', '')
+    correct, order, blanks, total = None, (), {}, 1
+    if atype == 'mcq':
+        correct = activity.get('correct')
+    elif atype == 'dragdrop':
+        order = tuple(activity.get('correctOrder') or ())
+        total = len(order) or 1
+    elif atype == 'fillblank':
+        for line_idx, line in enumerate(activity.get('lines', [])):
+            for blank_idx, blank in enumerate(line.get('blanks', [])):
+                blanks[(line_idx, blank_idx)] = blank.get('answer', '').strip()
+        total = len(blanks) or 1
+    return AnswerKey(activity.get('id', ''), atype, activity.get('title', 'نشاط'),
+                     correct, order, blanks, total)
+
+
+def _key_to_json(key):
+    return dict(key._asdict(), order=list(key.order),
+                blanks=[[line, blank, answer] for (line, blank), answer in key.blanks.items()])
+
+
+def _key_from_json(data):
+    return AnswerKey(**dict(data, order=tuple(data['order']),
+                            blanks={(line, blank): answer for line, blank, answer in data['blanks']}))
+
+
+def _remember(session_id, key):
+    if len(_keys) >= _MAX_KEYS:
+        _keys.clear()
+    _keys[(str(session_id), key.activity_id)] = key
+
+
+def start_activity(session_id, activity):
+    """Compile and store ``activity`` as the session's active one; returns its AnswerKey."""
+    key = compile_answer_key(activity)
+    room_state.start_activity(session_id, activity, _key_to_json(key))
+    _remember(session_id, key)
+    return key
+
+
+def answer_key(session_id, activity_id):
+    """The AnswerKey of ``activity_id`` if it is still the session's active activity."""
+    if room_state.activity_field(session_id, 'id') != activity_id:
+        return None
+    key = _keys.get((str(session_id), activity_id))
+    if key is None:
+        data = room_state.activity_field(session_id, 'answer_key')
+        if data is None:
+            return None
+        key = _key_from_json(data)
+        _remember(session_id, key)
+    return key
+
+
+def score(key, answer):
+    """(correct, total) for one submission."""
+    if not isinstance(answer, dict):
+        answer = {}
+    correct = 0
+    if key.type == 'mcq':
+        correct = int(answer.get('selected', -1) == key.correct)
+    elif key.type == 'dragdrop':
+        correct = sum(1 for given, expected in zip(answer.get('order') or (), key.order)
+                      if given == expected)
+    elif key.type == 'fillblank':
+        matched = set()
+        for ans in answer.get('answers') or ():
+            position = (ans.get('line', 0), ans.get('blank', 0))
+            value = ans.get('value', '')
+            if (position not in matched and isinstance(value, str)
+                    and key.blanks.get(position) == value.strip()):
+                matched.add(position)
+        correct = len(matched)
+    elif key.type == 'code':
+        correct = 1  # teacher reviews code manually
+    return correct, key.total
+
+
+def xp_for(correct, total):
+    xp = correct * XP_PER_CORRECT
+    if correct == total and total > 0:
+        xp += PERFECT_BONUS
+    return xp
+
+
+def end_activity(session_id, activity_id=None):
+    """Clear the active activity and write its pending XP."""
+    room_state.end_activity(session_id, activity_id)
+    _keys.pop((str(session_id), activity_id), None)
+    try:
+        flush_activity_xp()
+    except Exception as e:  # requeued; the room flusher retries
+        print(f'[ROOM] activity XP flush failed: {e}')
+
+
+# ─── XP buffer ──────────────────────────────────────────────────────────────
+
+def queue_xp(session_id, key, student_id, amount):
+    """Add ``amount`` to the student's pending XP for this activity; no database access."""
+    pipe = get_redis().pipeline()
+    session_id, student_id = int(session_id), int(student_id)
+    pipe.hincrby(PENDING_XP_KEY, json.dumps([session_id, key.activity_id, student_id]), amount)
+    pipe.hset(PENDING_TITLES_KEY, json.dumps([session_id, key.activity_id]), key.title)
+    pipe.execute()
+    ensure_room_flusher()
+
+
+def flush_activity_xp():
+    """Write all pending activity XP in one ledger insert and commit; returns the rows written.
+
+    Each student's XP is summed per track, then students are grouped by that
+    total so stats, daily buckets and leaderboards get one batched update per
+    distinct amount.
+    """
+    from app.models.gamification import StudentXP, XPSource
+    from app.utils.gamification_service import session_attribution
+    from app.utils.student_stats import bump_stats_many
+    from app.utils.xp_rollup import record_daily_xp_many
+    from app.utils.leaderboard import record_xp_many
+
+    redis = get_redis()
+    pipe = redis.pipeline()
+    pipe.hgetall(PENDING_XP_KEY)
+    pipe.hgetall(PENDING_TITLES_KEY)
+    pipe.delete(PENDING_XP_KEY, PENDING_TITLES_KEY)
+    pending, titles, _ = pipe.execute()
+    if not pending:
+        return 0
+
+    try:
+        attribution = {}
+        rows = []
+        totals = {}  # {(student_id, track_id): XP}
+        for field, amount in pending.items():
+            session_id, activity_id, student_id = json.loads(field)
+            amount = int(amount)
+            if amount <= 0:
+                continue
+            if session_id not in attribution:
+                ids = session_attribution(session_id)
+                if 'track_id' not in ids:  # session was deleted
+                    ids = {'session_id': None}
+                attribution[session_id] = ids
+            ids = attribution[session_id]
+            title = titles.get(json.dumps([session_id, activity_id]), 'نشاط')
+            rows.append({
+                'student_id': student_id, 'amount': amount, 'reason': f'نشاط: {title}',
+                'source_type': XPSource.ROOM_ACTIVITY.value, 'session_id': ids['session_id'],
+                'track_id': ids.get('track_id'), 'level_id': ids.get('level_id'),
+                'unit_id': ids.get('unit_id'),
+            })
+            key = (student_id, ids.get('track_id'))
+            totals[key] = totals.get(key, 0) + amount
+        if rows:
+            db.session.execute(db.insert(StudentXP), rows)
+            by_award = {}
+            for (student_id, track_id), amount in totals.items():
+                by_award.setdefault((amount, track_id), []).append(student_id)
+            for (amount, track_id), student_ids in by_award.items():
+                bump_stats_many(student_ids, xp=amount)
+                record_daily_xp_many(student_ids, amount, track_id=track_id)
+                record_xp_many(student_ids, amount, track_id=track_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        pipe = redis.pipeline()
+        for field, amount in pending.items():
+            pipe.hincrby(PENDING_XP_KEY, field, int(amount))
+        for field, title in titles.items():
+            pipe.hsetnx(PENDING_TITLES_KEY, field, title)
+        pipe.execute()
+        raise
+    return len(rows)
@@ -0,0 +1,148 @@
+"""Write-coalesced attendance and streaks for live-room joins and leaves.
+
+Socket handlers only touch Redis: a join keeps the first join time per
+(session, student), a leave keeps the last leave time, and the first join of
+the day queues that student's streak. The room flusher (``room_flush``)
+drains the shared buffer every few seconds into one attendance upsert, one
+batched leave UPDATE and one set-based streak update per buffered day.
+A reconnect storm therefore costs a few Redis writes per socket and one
+flush, not two commits each.
+"""
+import time
+from datetime import date, datetime, timezone
+from sqlalchemy import bindparam, func
+from app.extensions import db
+from app.models.classroom import Attendance, AttendanceStatus, Session
+from app.utils.redis_client import get_redis
+from app.utils.room_flush import ensure_room_flusher
+
+JOIN_KEY = 'room:pending:join'      # "<session_id>:<student_id>" -> first join (epoch s)
+LEAVE_KEY = 'room:pending:leave'    # "<session_id>:<student_id>" -> last leave (epoch s)
+STREAK_KEY = 'room:pending:streak'  # "<student_id>:<ISO day>" -> ISO day
+STREAK_SEEN_TTL = 2 * 86400
+
+
+def _field(session_id, student_id):
+    return f'{int(session_id)}:{int(student_id)}'
+
+
+def record_join(session_id, student_id):
+    """Buffer a student's join; never touches the database."""
+    day = date.today().isoformat()
+    redis = get_redis()
+    pipe = redis.pipeline()
+    pipe.hsetnx(JOIN_KEY, _field(session_id, student_id), time.time())
+    pipe.set(f'streak:seen:{day}:{student_id}', 1, ex=STREAK_SEEN_TTL, nx=True)
+    _, first_today = pipe.execute()
+    if first_today:
+        redis.hset(STREAK_KEY, f'{int(student_id)}:{day}', day)
+    ensure_room_flusher()
+
+
+def record_leave(session_id, student_id):
+    """Buffer a student's leave; never touches the database."""
+    get_redis().hset(LEAVE_KEY, _field(session_id, student_id), time.time())
+    ensure_room_flusher()
+
+
+# ─── Flush ──────────────────────────────────────────────────────────────────
+
+def _utc(ts):
+    return datetime.fromtimestamp(float(ts), timezone.utc).replace(tzinfo=None)
+
+
+def _parse(buffered):
+    rows = {}
+    for field, ts in buffered.items():
+        session_id, student_id = field.split(':')
+        rows[(int(session_id), int(student_id))] = _utc(ts)
+    return rows
+
+
+def _upsert_joins(joins):
+    """Mark students present; an existing row keeps its first ``joined_at``."""
+    table = Attendance.__table__
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['session_id', 'student_id'],
+        set_={'status': stmt.excluded.status,
+              'joined_at': func.coalesce(table.c.joined_at, stmt.excluded.joined_at)},
+    )
+    db.session.execute(stmt, [
+        {'session_id': session_id, 'student_id': student_id, 'joined_at': joined_at,
+         'status': AttendanceStatus.PRESENT, 'duration_seconds': 0}
+        for (session_id, student_id), joined_at in joins.items()
+    ])
+
+
+def _close_leaves(leaves):
+    from app.utils.session_finalizer import _seconds_between
+    table = Attendance.__table__
+    left_at = bindparam('b_left_at', type_=db.DateTime)
+    stmt = db.update(table).where(
+        table.c.session_id == bindparam('b_session_id'),
+        table.c.student_id == bindparam('b_student_id'),
+    ).values(left_at=left_at, duration_seconds=func.coalesce(
+        _seconds_between(table.c.joined_at, left_at), 0))
+    db.session.execute(stmt, [
+        {'b_session_id': session_id, 'b_student_id': student_id, 'b_left_at': left}
+        for (session_id, student_id), left in leaves.items()
+    ])
+
+
+def _requeue(joins, leaves, streaks):
+    """Put a failed flush back without overwriting newer buffered events."""
+    pipe = get_redis().pipeline()
+    for field, ts in joins.items():
+        pipe.hsetnx(JOIN_KEY, field, ts)
+    for field, ts in leaves.items():
+        pipe.hsetnx(LEAVE_KEY, field, ts)
+    for field, day in streaks.items():
+        pipe.hsetnx(STREAK_KEY, field, day)
+    pipe.execute()
+
+
+def flush_attendance():
+    """Drain the buffer into the database and commit; returns the number of events written.
+
+    The buffer is read and cleared in one MULTI/EXEC, so concurrent flushes
+    from other workers never write the same event twice. Joins for sessions
+    that no longer exist are dropped.
+    """
+    from app.utils.gamification_service import update_streaks_many
+
+    pipe = get_redis().pipeline()
+    pipe.hgetall(JOIN_KEY)
+    pipe.hgetall(LEAVE_KEY)
+    pipe.hgetall(STREAK_KEY)
+    pipe.delete(JOIN_KEY, LEAVE_KEY, STREAK_KEY)
+    joins, leaves, streaks, _ = pipe.execute()
+    if not (joins or leaves or streaks):
+        return 0
+
+    try:
+        join_rows = _parse(joins)
+        if join_rows:
+            live = set(db.session.scalars(db.select(Session.id).where(
+                Session.id.in_({session_id for session_id, _ in join_rows}))))
+            join_rows = {k: v for k, v in join_rows.items() if k[0] in live}
+        if join_rows:
+            _upsert_joins(join_rows)
+        if leaves:
+            _close_leaves(_parse(leaves))
+        # Credit each join to the day it happened, oldest day first
+        by_day = {}
+        for field, day in streaks.items():
+            by_day.setdefault(date.fromisoformat(day), set()).add(int(field.split(':')[0]))
+        for day in sorted(by_day):
+            update_streaks_many(sorted(by_day[day]), today=day)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        _requeue(joins, leaves, streaks)
+        raise
+    return len(joins) + len(leaves) + len(streaks)
@@ -0,0 +1,47 @@
+"""Per-worker background task that drains the live-room write buffers.
+
+Socket handlers queue attendance (``room_attendance``) and activity XP
+(``room_activities``) in Redis and call ``ensure_room_flusher()``; the first
+call in a worker starts a task that flushes every buffer each
+``FLUSH_INTERVAL`` seconds. Buffers are shared, so any worker's flush drains
+events queued by all of them.
+"""
+import threading
+from flask import current_app
+from app.extensions import db, socketio
+
+FLUSH_INTERVAL = 5  # seconds between flushes in each worker
+
+_flusher = {'started': False}
+_lock = threading.Lock()
+
+
+def flush_room_buffers():
+    """Run every buffer's flush; one failing does not hold back the others."""
+    from app.utils.room_attendance import flush_attendance
+    from app.utils.room_activities import flush_activity_xp
+    for flush in (flush_attendance, flush_activity_xp):
+        try:
+            flush()
+        except Exception as e:
+            print(f'[ROOM] {flush.__name__} failed: {e}')
+
+
+def ensure_room_flusher():
+    if _flusher['started']:
+        return
+    with _lock:
+        if _flusher['started']:
+            return
+        _flusher['started'] = True
+    socketio.start_background_task(_flush_loop, current_app._get_current_object())
+
+
+def _flush_loop(app):
+    while True:
+        socketio.sleep(FLUSH_INTERVAL)
+        with app.app_context():
+            try:
+                flush_room_buffers()
+            finally:
+                db.session.remove()
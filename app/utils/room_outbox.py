@@ -0,0 +1,147 @@
+"""Per-room outbound scheduler for high-rate room broadcasts.
+
+Chat, hand-raise, question and code-broadcast events are not emitted as they
+arrive. They are queued per room and sent every ``FRAME_INTERVAL`` seconds
+as one ``room_frame`` event: a list of ``[event, data, skip_sid]`` entries
+that the client dispatches to its usual handlers (``skip_sid`` replaces
+``include_self=False``). Inside a frame a newer ``code_broadcast`` from the
+same sender replaces the older one, since each carries the whole editor.
+Per-user token buckets cap how fast chat, questions and hand raises are
+accepted.
+
+The outbox and buckets are per worker (a socket stays on one worker); the
+per-room counters are summed in Redis so ``room_stats`` covers all workers.
+"""
+import time
+import threading
+from flask import current_app
+from app.extensions import socketio
+from app.utils.redis_client import get_redis
+
+FRAME_INTERVAL = 0.05     # seconds between frames
+STATS_INTERVAL = 1.0      # seconds between counter pushes to Redis
+STATS_TTL = 6 * 3600
+
+# event -> (burst capacity, tokens refilled per second)
+RATE_LIMITS = {
+    'chat_message': (5, 1.0),
+    'question_submit': (3, 0.5),
+    'hand_raise': (3, 0.2),
+}
+# Events where only the latest state per sender matters. They are not rate
+# limited: dropping one could lose the final state, and superseding already
+# caps them at one per sender per frame.
+SUPERSEDED = {'code_broadcast'}
+
+COUNTERS = ('received', 'rate_limited', 'superseded', 'emitted', 'frames')
+
+_outbox = {}    # {room: [[event, data, skip_sid, sender_sid], ...]}
+_counts = {}    # {room: {counter: n}} not yet pushed to Redis
+_buckets = {}   # {(user_key, event): [tokens, last refill]}
+_lock = threading.Lock()
+_scheduler = {'started': False}
+
+
+def _stats_key(room):
+    return f'room:{room.removeprefix("session_")}:outbox'
+
+
+def _count(room, counter, n=1):
+    counts = _counts.setdefault(room, dict.fromkeys(COUNTERS, 0))
+    counts[counter] += n
+
+
+def _take_token(user_key, event, now):
+    capacity, rate = RATE_LIMITS[event]
+    bucket = _buckets.get((user_key, event))
+    if bucket is None:
+        bucket = _buckets[(user_key, event)] = [float(capacity), now]
+    bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+    bucket[1] = now
+    if bucket[0] < 1:
+        return False
+    bucket[0] -= 1
+    return True
+
+
+def publish(session_id, event, data, user_key, sid=None, include_self=True):
+    """Queue ``event`` for the session's room; False if the sender is over its rate limit."""
+    room = f'session_{session_id}'
+    skip_sid = None if include_self else sid
+    with _lock:
+        _count(room, 'received')
+        if event in RATE_LIMITS and not _take_token(user_key, event, time.monotonic()):
+            _count(room, 'rate_limited')
+            return False
+        entries = _outbox.setdefault(room, [])
+        if event in SUPERSEDED and sid is not None:
+            for i, entry in enumerate(entries):
+                if entry[0] == event and entry[3] == sid:
+                    del entries[i]
+                    _count(room, 'superseded')
+                    break
+        entries.append([event, data, skip_sid, sid])
+    _ensure_scheduler()
+    return True
+
+
+def room_stats(session_id):
+    """{counter: total} for one room across all workers (counters lag by up to a second)."""
+    raw = get_redis().hgetall(_stats_key(f'session_{session_id}'))
+    return {counter: int(raw.get(counter, 0)) for counter in COUNTERS}
+
+
+# ─── Scheduler ──────────────────────────────────────────────────────────────
+
+def _ensure_scheduler():
+    if _scheduler['started']:
+        return
+    with _lock:
+        if _scheduler['started']:
+            return
+        _scheduler['started'] = True
+    socketio.start_background_task(_frame_loop, current_app._get_current_object())
+
+
+def _send_frames():
+    global _outbox
+    with _lock:
+        frames, _outbox = _outbox, {}
+        for room, entries in frames.items():
+            _count(room, 'emitted', len(entries))
+            _count(room, 'frames')
+    for room, entries in frames.items():
+        socketio.emit('room_frame', [entry[:3] for entry in entries], to=room)
+
+
+def _push_stats(app):
+    global _counts
+    with _lock:
+        counts, _counts = _counts, {}
+        now = time.monotonic()
+        for key in [k for k, (_tokens, last) in _buckets.items() if now - last > 60]:
+            del _buckets[key]  # idle long enough to be full again
+    if not counts:
+        return
+    with app.app_context():
+        pipe = get_redis().pipeline()
+        for room, room_counts in counts.items():
+            key = _stats_key(room)
+            for counter, n in room_counts.items():
+                if n:
+                    pipe.hincrby(key, counter, n)
+            pipe.expire(key, STATS_TTL)
+        pipe.execute()
+
+
+def _frame_loop(app):
+    last_stats = time.monotonic()
+    while True:
+        socketio.sleep(FRAME_INTERVAL)
+        try:
+            _send_frames()
+            if time.monotonic() - last_stats >= STATS_INTERVAL:
+                last_stats = time.monotonic()
+                _push_stats(app)
+        except Exception as e:
+            print(f'[ROOM] frame send failed: {e}')
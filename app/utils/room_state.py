@@ -0,0 +1,151 @@
+"""Live-room state shared by every Socket.IO worker.
+
+Each session keeps a few Redis hashes (``room:<session_id>:slide``,
+``:whiteboard``, ``:video``, ``:activity`` and one
+``:submissions:<activity_id>`` per activity). Field values are JSON so ints,
+floats and booleans come back as they went in. Every write goes through a
+MULTI/EXEC pipeline that also refreshes the key's TTL, so a session's state
+changes atomically and disappears on its own once the class is over. Slide
+and video hashes also carry a ``version`` that every write increments, so
+clients can tell the newest state from a stale one. In development the store
+is whatever ``get_redis()`` falls back to.
+"""
+import json
+from app.utils.redis_client import get_redis
+
+ROOM_TTL = 6 * 3600  # seconds a room's state outlives its last write
+
+_LATE_JOIN_PARTS = ('slide', 'whiteboard', 'video')
+
+
+def _key(session_id, part):
+    return f'room:{session_id}:{part}'
+
+
+def _encode(fields):
+    return {f: json.dumps(v) for f, v in fields.items()}
+
+
+def _decode(raw):
+    return {f: json.loads(v) for f, v in raw.items()} if raw else None
+
+
+def _hset(pipe, key, fields):
+    pipe.hset(key, mapping=_encode(fields))
+    pipe.expire(key, ROOM_TTL)
+
+
+def update_versioned(session_id, part, fields):
+    """Merge ``fields`` into a slide/video hash, bump its version; returns the new state.
+
+    The write, the HINCRBY and the read happen in one MULTI/EXEC, so
+    versions are unique and increasing across every worker.
+    """
+    key = _key(session_id, part)
+    pipe = get_redis().pipeline()
+    pipe.hset(key, mapping=_encode(fields))
+    pipe.hincrby(key, 'version', 1)
+    pipe.expire(key, ROOM_TTL)
+    pipe.hgetall(key)
+    return _decode(pipe.execute()[-1])
+
+
+def _get(session_id, part):
+    return _decode(get_redis().hgetall(_key(session_id, part)))
+
+
+# ─── Slides / whiteboard / video ────────────────────────────────────────────
+
+def get_slide(session_id):
+    """{resource_id, slide_index, version} or None."""
+    return _get(session_id, 'slide')
+
+
+def set_slide(session_id, slide_index, resource_id=None):
+    fields = {'slide_index': slide_index}
+    if resource_id:
+        fields['resource_id'] = resource_id
+    return update_versioned(session_id, 'slide', fields)
+
+
+def get_whiteboard(session_id):
+    """{url} or None."""
+    return _get(session_id, 'whiteboard')
+
+
+def claim_whiteboard(session_id, url):
+    """Store ``url`` unless the session already has a board; returns the board's url.
+
+    HSETNX makes concurrent starts on different workers agree on one board.
+    """
+    key = _key(session_id, 'whiteboard')
+    pipe = get_redis().pipeline()
+    pipe.hsetnx(key, 'url', json.dumps(url))
+    pipe.expire(key, ROOM_TTL)
+    pipe.hget(key, 'url')
+    return json.loads(pipe.execute()[-1])
+
+
+def get_video(session_id):
+    """{youtube_url, current_time, is_playing, version} or None."""
+    return _get(session_id, 'video')
+
+
+def load_video(session_id, youtube_url):
+    return update_versioned(session_id, 'video', {
+        'youtube_url': youtube_url, 'current_time': 0, 'is_playing': False,
+    })
+
+
+def late_join_state(session_id):
+    """{'slide', 'whiteboard', 'video'} for a joining user, read in one round trip."""
+    pipe = get_redis().pipeline(transaction=False)
+    for part in _LATE_JOIN_PARTS:
+        pipe.hgetall(_key(session_id, part))
+    return dict(zip(_LATE_JOIN_PARTS, (_decode(raw) for raw in pipe.execute())))
+
+
+# ─── In-class activities ────────────────────────────────────────────────────
+
+def _submissions_key(session_id, activity_id):
+    return _key(session_id, f'submissions:{activity_id}')
+
+
+def start_activity(session_id, activity, answer_key=None):
+    """Make ``activity`` the session's active one with an empty submission list.
+
+    ``answer_key`` is the JSON form of its compiled answer key, stored next
+    to it so any worker can score submissions without the activity itself.
+    """
+    key = _key(session_id, 'activity')
+    pipe = get_redis().pipeline()
+    pipe.delete(key, _submissions_key(session_id, activity.get('id', '')))
+    _hset(pipe, key, {'id': activity.get('id', ''), 'activity': activity,
+                      'answer_key': answer_key})
+    pipe.execute()
+
+
+def active_activity(session_id):
+    return activity_field(session_id, 'activity')
+
+
+def activity_field(session_id, field):
+    """One field ('id', 'activity' or 'answer_key') of the active activity, or None."""
+    raw = get_redis().hget(_key(session_id, 'activity'), field)
+    return json.loads(raw) if raw is not None else None
+
+
+def record_submission(session_id, activity_id, student_id, answer):
+    """Store a student's answer (last one wins); returns how many students have submitted."""
+    key = _submissions_key(session_id, activity_id)
+    pipe = get_redis().pipeline()
+    _hset(pipe, key, {str(student_id): answer})
+    pipe.hlen(key)
+    return pipe.execute()[-1]
+
+
+def end_activity(session_id, activity_id=None):
+    keys = [_key(session_id, 'activity')]
+    if activity_id:
+        keys.append(_submissions_key(session_id, activity_id))
+    get_redis().delete(*keys)
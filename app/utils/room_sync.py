@@ -0,0 +1,71 @@
+"""Debounced, last-write-wins slide and video sync.
+
+Slide changes and video play/pause/seek only update this worker's pending
+state for the session (later fields overwrite earlier ones). Every
+``SYNC_INTERVAL`` seconds each pending state is written once with
+``room_state.update_versioned`` and broadcast with its new version, so a
+teacher scrubbing a video sends at most ``1 / SYNC_INTERVAL`` updates per
+second per room. Clients drop any state whose version is not newer than the
+one they hold. Late joiners get the stored state and version from
+``room_state.late_join_state``.
+"""
+import threading
+from flask import current_app
+from app.extensions import socketio
+from app.utils import room_state
+
+SYNC_INTERVAL = 0.1  # seconds between sync broadcasts per room
+
+# part -> event carrying its versioned state
+EVENTS = {'slide': 'slide_change', 'video': 'video_state'}
+
+_pending = {}  # {(session_id, part): {'fields': {...}, 'skip_sid': sid}}
+_lock = threading.Lock()
+_syncer = {'started': False}
+
+
+def update(session_id, part, fields, skip_sid=None):
+    """Record the latest ``fields`` of a session's slide/video state; broadcast on the next tick."""
+    with _lock:
+        entry = _pending.setdefault((str(session_id), part), {'fields': {}, 'skip_sid': skip_sid})
+        entry['fields'].update(fields)
+        entry['skip_sid'] = skip_sid
+    _ensure_syncer()
+
+
+def discard(session_id, part):
+    """Forget pending changes, e.g. when a new video replaces the one being scrubbed."""
+    with _lock:
+        _pending.pop((str(session_id), part), None)
+
+
+def _ensure_syncer():
+    if _syncer['started']:
+        return
+    with _lock:
+        if _syncer['started']:
+            return
+        _syncer['started'] = True
+    socketio.start_background_task(_sync_loop, current_app._get_current_object())
+
+
+def _sync(app):
+    global _pending
+    with _lock:
+        pending, _pending = _pending, {}
+    if not pending:
+        return
+    with app.app_context():
+        for (session_id, part), entry in pending.items():
+            state = room_state.update_versioned(session_id, part, entry['fields'])
+            socketio.emit(EVENTS[part], dict(state, session_id=session_id),
+                          to=f'session_{session_id}', skip_sid=entry['skip_sid'])
+
+
+def _sync_loop(app):
+    while True:
+        socketio.sleep(SYNC_INTERVAL)
+        try:
+            _sync(app)
+        except Exception as e:
+            print(f'[ROOM] sync failed: {e}')
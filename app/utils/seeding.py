@@ -0,0 +1,76 @@
+import zlib
+from app.extensions import db
+from app.models.curriculum import Track, Level, Unit, Objective, Skill
+from app.models.journey import Activity, ActivityType, ActivitySource, QuestDifficulty
+
+CURRICULUM_TABLES = [
+    ('tracks', Track), ('levels', Level), ('units', Unit),
+    ('objectives', Objective), ('skills', Skill),
+]
+
+# (type, Arabic label, English label, xp, coins); units get the first two,
+# plus the third for two units in three
+ACTIVITY_TEMPLATES = [
+    (ActivityType.CODING, 'تمرين برمجي', 'Coding Exercise', 20, 10),
+    (ActivityType.QUIZ, 'اختبار قصير', 'Quick Quiz', 15, 8),
+    (ActivityType.GAME, 'لعبة تفاعلية', 'Interactive Game', 25, 12),
+]
+
+
+def seed_curriculum(tracks=None):
+    """Insert the curriculum from ``data/`` with one executemany per table (caller commits).
+
+    Tracks that already exist are left alone. Returns the flattened rows
+    that were inserted (see ``data.flatten_curriculum``).
+    """
+    from data import all_tracks, flatten_curriculum
+    from app.utils.curriculum_cache import bump_curriculum_version
+    from app.utils.track_progress import invalidate_count_index
+
+    rows = flatten_curriculum(all_tracks() if tracks is None else tracks)
+    existing = set(db.session.scalars(db.select(Track.id)))
+    if existing:
+        rows['tracks'] = [r for r in rows['tracks'] if r['id'] not in existing]
+        for name, _model in CURRICULUM_TABLES[1:]:
+            rows[name] = [r for r in rows[name] if r['track_id'] not in existing]
+    for name, model in CURRICULUM_TABLES:
+        if rows[name]:
+            db.session.execute(db.insert(model), rows[name])
+    if rows['tracks']:
+        # Bulk inserts bypass the mapper events that keep the caches fresh
+        bump_curriculum_version()
+        invalidate_count_index()
+    return rows
+
+
+def unit_activity_rows(units, start_sort=100):
+    """Self-paced activity rows for ``units`` (dicts or rows with track_id/level_id/id/name/name_en)."""
+    rows = []
+    sort_order = start_sort
+    for unit in units:
+        unit = unit if isinstance(unit, dict) else unit._asdict()
+        # crc32 rather than hash(): str hashes change between processes
+        skip_third = zlib.crc32(unit['id'].encode()) % 3 == 0
+        for j, (atype, ar_label, en_label, xp, coins) in enumerate(ACTIVITY_TEMPLATES):
+            if j == 2 and skip_third:
+                continue
+            rows.append({
+                'title': f"{en_label}: {unit['name_en'] or unit['name']}",
+                'title_ar': f"{ar_label}: {unit['name']}",
+                'activity_type': atype,
+                'source': ActivitySource.SELF_PACED,
+                'difficulty': QuestDifficulty.BEGINNER,
+                'xp_reward': xp, 'coin_reward': coins,
+                'track_id': unit['track_id'], 'level_id': unit['level_id'], 'unit_id': unit['id'],
+                'estimated_minutes': 10, 'sort_order': sort_order,
+            })
+            sort_order += 1
+    return rows
+
+
+def seed_unit_activities(units, start_sort=100):
+    """Insert 2-3 activities per unit in one statement (caller commits); returns the count."""
+    rows = unit_activity_rows(units, start_sort)
+    if rows:
+        db.session.execute(db.insert(Activity), rows)
+    return len(rows)
@@ -0,0 +1,166 @@
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import Integer, cast, func, literal
+from sqlalchemy.sql.expression import ColumnElement
+from app.extensions import db
+from app.models.classroom import Session, SessionStatus, Attendance, AttendanceStatus
+from app.models.gamification import StudentXP, XPSource
+
+ATTENDANCE_XP = 50
+ATTENDANCE_COINS = 10
+# finalize_session results (both truthy; False means the session was already completed)
+FINALIZE_QUEUED = 'queued'
+FINALIZE_AWARDED = 'awarded'
+RECONCILE_DAYS = 7  # how far back reconcile_session_awards looks for unpaid sessions
+
+
+def _seconds_between(start_col, end):
+    """Portable ``end - start_col`` in whole seconds for an UPDATE expression.
+
+    ``end`` is a datetime or a SQL expression such as a ``bindparam``.
+    """
+    if not isinstance(end, ColumnElement):
+        end = literal(end, db.DateTime)
+    if db.engine.dialect.name == 'postgresql':
+        return cast(func.extract('epoch', end - start_col), Integer)
+    return cast((func.julianday(end) - func.julianday(start_col)) * 86400, Integer)
+
+
+def close_session(session_id):
+    """Mark a session completed and close still-open attendance (caller commits).
+
+    The status change is a guarded UPDATE, so only the first caller gets True;
+    repeated end requests never award attendance twice.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    claimed = db.session.execute(
+        db.update(Session)
+        .where(Session.id == session_id, Session.status != SessionStatus.COMPLETED)
+        .values(status=SessionStatus.COMPLETED)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not claimed:
+        return False
+
+    db.session.execute(
+        db.update(Attendance)
+        .where(Attendance.session_id == session_id,
+               Attendance.left_at.is_(None),
+               Attendance.joined_at.isnot(None))
+        .values(left_at=now, duration_seconds=_seconds_between(Attendance.joined_at, now))
+        .execution_options(synchronize_session=False)
+    )
+    return True
+
+
+def _attendance_awarded(session_id):
+    return db.session.query(db.select(StudentXP.id).where(
+        StudentXP.session_id == session_id,
+        StudentXP.source_type == XPSource.ATTENDANCE.value,
+    ).exists()).scalar()
+
+
+def award_attendance(session_id, xp_amount=ATTENDANCE_XP, coin_amount=ATTENDANCE_COINS):
+    """Apply attendance rewards for a closed session with set-based statements and commit.
+
+    One multi-row INSERT for the XP ledger, one UPDATE each for stats, wallets
+    and streaks, and batched badge evaluation. Returns the rewarded student ids.
+    Safe to retry: the session row is locked and a session that already has
+    attendance XP is skipped.
+    """
+    from app.utils.student_stats import bump_stats_many
+    from app.utils.leaderboard import record_xp_many
+    from app.utils.xp_rollup import record_daily_xp_many
+    from app.utils.wallet import credit_many
+    from app.utils.gamification_service import update_streaks_many
+    from app.utils.badge_engine import BadgeEvent, handle_event_many
+
+    session = db.session.get(Session, session_id, with_for_update=True)
+    student_ids = [sid for (sid,) in db.session.query(Attendance.student_id).filter(
+        Attendance.session_id == session_id,
+        Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE]),
+    )]
+    if not session or not student_ids or _attendance_awarded(session_id):
+        db.session.commit()
+        return []
+
+    reason = f'حضور جلسة: {session.title}'
+    track_id = session.unit_track_id or (session.group.track_id if session.group else None)
+    db.session.execute(db.insert(StudentXP).values([
+        {'student_id': sid, 'amount': xp_amount, 'reason': reason, 'session_id': session_id,
+         'source_type': XPSource.ATTENDANCE.value, 'track_id': track_id,
+         'level_id': session.unit_level_id, 'unit_id': session.unit_id}
+        for sid in student_ids
+    ]))
+    bump_stats_many(student_ids, xp=xp_amount, sessions_attended=1)
+    record_daily_xp_many(student_ids, xp_amount, track_id=track_id)
+    record_xp_many(student_ids, xp_amount, track_id=track_id)
+    credit_many(student_ids, coins=coin_amount, reason=reason)
+    update_streaks_many(student_ids)
+    for badge_event in (BadgeEvent.SESSION_ATTENDED, BadgeEvent.XP_EARNED,
+                        BadgeEvent.STREAK_UPDATED):
+        handle_event_many(student_ids, badge_event)
+    db.session.commit()
+    return student_ids
+
+
+def _celery_client(broker):
+    """One Celery app per Flask app for publishing tasks; its broker pool is reused."""
+    client = current_app.extensions.get('celery_client')
+    if client is None:
+        from celery import Celery
+        client = current_app.extensions['celery_client'] = Celery(broker=broker)
+    return client
+
+
+def finalize_session(session_id):
+    """End a session: close attendance and reward attendees.
+
+    With ``SESSION_FINALIZE_ASYNC`` (and a Celery broker) the rewards run in the
+    ``celery_worker.finalize_session`` task and the request returns right after
+    the session is closed. Returns ``FINALIZE_QUEUED`` or ``FINALIZE_AWARDED``,
+    or False if the session was already completed.
+    """
+    from app.utils.room_attendance import flush_attendance
+    flush_attendance()  # buffered room joins/leaves must land before attendance closes
+    if not close_session(session_id):
+        db.session.rollback()
+        return False
+    db.session.commit()
+
+    broker = current_app.config.get('CELERY_BROKER_URL')
+    if current_app.config.get('SESSION_FINALIZE_ASYNC') and broker:
+        try:
+            _celery_client(broker).send_task('celery_worker.finalize_session', args=[session_id])
+            return FINALIZE_QUEUED
+        except Exception as e:
+            print(f'[SESSION] Could not queue rewards for session {session_id} ({e}); awarding inline')
+    award_attendance(session_id)
+    return FINALIZE_AWARDED
+
+
+def sessions_pending_awards(days=RECONCILE_DAYS):
+    """Ids of recent completed sessions with attendees but no attendance XP.
+
+    These are sessions whose reward task was lost or kept failing; the session
+    is already COMPLETED, so ending it again can never pay them.
+    """
+    since = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+    awarded = db.select(StudentXP.id).where(
+        StudentXP.session_id == Session.id,
+        StudentXP.source_type == XPSource.ATTENDANCE.value,
+    ).exists()
+    attended = db.select(Attendance.id).where(
+        Attendance.session_id == Session.id,
+        Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE]),
+    ).exists()
+    return list(db.session.scalars(db.select(Session.id).where(
+        Session.status == SessionStatus.COMPLETED, Session.scheduled_at >= since,
+        attended, ~awarded,
+    ).order_by(Session.id)))
+
+
+def reconcile_session_awards(days=RECONCILE_DAYS):
+    """Award every session from ``sessions_pending_awards``; returns {session_id: students rewarded}."""
+    return {session_id: len(award_attendance(session_id))
+            for session_id in sessions_pending_awards(days)}
@@ -0,0 +1,106 @@
+from sqlalchemy import and_
+from app.extensions import db
+from app.models.classroom import Group, GroupStudent, Session, SessionStatus
+from app.models.gamification import StudentXP, Badge, StudentBadge
+from app.models.homework import Homework, HomeworkSubmission
+from app.models.journey import StudentUnitProgress
+from app.models.notification import Notification
+from app.utils.hud import get_hud
+from app.utils.track_progress import track_progress
+from app.utils.curriculum_cache import get_curriculum
+from app.utils import leaderboard as lb
+
+
+def dashboard_context(student_id):
+    """Template context for ``student.dashboard`` in a fixed number of queries.
+
+    One query each for groups, live/scheduled sessions, recent XP, badges,
+    ungraded submissions, the next unsubmitted homework, unread notifications
+    and the student's unit progress; tracks, unit totals, the HUD and the leaderboard
+    come from their caches. The count does not grow with the number of
+    tracks, groups or homework items.
+    """
+    hud = get_hud(student_id)
+    level_title_ar, level_title_en = StudentXP.level_title(hud.level)
+
+    my_groups = Group.query.join(GroupStudent, GroupStudent.group_id == Group.id).filter(
+        GroupStudent.student_id == student_id).all()
+    group_ids = [g.id for g in my_groups]
+
+    live_sessions, upcoming_sessions = [], []
+    if group_ids:
+        for session in Session.query.filter(
+            Session.group_id.in_(group_ids),
+            Session.status.in_([SessionStatus.LIVE, SessionStatus.SCHEDULED]),
+        ).order_by(Session.scheduled_at):
+            if session.status == SessionStatus.LIVE:
+                live_sessions.append(session)
+            elif len(upcoming_sessions) < 3:
+                upcoming_sessions.append(session)
+
+    recent_xp = StudentXP.query.filter_by(student_id=student_id).order_by(
+        StudentXP.created_at.desc()
+    ).limit(10).all()
+
+    all_badges, badges_earned = [], []
+    for badge, earned_by in db.session.query(Badge, StudentBadge.c.student_id).outerjoin(
+        StudentBadge, and_(StudentBadge.c.badge_id == Badge.id,
+                           StudentBadge.c.student_id == student_id),
+    ).order_by(Badge.id):
+        all_badges.append(badge)
+        if earned_by is not None:
+            badges_earned.append(badge)
+
+    pending_homework, homework_due = [], []
+    if group_ids:
+        pending_homework = HomeworkSubmission.query.join(Homework).filter(
+            HomeworkSubmission.student_id == student_id,
+            HomeworkSubmission.grade.is_(None),
+        ).all()
+        # The three soonest unsubmitted items; NULL due dates last on every backend
+        homework_due = Homework.query.outerjoin(
+            HomeworkSubmission, and_(HomeworkSubmission.homework_id == Homework.id,
+                                     HomeworkSubmission.student_id == student_id),
+        ).filter(
+            Homework.group_id.in_(group_ids),
+            HomeworkSubmission.id.is_(None),
+        ).order_by(Homework.due_date.is_(None), Homework.due_date, Homework.id).limit(3).all()
+
+    unread_count = Notification.query.filter_by(user_id=student_id, is_read=False).count()
+
+    adventure_nodes = StudentUnitProgress.query.filter_by(
+        student_id=student_id
+    ).order_by(StudentUnitProgress.id).all()
+    completed_by_track = {}
+    for node in adventure_nodes:
+        if node.status == 'completed':
+            completed_by_track[node.track_id] = completed_by_track.get(node.track_id, 0) + 1
+
+    tracks = get_curriculum().tracks
+    progress = track_progress(student_id, tracks, completed=completed_by_track)
+
+    adventure_completed = sum(completed_by_track.values())
+
+    return dict(
+        total_xp=hud.total_xp, level=hud.level,
+        level_title_ar=level_title_ar, level_title_en=level_title_en,
+        current_streak=hud.current_streak,
+        upcoming_sessions=upcoming_sessions,
+        live_sessions=live_sessions,
+        recent_xp=recent_xp,
+        badges_earned=badges_earned, all_badges=all_badges,
+        leaderboard=lb.top('all_time', limit=10),
+        my_rank=lb.rank(student_id, 'all_time'),
+        pending_homework=pending_homework,
+        homework_due=homework_due,
+        unread_count=unread_count,
+        xp_progress=min(hud.xp_progress, 100),
+        next_threshold=hud.next_threshold,
+        tracks=tracks,
+        track_progress=progress,
+        my_groups=my_groups,
+        adventure_nodes=adventure_nodes,
+        adventure_completed=adventure_completed,
+        adventure_total=len(adventure_nodes) if adventure_nodes else 1,
+        wallet=hud,
+    )
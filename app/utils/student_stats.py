@@ -0,0 +1,234 @@
+from datetime import datetime, timezone
+from sqlalchemy import case, func
+from sqlalchemy.engine import Connection
+from app.extensions import db
+from app.models.user import User, Role
+from app.models.gamification import StudentXP, StudentStats, StudentBadge, LEVEL_THRESHOLDS
+from app.models.journey import StudentQuest, QuestStatus, StudentActivity
+from app.models.classroom import Attendance, AttendanceStatus, Session, SessionStatus
+from app.utils.hud import invalidate_hud
+
+COUNTERS = ('quests_completed', 'activities_completed', 'sessions_attended', 'badges_earned')
+STAT_FIELDS = ('total_xp', 'level') + COUNTERS
+
+
+def _level_expr(xp_expr):
+    """SQL CASE mapping an XP expression to its level (mirrors StudentXP.current_level)."""
+    whens = [(xp_expr >= t, i + 1) for i, t in reversed(list(enumerate(LEVEL_THRESHOLDS))) if t > 0]
+    return case(*whens, else_=1)
+
+
+def get_student_stats(student_id):
+    """Return the StudentStats row, building it from the ledger if it is missing.
+
+    Every student gets a row when created (and migration 002 filled existing
+    ones), so the fallback only covers users who became students later.
+    Always re-reads the row (a primary-key lookup) because ``bump_stats`` updates
+    it in SQL behind the identity map's back.
+    """
+    stats = db.session.get(StudentStats, student_id, populate_existing=True)
+    if stats is None:
+        fill_missing_stats(db.session, [student_id])
+        stats = db.session.get(StudentStats, student_id, populate_existing=True)
+    return stats
+
+
+def _count_of(column, *where):
+    return db.select(func.count()).select_from(column.table).where(*where).scalar_subquery()
+
+
+def fill_missing_stats(conn, student_ids=None):
+    """Insert ledger-built stats rows for students that have none; returns the ids inserted.
+
+    One ``INSERT ... SELECT ... ON CONFLICT DO NOTHING``, so two requests
+    filling the same student race harmlessly: the loser inserts nothing and
+    keeps the winner's row. ``conn`` is a Session or a Connection (migrations).
+    """
+    sid = User.id
+    inner = db.select(
+        sid.label('student_id'),
+        db.select(func.coalesce(func.sum(StudentXP.amount), 0)).where(
+            StudentXP.student_id == sid).scalar_subquery().label('total_xp'),
+        _count_of(StudentQuest.id, StudentQuest.student_id == sid,
+                  StudentQuest.status == QuestStatus.COMPLETED).label('quests_completed'),
+        _count_of(StudentActivity.id, StudentActivity.student_id == sid,
+                  StudentActivity.status == 'completed').label('activities_completed'),
+        db.select(func.count()).select_from(Attendance).join(
+            Session, Session.id == Attendance.session_id).where(
+            Attendance.student_id == sid, Session.status == SessionStatus.COMPLETED,
+            Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE]),
+        ).scalar_subquery().label('sessions_attended'),
+        _count_of(StudentBadge.c.badge_id, StudentBadge.c.student_id == sid).label('badges_earned'),
+    ).where(
+        User.role == Role.STUDENT,
+        ~db.select(StudentStats.student_id).where(StudentStats.student_id == sid).exists(),
+    )
+    if student_ids is not None:
+        inner = inner.where(sid.in_(student_ids))
+    inner = inner.subquery()
+
+    dialect = conn.dialect if isinstance(conn, Connection) else conn.get_bind().dialect
+    if dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    columns = ['student_id', 'total_xp', 'level', *COUNTERS, 'updated_at']
+    stmt = insert(StudentStats.__table__).from_select(columns, db.select(
+        inner.c.student_id, inner.c.total_xp, _level_expr(inner.c.total_xp),
+        *(inner.c[name] for name in COUNTERS),
+        db.literal(datetime.now(timezone.utc), db.DateTime),
+    ).where(inner.c.student_id.isnot(None))  # SQLite needs a WHERE before ON CONFLICT
+    ).on_conflict_do_nothing(index_elements=['student_id']).returning(
+        StudentStats.__table__.c.student_id)
+    return [student_id for (student_id,) in conn.execute(stmt)]
+
+
+def _delta_values(xp, counters):
+    values = {}
+    if xp:
+        new_xp = StudentStats.total_xp + xp
+        values['total_xp'] = new_xp
+        values['level'] = _level_expr(new_xp)
+    for name, delta in counters.items():
+        if name not in COUNTERS:
+            raise ValueError(f'Unknown stats counter: {name}')
+        if delta:
+            values[name] = getattr(StudentStats, name) + delta
+    if values:
+        values['updated_at'] = datetime.now(timezone.utc)
+    return values
+
+
+def bump_stats(student_id, xp=0, **counters):
+    """Apply deltas to a student's stats row inside the caller's transaction.
+
+    Runs a single ``UPDATE ... SET col = col + :n`` so concurrent awards never
+    lose increments. If the row does not exist yet it is built from the ledger,
+    which already contains the caller's flushed changes.
+    """
+    values = _delta_values(xp, counters)
+    if not values:
+        return
+
+    invalidate_hud(student_id)
+    result = db.session.execute(
+        db.update(StudentStats)
+        .where(StudentStats.student_id == student_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0 and not fill_missing_stats(db.session, [student_id]):
+        # Another request created the row first, from a ledger without our award
+        db.session.execute(
+            db.update(StudentStats)
+            .where(StudentStats.student_id == student_id)
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def bump_stats_many(student_ids, xp=0, **counters):
+    """Apply the same deltas to many students with one UPDATE (caller commits).
+
+    Students without a stats row are built from the ledger instead, exactly as
+    in ``bump_stats``.
+    """
+    student_ids = list(student_ids)
+    if not student_ids:
+        return
+    invalidate_hud(*student_ids)
+    existing = [sid for (sid,) in db.session.query(StudentStats.student_id).filter(
+        StudentStats.student_id.in_(student_ids))]
+    missing = set(student_ids) - set(existing)
+    if missing:
+        # Rows a concurrent request created meanwhile still need the delta
+        existing += sorted(missing - set(fill_missing_stats(db.session, sorted(missing))))
+    values = _delta_values(xp, counters)
+    if existing and values:
+        db.session.execute(
+            db.update(StudentStats)
+            .where(StudentStats.student_id.in_(existing))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def compute_student_stats(student_ids=None):
+    """Aggregate stats straight from the source tables: {student_id: {field: value}}.
+
+    One grouped query per counter; this is the slow path used by rebuild and
+    reconcile, never by page views.
+    """
+    def scoped(query, column):
+        return query.filter(column.in_(student_ids)) if student_ids is not None else query
+
+    ids = scoped(db.session.query(User.id).filter(User.role == Role.STUDENT), User.id)
+    result = {row.id: {field: 0 for field in STAT_FIELDS} for row in ids}
+
+    def merge(field, rows):
+        for student_id, value in rows:
+            if student_id in result:
+                result[student_id][field] = int(value or 0)
+
+    merge('total_xp', scoped(db.session.query(
+        StudentXP.student_id, func.sum(StudentXP.amount)
+    ), StudentXP.student_id).group_by(StudentXP.student_id))
+
+    merge('quests_completed', scoped(db.session.query(
+        StudentQuest.student_id, func.count(StudentQuest.id)
+    ).filter(StudentQuest.status == QuestStatus.COMPLETED),
+        StudentQuest.student_id).group_by(StudentQuest.student_id))
+
+    merge('activities_completed', scoped(db.session.query(
+        StudentActivity.student_id, func.count(StudentActivity.id)
+    ).filter(StudentActivity.status == 'completed'),
+        StudentActivity.student_id).group_by(StudentActivity.student_id))
+
+    merge('sessions_attended', scoped(db.session.query(
+        Attendance.student_id, func.count(Attendance.id)
+    ).join(Session, Session.id == Attendance.session_id).filter(
+        Session.status == SessionStatus.COMPLETED,
+        Attendance.status.in_([AttendanceStatus.PRESENT, AttendanceStatus.LATE]),
+    ), Attendance.student_id).group_by(Attendance.student_id))
+
+    merge('badges_earned', scoped(db.session.query(
+        StudentBadge.c.student_id, func.count(StudentBadge.c.badge_id)
+    ), StudentBadge.c.student_id).group_by(StudentBadge.c.student_id))
+
+    for values in result.values():
+        values['level'] = StudentXP.current_level(values['total_xp'])
+    return result
+
+
+def rebuild_student_stats(student_ids=None):
+    """Replace stats rows (all students, or just ``student_ids``) with freshly aggregated values."""
+    computed = compute_student_stats(student_ids)
+    delete = db.delete(StudentStats)
+    if student_ids is not None:
+        delete = delete.where(StudentStats.student_id.in_(student_ids))
+    db.session.execute(delete.execution_options(synchronize_session=False))
+
+    now = datetime.now(timezone.utc)
+    rows = [dict(student_id=sid, updated_at=now, **values) for sid, values in computed.items()]
+    if rows:
+        db.session.execute(db.insert(StudentStats), rows)
+    return len(rows)
+
+
+def reconcile_student_stats(fix=False):
+    """Compare stored stats with the ledger; return [(student_id, field, stored, expected)].
+
+    With ``fix=True`` the drifted students are rebuilt in the current transaction.
+    """
+    computed = compute_student_stats()
+    stored = {s.student_id: s for s in StudentStats.query.all()}
+    drift = []
+    for student_id, expected in computed.items():
+        row = stored.get(student_id)
+        for field in STAT_FIELDS:
+            actual = getattr(row, field) if row else None
+            if actual != expected[field]:
+                drift.append((student_id, field, actual, expected[field]))
+    if fix and drift:
+        rebuild_student_stats(sorted({d[0] for d in drift}))
+    return drift
@@ -0,0 +1,126 @@
+import time
+import threading
+from sqlalchemy import and_, case, event, func, or_
+from app.extensions import db
+from app.models.curriculum import Unit
+from app.models.journey import StudentUnitProgress, LessonContent, LessonProgress
+from app.utils.redis_client import get_redis
+
+INDEX_TTL = 300  # seconds; safety net, unit/lesson writes bump VERSION_KEY
+VERSION_KEY = 'curriculum:counts:version'
+
+_index = {'built_at': 0.0, 'version': None, 'units': {}, 'lessons': {}, 'unit_lessons': {}}
+_index_lock = threading.Lock()
+
+
+# ─── Curriculum count index ─────────────────────────────────────────────────
+
+def _count_index():
+    """Unit and lesson totals shared by the worker.
+
+    ``units``: {track_id: n}; ``lessons``: {track_id: lessons with a PDF,
+    video or activity link}; ``unit_lessons``: {(track_id, level_id,
+    unit_id): all lessons}. Rebuilt with two grouped queries whenever another
+    worker bumped the version or the TTL ran out.
+    """
+    version = get_redis().get(VERSION_KEY)
+    if version == _index['version'] and time.monotonic() - _index['built_at'] < INDEX_TTL:
+        return _index
+    with _index_lock:
+        units = dict(db.session.query(Unit.track_id, func.count()).group_by(Unit.track_id))
+        has_content = or_(
+            LessonContent.pdf_file.isnot(None),
+            LessonContent.video_url.isnot(None),
+            LessonContent.activity_url.isnot(None),
+        )
+        lessons, unit_lessons = {}, {}
+        for track_id, level_id, unit_id, total, with_content in db.session.query(
+            LessonContent.track_id, LessonContent.level_id, LessonContent.unit_id,
+            func.count(), func.sum(case((has_content, 1), else_=0)),
+        ).group_by(LessonContent.track_id, LessonContent.level_id, LessonContent.unit_id):
+            unit_lessons[(track_id, level_id, unit_id)] = total
+            lessons[track_id] = lessons.get(track_id, 0) + int(with_content or 0)
+        _index.update(units=units, lessons=lessons, unit_lessons=unit_lessons,
+                      version=version, built_at=time.monotonic())
+    return _index
+
+
+def invalidate_count_index(*_args):
+    """Drop this worker's index now and bump the shared version once the transaction commits."""
+    _index['built_at'] = 0.0
+    db.session.info['count_index_stale'] = True
+
+
+for _model in (Unit, LessonContent):
+    for _evt in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _evt, invalidate_count_index)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _bump_version(session):
+    if session.info.pop('count_index_stale', None):
+        _index['built_at'] = 0.0
+        try:
+            get_redis().incr(VERSION_KEY)
+        except Exception as e:
+            print(f'[CURRICULUM] count index version bump failed: {e}')
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_stale(session):
+    session.info.pop('count_index_stale', None)
+
+
+def unit_count(track_id):
+    return _count_index()['units'].get(track_id, 0)
+
+
+def unit_lesson_count(track_id, level_id, unit_id):
+    return _count_index()['unit_lessons'].get((track_id, level_id, unit_id), 0)
+
+
+# ─── Student progress ───────────────────────────────────────────────────────
+
+def completed_units_by_track(student_id):
+    """{track_id: completed units} for one student in a single grouped query."""
+    return dict(db.session.query(StudentUnitProgress.track_id, func.count()).filter(
+        StudentUnitProgress.student_id == student_id,
+        StudentUnitProgress.status == 'completed',
+    ).group_by(StudentUnitProgress.track_id))
+
+
+def track_progress(student_id, tracks, with_lessons=False, completed=None):
+    """{track_id: {'total', 'completed', 'pct'[, 'lesson_count']}} for the given tracks.
+
+    Unit (and lesson) totals come from the cached count index; completions
+    from one grouped query, or from ``completed`` when the caller already has
+    them.
+    """
+    index = _count_index()
+    if completed is None:
+        completed = completed_units_by_track(student_id)
+    progress = {}
+    for track in tracks:
+        total = index['units'].get(track.id, 0)
+        done = completed.get(track.id, 0)
+        entry = {'total': total, 'completed': done,
+                 'pct': int(done / total * 100) if total > 0 else 0}
+        if with_lessons:
+            entry['lesson_count'] = index['lessons'].get(track.id, 0)
+        progress[track.id] = entry
+    return progress
+
+
+def completed_lessons_by_unit(student_id, track_id=None):
+    """{(track_id, level_id, unit_id): completed lessons} from one grouped join."""
+    query = db.session.query(
+        LessonContent.track_id, LessonContent.level_id, LessonContent.unit_id, func.count(),
+    ).join(LessonProgress, and_(
+        LessonProgress.lesson_id == LessonContent.id,
+        LessonProgress.student_id == student_id,
+        LessonProgress.completed.is_(True),
+    ))
+    if track_id is not None:
+        query = query.filter(LessonContent.track_id == track_id)
+    rows = query.group_by(LessonContent.track_id, LessonContent.level_id, LessonContent.unit_id)
+    return {(t, l, u): n for t, l, u, n in rows}
@@ -0,0 +1,57 @@
+from sqlalchemy import and_, case, exists, literal, select, tuple_
+from sqlalchemy.orm import aliased
+from app.extensions import db
+from app.models.curriculum import Unit
+from app.models.journey import StudentUnitProgress
+
+_COLUMNS = ['student_id', 'track_id', 'level_id', 'unit_id', 'status']
+
+
+def _insert_ignore(source):
+    """``INSERT ... SELECT`` that skips rows already present (uq_student_unit_progress)."""
+    table = StudentUnitProgress.__table__
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).from_select(_COLUMNS, source).on_conflict_do_nothing(
+            index_elements=['student_id', 'track_id', 'level_id', 'unit_id'])
+    else:
+        stmt = db.insert(table).from_select(_COLUMNS, source).prefix_with('OR IGNORE')
+    return db.session.execute(stmt).rowcount
+
+
+def init_unit_progress(student_id, track_id, first_unit):
+    """Create every missing progress row of a track for one student in one statement (caller commits).
+
+    ``first_unit`` is the (level_id, unit_id) that starts as ``current`` when
+    the student has no rows in the track yet; everything else starts locked.
+    Safe to run concurrently: conflicting rows are ignored, and both callers
+    would have written the same statuses.
+    """
+    started = aliased(StudentUnitProgress)
+    status = case(
+        (and_(tuple_(Unit.level_id, Unit.id) == tuple_(*first_unit),
+              ~exists().where(started.student_id == student_id, started.track_id == track_id)),
+         literal('current')),
+        else_=literal('locked'),
+    )
+    source = select(literal(student_id), Unit.track_id, Unit.level_id, Unit.id, status).where(
+        Unit.track_id == track_id)
+    return _insert_ignore(source)
+
+
+def backfill_unit_progress(track_id=None):
+    """Add locked rows for new units to every student who already started the track.
+
+    Run after units are added so the adventure map never has to write on
+    read. Students who have not opened a track get their rows on first visit.
+    Caller commits; returns the number of rows inserted.
+    """
+    starters = select(StudentUnitProgress.student_id, StudentUnitProgress.track_id).distinct()
+    if track_id is not None:
+        starters = starters.where(StudentUnitProgress.track_id == track_id)
+    starters = starters.subquery()
+    source = select(starters.c.student_id, Unit.track_id, Unit.level_id, Unit.id,
+                    literal('locked')).join(starters, starters.c.track_id == Unit.track_id)
+    if track_id is not None:
+        source = source.where(Unit.track_id == track_id)
+    return _insert_ignore(source)
@@ -1,9 +1,15 @@
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
 from app.extensions import db
 from app.models.journey import StudentWallet, CurrencyTransaction
+from app.utils.hud import invalidate_hud
+
+OPENING_BALANCE_REASON = 'رصيد افتتاحي'
 
 
 def get_or_create_wallet(student_id):
-    wallet = StudentWallet.query.filter_by(student_id=student_id).first()
+    """Return the student's wallet row, re-read so atomic updates are visible."""
+    wallet = StudentWallet.query.filter_by(student_id=student_id).populate_existing().first()
     if not wallet:
         wallet = StudentWallet(student_id=student_id, coins=0, gems=0)
         db.session.add(wallet)
@@ -11,45 +17,176 @@ def get_or_create_wallet(student_id):
     return wallet
 
 
+# ─── Ledger ─────────────────────────────────────────────────────────────────
+
+def _queue_ledger(rows):
+    db.session.info.setdefault('wallet_ledger', []).extend(rows)
+    invalidate_hud(*{row['student_id'] for row in rows})
+
+
+def _ledger_rows(student_id, coins, gems, reason):
+    rows = []
+    if coins:
+        rows.append({'student_id': student_id, 'currency': 'coins', 'amount': coins, 'reason': reason})
+    if gems:
+        rows.append({'student_id': student_id, 'currency': 'gems', 'amount': gems, 'reason': reason})
+    return rows
+
+
+@event.listens_for(db.session, 'before_commit')
+def _flush_ledger(session):
+    rows = session.info.pop('wallet_ledger', None)
+    if rows:
+        session.execute(db.insert(CurrencyTransaction).values(rows))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_ledger(session):
+    session.info.pop('wallet_ledger', None)
+
+
+# ─── Credits / debits ───────────────────────────────────────────────────────
+
+def _add_to_wallet(student_id, coins, gems):
+    return db.session.execute(
+        db.update(StudentWallet)
+        .where(StudentWallet.student_id == student_id)
+        .values(coins=StudentWallet.coins + coins, gems=StudentWallet.gems + gems)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+
+
+def credit(student_id, coins=0, gems=0, reason=''):
+    """Add coins/gems with one ``UPDATE ... SET coins = coins + :n`` (caller commits).
+
+    Creates the wallet when missing. Ledger rows are buffered and written in a
+    single multi-row INSERT when the transaction commits.
+    """
+    if not coins and not gems:
+        return
+    if not _add_to_wallet(student_id, coins, gems):
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(StudentWallet).values(
+                    student_id=student_id, coins=coins, gems=gems))
+        except IntegrityError:
+            # A concurrent request created the wallet first; anything else
+            # (e.g. an unknown student) still finds no row and re-raises
+            if not _add_to_wallet(student_id, coins, gems):
+                raise
+    _queue_ledger(_ledger_rows(student_id, coins, gems, reason))
+
+
+def debit(student_id, coins=0, gems=0, reason=''):
+    """Subtract coins/gems only if the balance covers it; returns False otherwise.
+
+    The balance check is part of the UPDATE (``WHERE coins >= :n``), so two
+    concurrent purchases can never overdraw a wallet. Caller commits.
+    """
+    if not coins and not gems:
+        return True
+    updated = db.session.execute(
+        db.update(StudentWallet)
+        .where(StudentWallet.student_id == student_id,
+               StudentWallet.coins >= coins,
+               StudentWallet.gems >= gems)
+        .values(coins=StudentWallet.coins - coins, gems=StudentWallet.gems - gems)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    if not updated:
+        return False
+    _queue_ledger(_ledger_rows(student_id, -coins, -gems, reason))
+    return True
+
+
+def credit_many(student_ids, coins=0, gems=0, reason=''):
+    """Credit the same amounts to many wallets with set-based statements (caller commits)."""
+    student_ids = list(student_ids)
+    if not student_ids or (not coins and not gems):
+        return
+    existing = {sid for (sid,) in db.session.query(StudentWallet.student_id).filter(
+        StudentWallet.student_id.in_(student_ids))}
+    missing = [sid for sid in student_ids if sid not in existing]
+    if missing:
+        db.session.execute(db.insert(StudentWallet).values(
+            [{'student_id': sid, 'coins': 0, 'gems': 0} for sid in missing]))
+    db.session.execute(
+        db.update(StudentWallet)
+        .where(StudentWallet.student_id.in_(student_ids))
+        .values(coins=StudentWallet.coins + coins, gems=StudentWallet.gems + gems)
+        .execution_options(synchronize_session=False)
+    )
+    _queue_ledger([row for sid in student_ids for row in _ledger_rows(sid, coins, gems, reason)])
+
+
 def award_coins(student_id, amount, reason=''):
-    wallet = get_or_create_wallet(student_id)
-    wallet.coins += amount
-    db.session.add(CurrencyTransaction(
-        student_id=student_id, currency='coins', amount=amount, reason=reason
-    ))
+    credit(student_id, coins=amount, reason=reason)
     db.session.commit()
-    return wallet.coins
+    return get_or_create_wallet(student_id).coins
 
 
 def award_gems(student_id, amount, reason=''):
-    wallet = get_or_create_wallet(student_id)
-    wallet.gems += amount
-    db.session.add(CurrencyTransaction(
-        student_id=student_id, currency='gems', amount=amount, reason=reason
-    ))
+    credit(student_id, gems=amount, reason=reason)
     db.session.commit()
-    return wallet.gems
+    return get_or_create_wallet(student_id).gems
 
 
 def spend_coins(student_id, amount, reason=''):
-    wallet = get_or_create_wallet(student_id)
-    if wallet.coins < amount:
-        return False
-    wallet.coins -= amount
-    db.session.add(CurrencyTransaction(
-        student_id=student_id, currency='coins', amount=-amount, reason=reason
-    ))
+    ok = debit(student_id, coins=amount, reason=reason)
     db.session.commit()
-    return True
+    return ok
 
 
 def spend_gems(student_id, amount, reason=''):
-    wallet = get_or_create_wallet(student_id)
-    if wallet.gems < amount:
-        return False
-    wallet.gems -= amount
-    db.session.add(CurrencyTransaction(
-        student_id=student_id, currency='gems', amount=-amount, reason=reason
-    ))
+    ok = debit(student_id, gems=amount, reason=reason)
     db.session.commit()
-    return True
+    return ok
+
+
+# ─── Reconciliation ─────────────────────────────────────────────────────────
+
+def _ledger_totals():
+    totals = {}
+    rows = db.session.query(
+        CurrencyTransaction.student_id, CurrencyTransaction.currency,
+        func.sum(CurrencyTransaction.amount),
+    ).group_by(CurrencyTransaction.student_id, CurrencyTransaction.currency)
+    for student_id, currency, total in rows:
+        totals.setdefault(student_id, {'coins': 0, 'gems': 0})[currency] = int(total or 0)
+    return totals
+
+
+def reconcile_wallets(fix=False, adopt_balances=False):
+    """Compare wallet balances with the ledger; return [(student_id, currency, balance, ledger)].
+
+    ``fix`` rewrites balances from the ledger. ``adopt_balances`` instead writes
+    an opening-balance ledger row for each difference — use it once for wallets
+    that predate the ledger. Caller commits.
+    """
+    totals = _ledger_totals()
+    wallets = {w.student_id: w for w in StudentWallet.query.all()}
+    drift = []
+    for student_id in sorted(set(totals) | set(wallets)):
+        wallet = wallets.get(student_id)
+        ledger = totals.get(student_id, {'coins': 0, 'gems': 0})
+        for currency in ('coins', 'gems'):
+            balance = getattr(wallet, currency) if wallet else 0
+            if balance != ledger[currency]:
+                drift.append((student_id, currency, balance, ledger[currency]))
+
+    if drift and adopt_balances:
+        _queue_ledger([
+            {'student_id': sid, 'currency': currency, 'amount': balance - ledger,
+             'reason': OPENING_BALANCE_REASON}
+            for sid, currency, balance, ledger in drift
+        ])
+    elif drift and fix:
+        invalidate_hud(*{d[0] for d in drift})
+        for student_id in {d[0] for d in drift}:
+            ledger = totals.get(student_id, {'coins': 0, 'gems': 0})
+            if student_id in wallets:
+                wallets[student_id].coins = ledger['coins']
+                wallets[student_id].gems = ledger['gems']
+            else:
+                db.session.add(StudentWallet(student_id=student_id, **ledger))
+    return drift
@@ -0,0 +1,139 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import cast, event, func
+from app.extensions import db
+from app.models.gamification import StudentXP, StudentXPDaily
+
+COMPACT_DAYS = 35  # default window re-derived by the compaction job
+
+
+def today():
+    return datetime.now(timezone.utc).date()
+
+
+# ─── Writes ─────────────────────────────────────────────────────────────────
+
+def record_daily_xp(student_id, amount, track_id=None):
+    """Queue an XP amount for today's bucket; written once when the transaction commits."""
+    record_daily_xp_many([student_id], amount, track_id)
+
+
+def record_daily_xp_many(student_ids, amount, track_id=None):
+    """``record_daily_xp`` for a batch of students sharing one award."""
+    pending = db.session.info.setdefault('xp_daily', Counter())
+    day = today()
+    for sid in student_ids:
+        pending[(sid, day, track_id or '')] += amount
+
+
+def _upsert(rows):
+    table = StudentXPDaily.__table__
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[table.c.student_id, table.c.day, table.c.track_id],
+        set_={'xp': table.c.xp + stmt.excluded.xp},
+    )
+
+
+@event.listens_for(db.session, 'before_commit')
+def _flush_daily(session):
+    pending = session.info.pop('xp_daily', None)
+    if pending:
+        session.execute(_upsert([
+            {'student_id': sid, 'day': day, 'track_id': track_id, 'xp': xp}
+            for (sid, day, track_id), xp in pending.items() if xp
+        ]))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _drop_daily(session):
+    session.info.pop('xp_daily', None)
+
+
+# ─── Compaction ─────────────────────────────────────────────────────────────
+
+def _day_expr(column):
+    if db.engine.dialect.name == 'postgresql':
+        return cast(column, db.Date)
+    return func.date(column)
+
+
+def compact_xp_rollups(days=COMPACT_DAYS):
+    """Re-derive the buckets of the last ``days`` days (all when None) from student_xp.
+
+    Repairs buckets missed by direct ledger edits or imports; live awards keep
+    them current in between. Caller commits. Returns the number of buckets written.
+    """
+    since = today() - timedelta(days=days - 1) if days else None
+    delete = db.delete(StudentXPDaily)
+    if since:
+        delete = delete.where(StudentXPDaily.day >= since)
+    db.session.execute(delete)
+
+    day = _day_expr(StudentXP.created_at).label('day')
+    track = func.coalesce(StudentXP.track_id, '').label('track_id')
+    source = db.select(StudentXP.student_id, day, track, func.sum(StudentXP.amount)).group_by(
+        StudentXP.student_id, day, track)
+    if since:
+        source = source.where(StudentXP.created_at >= datetime.combine(since, datetime.min.time()))
+    return db.session.execute(db.insert(StudentXPDaily).from_select(
+        ['student_id', 'day', 'track_id', 'xp'], source)).rowcount
+
+
+def ensure_xp_rollups():
+    """Build every bucket on first boot after the rollup table was added."""
+    if db.session.query(StudentXPDaily.student_id).first() is None and \
+            db.session.query(StudentXP.id).first() is not None:
+        count = compact_xp_rollups(days=None)
+        db.session.commit()
+        print(f'[ROLLUP] Built {count} daily XP buckets from the ledger')
+
+
+# ─── Reads ──────────────────────────────────────────────────────────────────
+
+def xp_between(student_ids, start, end=None, track_id=None):
+    """{student_id: XP earned from ``start`` to ``end`` (inclusive days)} for many students."""
+    query = db.session.query(StudentXPDaily.student_id, func.sum(StudentXPDaily.xp)).filter(
+        StudentXPDaily.student_id.in_(list(student_ids)), StudentXPDaily.day >= start)
+    if end is not None:
+        query = query.filter(StudentXPDaily.day <= end)
+    if track_id is not None:
+        query = query.filter(StudentXPDaily.track_id == track_id)
+    return {sid: int(total or 0) for sid, total in query.group_by(StudentXPDaily.student_id)}
+
+
+def daily_xp(student_id, start, end=None):
+    """[(day, xp)] for every day of the range, zero-filled, oldest first."""
+    end = end or today()
+    rows = dict(db.session.query(StudentXPDaily.day, func.sum(StudentXPDaily.xp)).filter(
+        StudentXPDaily.student_id == student_id,
+        StudentXPDaily.day >= start, StudentXPDaily.day <= end,
+    ).group_by(StudentXPDaily.day))
+    span = (end - start).days + 1
+    return [(start + timedelta(days=i), int(rows.get(start + timedelta(days=i)) or 0))
+            for i in range(max(span, 0))]
+
+
+def recent_daily_xp(student_id, days=30):
+    """``daily_xp`` for the last ``days`` days including today."""
+    end = today()
+    return daily_xp(student_id, end - timedelta(days=days - 1), end)
+
+
+def weekly_xp(student_id, weeks=8):
+    """[(monday, xp)] for the last ``weeks`` ISO weeks including the current one."""
+    end = today()
+    first_monday = end - timedelta(days=end.weekday()) - timedelta(weeks=weeks - 1)
+    totals = [0] * weeks
+    for day, xp in daily_xp(student_id, first_monday, end):
+        totals[(day - first_monday).days // 7] += xp
+    return [(first_monday + timedelta(weeks=i), totals[i]) for i in range(weeks)]
+
+
+def week_start(day=None):
+    day = day or today()
+    return day - timedelta(days=day.weekday())
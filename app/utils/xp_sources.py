@@ -0,0 +1,75 @@
+from sqlalchemy import text
+
+# What api.end_session wrote before attendance reasons carried the session title
+LEGACY_ATTENDANCE_REASON = 'حضور جلسة'
+
+# Rows written before student_xp carried structured sources only have the
+# free-text reason. Each statement recognises one reason format produced by
+# the award paths and fills source_type plus whatever ids it can resolve.
+_BACKFILL = [
+    # 'إكمال مهمة: {quest.title_ar}'
+    ("""UPDATE student_xp SET source_type = 'quest',
+            quest_id = (SELECT q.id FROM quests q
+                        WHERE student_xp.reason = :quest || q.title_ar ORDER BY q.id LIMIT 1),
+            track_id = (SELECT q.track_id FROM quests q
+                        WHERE student_xp.reason = :quest || q.title_ar ORDER BY q.id LIMIT 1)
+        WHERE source_type IS NULL AND reason LIKE :quest || '%'""", {'quest': 'إكمال مهمة: '}),
+    # 'إكمال نشاط: {activity.title_ar}'
+    ("""UPDATE student_xp SET source_type = 'activity',
+            activity_id = (SELECT a.id FROM activities a
+                           WHERE student_xp.reason = :activity || a.title_ar ORDER BY a.id LIMIT 1)
+        WHERE source_type IS NULL AND reason LIKE :activity || '%'""", {'activity': 'إكمال نشاط: '}),
+    ("""UPDATE student_xp SET
+            track_id = (SELECT a.track_id FROM activities a WHERE a.id = student_xp.activity_id),
+            level_id = (SELECT a.level_id FROM activities a WHERE a.id = student_xp.activity_id),
+            unit_id = (SELECT a.unit_id FROM activities a WHERE a.id = student_xp.activity_id)
+        WHERE source_type = 'activity' AND activity_id IS NOT NULL AND track_id IS NULL""", {}),
+    # 'إكمال درس: {lesson.title_ar}'
+    ("""UPDATE student_xp SET source_type = 'lesson',
+            track_id = (SELECT l.track_id FROM lesson_contents l
+                        WHERE student_xp.reason = :lesson || l.title_ar ORDER BY l.id LIMIT 1),
+            level_id = (SELECT l.level_id FROM lesson_contents l
+                        WHERE student_xp.reason = :lesson || l.title_ar ORDER BY l.id LIMIT 1),
+            unit_id = (SELECT l.unit_id FROM lesson_contents l
+                       WHERE student_xp.reason = :lesson || l.title_ar ORDER BY l.id LIMIT 1)
+        WHERE source_type IS NULL AND reason LIKE :lesson || '%'""", {'lesson': 'إكمال درس: '}),
+    # 'إكمال وحدة في {track.name_ar}' (the track id when the track was missing)
+    ("""UPDATE student_xp SET source_type = 'verse_unit',
+            track_id = (SELECT t.id FROM tracks t
+                        WHERE student_xp.reason IN (:unit || t.name_ar, :unit || t.id)
+                        ORDER BY t.id LIMIT 1)
+        WHERE source_type IS NULL AND reason LIKE :unit || '%'""", {'unit': 'إكمال وحدة في '}),
+    # 'حضور جلسة: {session.title}' (and the older bare 'حضور جلسة') / live-room 'نشاط: {title}'
+    ("""UPDATE student_xp SET source_type = 'attendance'
+        WHERE source_type IS NULL AND (reason = :legacy OR reason LIKE :attendance || '%')""",
+     {'attendance': 'حضور جلسة: ', 'legacy': LEGACY_ATTENDANCE_REASON}),
+    ("""UPDATE student_xp SET source_type = 'room_activity'
+        WHERE source_type IS NULL AND session_id IS NOT NULL AND reason LIKE :room || '%'""",
+     {'room': 'نشاط: '}),
+    # 'واجب: ...' (teacher portal) / 'تقييم واجب: ...' (API)
+    ("""UPDATE student_xp SET source_type = 'homework'
+        WHERE source_type IS NULL AND (reason LIKE :hw || '%' OR reason LIKE :hw_api || '%')""",
+     {'hw': 'واجب: ', 'hw_api': 'تقييم واجب: '}),
+    ("""UPDATE student_xp SET source_type = 'daily_reward'
+        WHERE source_type IS NULL AND reason = :chest""", {'chest': 'صندوق كنز يومي'}),
+    # Session-bound rows take the session's unit, else its group's track
+    ("""UPDATE student_xp SET
+            track_id = (SELECT COALESCE(s.unit_track_id, g.track_id) FROM sessions s
+                        LEFT JOIN groups g ON g.id = s.group_id WHERE s.id = student_xp.session_id),
+            level_id = (SELECT s.unit_level_id FROM sessions s WHERE s.id = student_xp.session_id),
+            unit_id = (SELECT s.unit_id FROM sessions s WHERE s.id = student_xp.session_id)
+        WHERE session_id IS NOT NULL AND track_id IS NULL""", {}),
+    ("""UPDATE student_xp SET source_type = 'manual' WHERE source_type IS NULL""", {}),
+]
+
+
+def backfill_xp_sources(conn):
+    """Derive source_type/track/unit/quest/activity ids from legacy XP reasons.
+
+    Idempotent: only rows without a ``source_type`` (or without a resolved
+    track) are touched. Returns the summed rowcount of the statements.
+    """
+    updated = 0
+    for sql, params in _BACKFILL:
+        updated += conn.execute(text(sql), params).rowcount or 0
+    return updated
@@ -69,62 +69,13 @@ def process_slides(resource_id):
 
 
 @celery.task
-def check_badges(student_id):
-    """Check and award any new badges for a student."""
+def check_badges(student_id, events=None):
+    """Run the badge engine for a student; ``events`` are BadgeEvent values (all when omitted)."""
     with app.app_context():
         from app.extensions import db
-        from app.models.user import User
-        from app.models.gamification import Badge, BadgeCriteria, StudentXP, Streak, StudentBadge
-        from app.models.classroom import Attendance, AttendanceStatus
-        from app.models.homework import HomeworkSubmission
-        from app.models.notification import Notification, NotificationType
-
-        student = db.session.get(User, student_id)
-        if not student:
-            return
-
-        earned_ids = {b.id for b in student.badges_earned.all()}
-        all_badges = Badge.query.all()
-
-        for badge in all_badges:
-            if badge.id in earned_ids:
-                continue
-
-            earned = False
-            if badge.criteria_type == BadgeCriteria.SESSIONS_ATTENDED:
-                count = Attendance.query.filter_by(
-                    student_id=student_id, status=AttendanceStatus.PRESENT
-                ).count()
-                earned = count >= badge.criteria_value
-
-            elif badge.criteria_type == BadgeCriteria.XP_EARNED:
-                total = StudentXP.total_xp(student_id)
-                earned = total >= badge.criteria_value
-
-            elif badge.criteria_type == BadgeCriteria.STREAK_DAYS:
-                streak = Streak.query.filter_by(student_id=student_id).first()
-                earned = streak and streak.longest_streak >= badge.criteria_value
-
-            elif badge.criteria_type == BadgeCriteria.ASSIGNMENTS_COMPLETED:
-                count = HomeworkSubmission.query.filter(
-                    HomeworkSubmission.student_id == student_id,
-                    HomeworkSubmission.grade.isnot(None),
-                ).count()
-                earned = count >= badge.criteria_value
-
-            if earned:
-                db.session.execute(StudentBadge.insert().values(
-                    student_id=student_id, badge_id=badge.id,
-                ))
-                # Notify student
-                notif = Notification(
-                    user_id=student_id,
-                    title=f'شارة جديدة: {badge.name_ar}',
-                    message=badge.description_ar,
-                    type=NotificationType.BADGE,
-                )
-                db.session.add(notif)
+        from app.utils.badge_engine import BadgeEvent, handle_events
 
+        handle_events(student_id, *(BadgeEvent(e) for e in events or ()))
         db.session.commit()
 
 
@@ -162,3 +113,53 @@ def send_session_reminder(session_id):
         )
         db.session.add(notif)
         db.session.commit()
+
+
+@celery.task
+def rebuild_leaderboards():
+    """Recreate the Redis leaderboards from the daily XP buckets."""
+    with app.app_context():
+        from app.utils.leaderboard import rebuild_leaderboards as rebuild
+        rebuild()
+
+
+@celery.task(autoretry_for=(Exception,), retry_backoff=True, max_retries=8, acks_late=True)
+def finalize_session(session_id):
+    """Apply attendance XP, coins, streaks and badges for a session that was just closed.
+
+    Retried on failure and acknowledged only once done; award_attendance
+    skips sessions that were already paid, so a redelivery is harmless.
+    """
+    with app.app_context():
+        from app.utils.session_finalizer import award_attendance
+        award_attendance(session_id)
+
+
+@celery.task
+def reconcile_session_awards(days=None):
+    """Pay recent completed sessions whose reward task was lost (schedule hourly)."""
+    with app.app_context():
+        from app.utils.session_finalizer import reconcile_session_awards as reconcile, RECONCILE_DAYS
+        paid = reconcile(days=days or RECONCILE_DAYS)
+        if paid:
+            print(f'[SESSION] Reconciled attendance awards: {paid}')
+
+
+@celery.task
+def compact_xp_rollups(days=None):
+    """Re-derive recent daily XP buckets from the ledger (schedule nightly)."""
+    with app.app_context():
+        from app.extensions import db
+        from app.utils.xp_rollup import compact_xp_rollups as compact, COMPACT_DAYS
+        compact(days=days or COMPACT_DAYS)
+        db.session.commit()
+
+
+@celery.task
+def backfill_unit_progress(track_id=None):
+    """Give students who started a track progress rows for its newly added units."""
+    with app.app_context():
+        from app.extensions import db
+        from app.utils.unit_progress import backfill_unit_progress as backfill
+        backfill(track_id)
+        db.session.commit()
@@ -30,13 +30,32 @@ class Config:
     HMS_SECRET = os.environ.get('HMS_SECRET', '')
     HMS_TEMPLATE_ID = os.environ.get('HMS_TEMPLATE_ID', '')
 
+    # Redis (leaderboards, caches, room state). Unset falls back to an
+    # in-process store (single worker only); when set, Redis is required.
+    REDIS_URL = os.environ.get('REDIS_URL')
+
     # Celery
     CELERY_BROKER_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
     CELERY_RESULT_BACKEND = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 
+    # Run session-end rewards in the Celery worker instead of the request
+    SESSION_FINALIZE_ASYNC = os.environ.get('SESSION_FINALIZE_ASYNC', '') == '1'
+
+    # Run schema DDL, create_all and seed checks on boot even when the stored
+    # schema fingerprint matches the code
+    BOOT_FULL_CHECK = os.environ.get('BOOT_FULL_CHECK', '') == '1'
+
     # SocketIO
     SOCKETIO_MESSAGE_QUEUE = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
 
+    # Gunicorn workers per node (see docs/scaling.md). Polling requests are
+    # not sticky across the workers of one gunicorn, so with more than one
+    # worker Socket.IO is limited to WebSocket unless SOCKETIO_TRANSPORTS says otherwise.
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY') or 1)
+    SOCKETIO_TRANSPORTS = (os.environ['SOCKETIO_TRANSPORTS'].split(',')
+                           if os.environ.get('SOCKETIO_TRANSPORTS')
+                           else ['websocket'] if WEB_CONCURRENCY > 1 else None)
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -48,6 +67,7 @@ class DevelopmentConfig(Config):
     SOCKETIO_MESSAGE_QUEUE = None
     CELERY_BROKER_URL = None
     CELERY_RESULT_BACKEND = None
+    REDIS_URL = os.environ.get('REDIS_URL')
 
 
 class ProductionConfig(Config):
@@ -68,6 +88,7 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    REDIS_URL = None
 
 
 config = {
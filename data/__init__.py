@@ -0,0 +1,55 @@
+"""Curriculum source data: one nested dict per track (track → levels → units)."""
+
+
+def all_tracks():
+    """Every track dict, in display order."""
+    from data.coding_verse import CODING_VERSE
+    from data.computer_basics import COMPUTER_BASICS
+    from data.digital_safety import DIGITAL_SAFETY
+    from data.data_verse import DATA_VERSE
+    return [CODING_VERSE, COMPUTER_BASICS, DIGITAL_SAFETY, DATA_VERSE]
+
+
+def flatten_curriculum(tracks):
+    """Flatten nested track dicts into per-table row lists.
+
+    Returns {'tracks', 'levels', 'units', 'objectives', 'skills'}, each a
+    list of dicts keyed by column name, ready for a single executemany or
+    ``insert().values([...])`` per table. Units come out in curriculum order
+    (levels, then units, as listed in the data).
+    """
+    rows = {'tracks': [], 'levels': [], 'units': [], 'objectives': [], 'skills': []}
+    for t_order, track in enumerate(tracks):
+        rows['tracks'].append({
+            'id': track['id'], 'name': track['name'], 'name_ar': track['name_ar'],
+            'icon': track['icon'], 'color': track['color'],
+            'description_ar': track.get('description_ar', track.get('description', '')),
+            'sort_order': t_order,
+        })
+        for l_order, level in enumerate(track['levels']):
+            rows['levels'].append({
+                'id': level['id'], 'track_id': track['id'],
+                'name': level['name'], 'name_ar': level['name_ar'],
+                'icon': level['icon'], 'slogan': level['slogan'], 'goal': level['goal'],
+                'sort_order': l_order,
+            })
+            for u_order, unit in enumerate(level['units']):
+                project = unit.get('project', {})
+                key = {'track_id': track['id'], 'level_id': level['id']}
+                rows['units'].append(dict(
+                    key, id=unit['id'], name=unit['name'], name_en=unit['name_en'],
+                    description=unit['description'],
+                    project_name=project.get('name', ''),
+                    project_description=project.get('description', ''),
+                    sort_order=u_order,
+                ))
+                key = dict(key, unit_id=unit['id'])
+                for o_order, obj in enumerate(unit.get('objectives', [])):
+                    rows['objectives'].append(dict(
+                        key, bloom=obj['bloom'], bloom_en=obj['bloom_en'],
+                        objective=obj['objective'], outcome=obj['outcome'],
+                        sort_order=o_order,
+                    ))
+                for s_order, skill in enumerate(unit.get('skills', [])):
+                    rows['skills'].append(dict(key, name=skill, sort_order=s_order))
+    return rows
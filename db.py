@@ -1,24 +1,40 @@
 import sqlite3
 import os
-
-from flask import g, current_app
+import threading
 
 DATABASE = os.path.join(os.path.dirname(__file__), 'instance', 'verse.db')
 
+_local = threading.local()
+
+
+def _connect():
+    os.makedirs(os.path.dirname(DATABASE), exist_ok=True)
+    conn = sqlite3.connect(DATABASE)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA foreign_keys = ON")
+    # WAL lets page loads read while an edit is being written; NORMAL sync is
+    # durable in WAL mode except across power loss
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA mmap_size = 268435456")
+    conn.execute("PRAGMA cache_size = -16000")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
 
 def get_db():
-    if 'db' not in g:
-        os.makedirs(os.path.dirname(DATABASE), exist_ok=True)
-        g.db = sqlite3.connect(DATABASE)
-        g.db.row_factory = sqlite3.Row
-        g.db.execute("PRAGMA foreign_keys = ON")
-    return g.db
+    """This thread's connection, opened (and tuned) once and reused across requests."""
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = _local.conn = _connect()
+    return conn
 
 
 def close_db(e=None):
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    """End the request: drop anything left uncommitted, keep the connection open."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
 
 
 def init_db(app):
@@ -34,60 +50,53 @@ def init_db(app):
 
 
 def seed_data(db):
-    from data.coding_verse import CODING_VERSE
-    from data.computer_basics import COMPUTER_BASICS
-    from data.digital_safety import DIGITAL_SAFETY
-    from data.data_verse import DATA_VERSE
-
-    tracks = [CODING_VERSE, COMPUTER_BASICS, DIGITAL_SAFETY, DATA_VERSE]
-
-    for t_order, track in enumerate(tracks):
-        db.execute(
-            "INSERT INTO tracks (id, name, name_ar, icon, color, description_ar, sort_order) "
-            "VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (track["id"], track["name"], track["name_ar"], track["icon"],
-             track["color"], track.get("description_ar", track.get("description", "")), t_order)
-        )
-
-        for l_order, level in enumerate(track["levels"]):
-            db.execute(
-                "INSERT INTO levels (id, track_id, name, name_ar, icon, slogan, goal, sort_order) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (level["id"], track["id"], level["name"], level["name_ar"],
-                 level["icon"], level["slogan"], level["goal"], l_order)
-            )
-
-            for u_order, unit in enumerate(level["units"]):
-                project = unit.get("project", {})
-                db.execute(
-                    "INSERT INTO units (id, level_id, track_id, name, name_en, description, "
-                    "project_name, project_description, sort_order) "
-                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                    (unit["id"], level["id"], track["id"], unit["name"],
-                     unit["name_en"], unit["description"],
-                     project.get("name", ""), project.get("description", ""), u_order)
-                )
-
-                for o_order, obj in enumerate(unit.get("objectives", [])):
-                    db.execute(
-                        "INSERT INTO objectives (track_id, level_id, unit_id, bloom, bloom_en, "
-                        "objective, outcome, sort_order) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                        (track["id"], level["id"], unit["id"],
-                         obj["bloom"], obj["bloom_en"], obj["objective"], obj["outcome"], o_order)
-                    )
-
-                for s_order, skill in enumerate(unit.get("skills", [])):
-                    db.execute(
-                        "INSERT INTO skills (track_id, level_id, unit_id, name, sort_order) "
-                        "VALUES (?, ?, ?, ?, ?)",
-                        (track["id"], level["id"], unit["id"], skill, s_order)
-                    )
+    from data import all_tracks, flatten_curriculum
+
+    rows = flatten_curriculum(all_tracks())
+    db.executemany(
+        "INSERT INTO tracks (id, name, name_ar, icon, color, description_ar, sort_order) "
+        "VALUES (:id, :name, :name_ar, :icon, :color, :description_ar, :sort_order)",
+        rows["tracks"]
+    )
+    db.executemany(
+        "INSERT INTO levels (id, track_id, name, name_ar, icon, slogan, goal, sort_order) "
+        "VALUES (:id, :track_id, :name, :name_ar, :icon, :slogan, :goal, :sort_order)",
+        rows["levels"]
+    )
+    db.executemany(
+        "INSERT INTO units (id, level_id, track_id, name, name_en, description, "
+        "project_name, project_description, sort_order) "
+        "VALUES (:id, :level_id, :track_id, :name, :name_en, :description, "
+        ":project_name, :project_description, :sort_order)",
+        rows["units"]
+    )
+    db.executemany(
+        "INSERT INTO objectives (track_id, level_id, unit_id, bloom, bloom_en, "
+        "objective, outcome, sort_order) VALUES (:track_id, :level_id, :unit_id, "
+        ":bloom, :bloom_en, :objective, :outcome, :sort_order)",
+        rows["objectives"]
+    )
+    db.executemany(
+        "INSERT INTO skills (track_id, level_id, unit_id, name, sort_order) "
+        "VALUES (:track_id, :level_id, :unit_id, :name, :sort_order)",
+        rows["skills"]
+    )
 
 
 def log_edit(db, table_name, record_key, field_name, old_value, new_value):
-    db.execute(
+    log_edits(db, table_name, record_key, [(field_name, old_value, new_value)])
+
+
+def log_edits(db, table_name, record_key, changes):
+    """Log several field changes of one record in a single statement.
+
+    ``changes`` is a list of (field_name, old_value, new_value).
+    """
+    db.executemany(
         "INSERT INTO edit_log (table_name, record_key, field_name, old_value, new_value) "
         "VALUES (?, ?, ?, ?, ?)",
-        (table_name, record_key, field_name, str(old_value) if old_value is not None else None,
-         str(new_value) if new_value is not None else None)
+        [(table_name, record_key, field_name,
+          str(old_value) if old_value is not None else None,
+          str(new_value) if new_value is not None else None)
+         for field_name, old_value, new_value in changes]
     )
@@ -0,0 +1,37 @@
+"""Add structured source columns to student_xp and backfill them from reasons
+
+Revision ID: 003_xp_sources
+Revises: 002_student_stats
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '003_xp_sources'
+down_revision = '002_student_stats'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('student_xp', sa.Column('source_type', sa.String(20), nullable=True))
+    op.add_column('student_xp', sa.Column('track_id', sa.String(50), nullable=True))
+    op.add_column('student_xp', sa.Column('level_id', sa.String(50), nullable=True))
+    op.add_column('student_xp', sa.Column('unit_id', sa.String(50), nullable=True))
+    op.add_column('student_xp', sa.Column('quest_id', sa.Integer(), nullable=True))
+    op.add_column('student_xp', sa.Column('activity_id', sa.Integer(), nullable=True))
+    op.create_index('ix_student_xp_student_track', 'student_xp', ['student_id', 'track_id'])
+    op.create_index('ix_student_xp_student_source', 'student_xp', ['student_id', 'source_type'])
+    op.create_index('ix_student_xp_session_id', 'student_xp', ['session_id'])
+
+    from app.utils.xp_sources import backfill_xp_sources
+    backfill_xp_sources(op.get_bind())
+    # Track boards can now be rebuilt from the ledger: `flask leaderboard rebuild`
+
+
+def downgrade():
+    op.drop_index('ix_student_xp_session_id', 'student_xp')
+    op.drop_index('ix_student_xp_student_source', 'student_xp')
+    op.drop_index('ix_student_xp_student_track', 'student_xp')
+    for col in ('activity_id', 'quest_id', 'unit_id', 'level_id', 'track_id', 'source_type'):
+        op.drop_column('student_xp', col)
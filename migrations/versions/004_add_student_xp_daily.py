@@ -0,0 +1,37 @@
+"""Add student_xp_daily rollup table and fill it from the XP ledger
+
+Revision ID: 004_xp_daily
+Revises: 003_xp_sources
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '004_xp_daily'
+down_revision = '003_xp_sources'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('student_xp_daily',
+        sa.Column('student_id', sa.Integer(), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('day', sa.Date(), primary_key=True),
+        sa.Column('track_id', sa.String(50), primary_key=True, server_default=''),
+        sa.Column('xp', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_index('ix_student_xp_daily_day', 'student_xp_daily', ['day'])
+
+    day = ('CAST(created_at AS DATE)' if op.get_bind().dialect.name == 'postgresql'
+           else 'DATE(created_at)')
+    op.execute(f"""
+        INSERT INTO student_xp_daily (student_id, day, track_id, xp)
+        SELECT student_id, {day}, COALESCE(track_id, ''), SUM(amount)
+        FROM student_xp
+        GROUP BY student_id, {day}, COALESCE(track_id, '')
+    """)
+
+
+def downgrade():
+    op.drop_index('ix_student_xp_daily_day', 'student_xp_daily')
+    op.drop_table('student_xp_daily')
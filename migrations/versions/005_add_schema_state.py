@@ -0,0 +1,25 @@
+"""Add schema_state table for the boot-time schema fingerprint
+
+Revision ID: 005_schema_state
+Revises: 004_xp_daily
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '005_schema_state'
+down_revision = '004_xp_daily'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('schema_state',
+        sa.Column('key', sa.String(50), primary_key=True),
+        sa.Column('value', sa.String(128), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade():
+    op.drop_table('schema_state')
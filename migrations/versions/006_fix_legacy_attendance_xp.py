@@ -0,0 +1,25 @@
+"""Reclassify legacy 'حضور جلسة' XP rows that the 003 backfill filed as manual
+
+Revision ID: 006_legacy_attendance_xp
+Revises: 005_schema_state
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '006_legacy_attendance_xp'
+down_revision = '005_schema_state'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    from app.utils.xp_sources import LEGACY_ATTENDANCE_REASON
+    op.get_bind().execute(sa.text(
+        "UPDATE student_xp SET source_type = 'attendance' "
+        "WHERE source_type = 'manual' AND reason = :reason"
+    ), {'reason': LEGACY_ATTENDANCE_REASON})
+
+
+def downgrade():
+    pass  # data fix only; the old classification was wrong
@@ -0,0 +1,69 @@
+"""Fill student_stats rows for students created before rows were made on insert
+
+Revision ID: 007_fill_student_stats
+Revises: 006_legacy_attendance_xp
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '007_fill_student_stats'
+down_revision = '006_legacy_attendance_xp'
+branch_labels = None
+depends_on = None
+
+# Every student's row, aggregated from the ledger as of this revision (levels
+# use the thresholds of the time). ON CONFLICT keeps rows that already exist.
+FILL_STUDENT_STATS = """
+    INSERT INTO student_stats (student_id, total_xp, level, quests_completed,
+                               activities_completed, sessions_attended, badges_earned, updated_at)
+    SELECT s.student_id, s.total_xp,
+           CASE
+                WHEN s.total_xp >= 25000 THEN 18
+                WHEN s.total_xp >= 21000 THEN 17
+                WHEN s.total_xp >= 18000 THEN 16
+                WHEN s.total_xp >= 15000 THEN 15
+                WHEN s.total_xp >= 12500 THEN 14
+                WHEN s.total_xp >= 10000 THEN 13
+                WHEN s.total_xp >= 8000 THEN 12
+                WHEN s.total_xp >= 6500 THEN 11
+                WHEN s.total_xp >= 5000 THEN 10
+                WHEN s.total_xp >= 4000 THEN 9
+                WHEN s.total_xp >= 3000 THEN 8
+                WHEN s.total_xp >= 2200 THEN 7
+                WHEN s.total_xp >= 1500 THEN 6
+                WHEN s.total_xp >= 1000 THEN 5
+                WHEN s.total_xp >= 600 THEN 4
+                WHEN s.total_xp >= 300 THEN 3
+                WHEN s.total_xp >= 100 THEN 2
+                ELSE 1
+           END,
+           s.quests_completed, s.activities_completed, s.sessions_attended, s.badges_earned,
+           CURRENT_TIMESTAMP
+    FROM (
+        SELECT u.id AS student_id,
+               (SELECT COALESCE(SUM(x.amount), 0) FROM student_xp x
+                WHERE x.student_id = u.id) AS total_xp,
+               (SELECT COUNT(*) FROM student_quests q
+                WHERE q.student_id = u.id AND q.status = 'COMPLETED') AS quests_completed,
+               (SELECT COUNT(*) FROM student_activities a
+                WHERE a.student_id = u.id AND a.status = 'completed') AS activities_completed,
+               (SELECT COUNT(*) FROM attendance att JOIN sessions se ON se.id = att.session_id
+                WHERE att.student_id = u.id AND se.status = 'COMPLETED'
+                  AND att.status IN ('PRESENT', 'LATE')) AS sessions_attended,
+               (SELECT COUNT(*) FROM student_badges b
+                WHERE b.student_id = u.id) AS badges_earned
+        FROM users u
+        WHERE u.role = 'STUDENT'
+    ) s
+    WHERE 1 = 1  -- SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+    ON CONFLICT (student_id) DO NOTHING
+"""
+
+
+def upgrade():
+    op.execute(sa.text(FILL_STUDENT_STATS))
+
+
+def downgrade():
+    pass  # the rows are a cache of the ledger; keeping them is harmless
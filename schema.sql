@@ -67,3 +67,6 @@ CREATE TABLE IF NOT EXISTS edit_log (
     new_value TEXT,
     timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
 );
+
+CREATE INDEX IF NOT EXISTS ix_objectives_unit ON objectives (track_id, level_id, unit_id, sort_order);
+CREATE INDEX IF NOT EXISTS ix_skills_unit ON skills (track_id, level_id, unit_id, sort_order);
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Socket.IO fan-out benchmark for the live-room handlers.
+
+Opens --clients WebSocket connections spread over --rooms classroom rooms;
+every client joins its room as a guest and sends ``chat_message`` events at
+--rate per second, which the server fans out to the whole room inside its
+batched ``room_frame`` events. It reports events sent, throttled and
+delivered per second plus delivery latency (p50/p95), once per gunicorn
+worker count. See docs/scaling.md for how to read the numbers.
+
+Chat is rate limited per sender (``room_outbox.RATE_LIMITS``: a burst of 5,
+then 1 message per second), so a --rate above 1 mostly measures the
+throttle; add clients to raise the load instead.
+
+Usage:
+    # Start gunicorn -k gevent -w N locally for each N (needs Redis for N > 1)
+    REDIS_URL=redis://localhost:6379/0 python scripts/bench_socketio.py --workers 1,2,4
+
+    # Or load an already running deployment
+    python scripts/bench_socketio.py --url https://verse.example.com --clients 400
+
+Requirements:
+    pip install "python-socketio[client]" websocket-client gunicorn gevent
+"""
+
+import os
+import sys
+import time
+import argparse
+import subprocess
+import multiprocessing as mp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _client_process(url, rooms, client_ids, rate, ready, start, duration, results):
+    import socketio
+
+    sent = 0
+    throttled = [0]
+    latencies = []
+    clients = []
+    window = {}
+
+    def in_window(t):
+        return bool(window) and window['start'] <= t <= window['end']
+
+    def make_handlers(sio):
+        def on_frame(frame):
+            now = time.time()
+            for event, data, skip_sid in frame:
+                if event != 'chat_message' or (skip_sid and skip_sid == sio.sid):
+                    continue
+                if in_window(data.get('t', 0)):
+                    latencies.append(now - data['t'])
+
+        def on_error(data):
+            if data.get('event') == 'chat_message' and in_window(time.time()):
+                throttled[0] += 1
+        return on_frame, on_error
+
+    for cid in client_ids:
+        sio = socketio.Client(reconnection=False)
+        on_frame, on_error = make_handlers(sio)
+        sio.on('room_frame', on_frame)
+        sio.on('error', on_error)
+        sio.connect(url, transports=['websocket'], wait_timeout=30)
+        sio.emit('join_session', {'session_id': rooms[cid % len(rooms)]})
+        clients.append((cid, sio))
+
+    ready.put(len(clients))
+    start_at = start.get()
+    window.update(start=start_at, end=start_at + duration)
+    interval = 1.0 / rate
+    next_tick = start_at
+    while True:
+        now = time.time()
+        if now >= window['end']:
+            break
+        if now < next_tick:
+            time.sleep(next_tick - now)
+            continue
+        for cid, sio in clients:
+            sio.emit('chat_message', {
+                'session_id': rooms[cid % len(rooms)], 'from': cid,
+                't': time.time(), 'message': 'bench',
+            })
+            sent += 1
+        next_tick += interval
+
+    time.sleep(1.0)  # let in-flight deliveries land
+    for _cid, sio in clients:
+        sio.disconnect()
+    results.put((sent, throttled[0], latencies))
+
+
+def run_load(url, clients, rooms, rate, duration, procs):
+    ready, start, results = mp.Queue(), mp.Queue(), mp.Queue()
+    room_ids = [900000 + i for i in range(rooms)]  # guests only, no DB rows needed
+    workers = []
+    for p in range(procs):
+        ids = list(range(p, clients, procs))
+        proc = mp.Process(target=_client_process,
+                          args=(url, room_ids, ids, rate, ready, start, duration, results))
+        proc.start()
+        workers.append(proc)
+    connected = sum(ready.get(timeout=120) for _ in workers)
+    start_at = time.time() + 1.0
+    for _ in workers:
+        start.put(start_at)
+
+    sent, throttled, latencies = 0, 0, []
+    for _ in workers:
+        s, thr, lat = results.get(timeout=duration + 120)
+        sent += s
+        throttled += thr
+        latencies.extend(lat)
+    for proc in workers:
+        proc.join()
+
+    latencies.sort()
+    pct = (lambda q: latencies[min(int(len(latencies) * q), len(latencies) - 1)] * 1000
+           if latencies else float('nan'))
+    return {
+        'connected': connected,
+        'sent_per_s': sent / duration,
+        'throttled_per_s': throttled / duration,
+        'delivered_per_s': len(latencies) / duration,
+        'p50_ms': pct(0.50), 'p95_ms': pct(0.95),
+    }
+
+
+def start_server(workers, port, config):
+    env = dict(os.environ, FLASK_ENV=config, WEB_CONCURRENCY=str(workers),
+               SOCKETIO_TRANSPORTS='websocket')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--worker-class', 'gevent', '-w', str(workers),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'run:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    import urllib.request
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/socket.io/?EIO=4&transport=websocket',
+                                   timeout=2)
+        except Exception as e:
+            if getattr(e, 'code', None) is not None:  # any HTTP answer means it is up
+                return proc
+            time.sleep(0.5)
+        else:
+            return proc
+    proc.kill()
+    raise RuntimeError(f'gunicorn -w {workers} did not come up on port {port}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--url', help='Benchmark this server instead of starting gunicorn.')
+    parser.add_argument('--workers', default='1,2,4',
+                        help='Comma-separated gunicorn worker counts to compare (default 1,2,4).')
+    parser.add_argument('--config', default='testing',
+                        help='FLASK_ENV for the spawned servers (default testing).')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--rooms', type=int, default=10)
+    parser.add_argument('--rate', type=float, default=1.0,
+                        help='Messages per client per second (chat allows 1/s after a burst of 5).')
+    parser.add_argument('--duration', type=float, default=20.0, help='Seconds of measured load.')
+    parser.add_argument('--procs', type=int, default=max(2, (os.cpu_count() or 2) // 2),
+                        help='Load-generator processes.')
+    args = parser.parse_args()
+
+    targets = [(None, args.url)] if args.url else [
+        (int(n), f'http://127.0.0.1:{args.port}') for n in args.workers.split(',')
+    ]
+    if not args.url and max(n for n, _ in targets) > 1 and not os.environ.get('REDIS_URL'):
+        print('REDIS_URL must point at a Redis server to compare more than one worker')
+        return 1
+
+    print(f'{args.clients} clients, {args.rooms} rooms, {args.rate}/s each, {args.duration:.0f}s')
+    print(f"{'workers':>8} {'connected':>9} {'sent/s':>9} {'throttled/s':>12} "
+          f"{'delivered/s':>12} {'p50 ms':>8} {'p95 ms':>8}")
+    for workers, url in targets:
+        server = start_server(workers, args.port, args.config) if workers else None
+        try:
+            r = run_load(url, args.clients, args.rooms, args.rate, args.duration, args.procs)
+        finally:
+            if server:
+                server.terminate()
+                server.wait()
+        print(f"{workers or '-':>8} {r['connected']:>9} {r['sent_per_s']:>9.0f} "
+              f"{r['throttled_per_s']:>12.0f} {r['delivered_per_s']:>12.0f} "
+              f"{r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -9,7 +9,6 @@ load_dotenv()
 from app import create_app
 from app.extensions import db
 from app.models.user import User, Role
-from app.models.curriculum import Track, Level, Unit, Objective, Skill
 from app.models.gamification import Badge, BadgeCriteria
 from app.models.classroom import Group, GroupStudent, Session, SessionStatus, SessionResource
 from app.models.resource import Resource, ResourceType
@@ -19,70 +18,14 @@ app = create_app(os.environ.get('FLASK_ENV', 'development'))
 
 def seed_curriculum():
     """Import curriculum data from existing data/*.py files."""
-    from data.coding_verse import CODING_VERSE
-    from data.computer_basics import COMPUTER_BASICS
-    from data.digital_safety import DIGITAL_SAFETY
-    from data.data_verse import DATA_VERSE
-
-    tracks = [CODING_VERSE, COMPUTER_BASICS, DIGITAL_SAFETY, DATA_VERSE]
-
-    for t_order, track_data in enumerate(tracks):
-        # Check if track already exists
-        existing = db.session.get(Track, track_data['id'])
-        if existing:
-            print(f'  Track "{track_data["id"]}" already exists, skipping.')
-            continue
-
-        t = Track(
-            id=track_data['id'], name=track_data['name'], name_ar=track_data['name_ar'],
-            icon=track_data['icon'], color=track_data['color'],
-            description_ar=track_data.get('description_ar', track_data.get('description', '')),
-            sort_order=t_order,
-        )
-        db.session.add(t)
-
-        for l_order, level_data in enumerate(track_data['levels']):
-            lvl = Level(
-                id=level_data['id'], track_id=track_data['id'],
-                name=level_data['name'], name_ar=level_data['name_ar'],
-                icon=level_data['icon'], slogan=level_data['slogan'],
-                goal=level_data['goal'], sort_order=l_order,
-            )
-            db.session.add(lvl)
-
-            for u_order, unit_data in enumerate(level_data['units']):
-                project = unit_data.get('project', {})
-                u = Unit(
-                    id=unit_data['id'], level_id=level_data['id'], track_id=track_data['id'],
-                    name=unit_data['name'], name_en=unit_data['name_en'],
-                    description=unit_data['description'],
-                    project_name=project.get('name', ''),
-                    project_description=project.get('description', ''),
-                    sort_order=u_order,
-                )
-                db.session.add(u)
-
-                for o_order, obj_data in enumerate(unit_data.get('objectives', [])):
-                    obj = Objective(
-                        track_id=track_data['id'], level_id=level_data['id'],
-                        unit_id=unit_data['id'],
-                        bloom=obj_data['bloom'], bloom_en=obj_data['bloom_en'],
-                        objective=obj_data['objective'], outcome=obj_data['outcome'],
-                        sort_order=o_order,
-                    )
-                    db.session.add(obj)
-
-                for s_order, skill_name in enumerate(unit_data.get('skills', [])):
-                    skill = Skill(
-                        track_id=track_data['id'], level_id=level_data['id'],
-                        unit_id=unit_data['id'],
-                        name=skill_name, sort_order=s_order,
-                    )
-                    db.session.add(skill)
-
-        print(f'  Seeded track: {track_data["name_ar"]}')
-
+    from app.utils.seeding import seed_curriculum as insert_curriculum
+    rows = insert_curriculum()
     db.session.commit()
+    if rows['tracks']:
+        for t in rows['tracks']:
+            print(f'  Seeded track: {t["name_ar"]}')
+    else:
+        print('  All tracks already exist, skipping.')
 
 
 def seed_admin():
@@ -156,11 +99,19 @@ def seed_demo_users():
         ('parent1@shalaby-verse.com', 'والد أحمد', 'Ahmed\'s Parent', Role.PARENT),
         ('assessor@shalaby-verse.com', 'د. أمل', 'Dr. Amal', Role.ASSESSOR),
     ]
+    existing = {email for (email,) in db.session.query(User.email).filter(
+        User.email.in_([email for email, *_ in demo_users]))}
+    demo_hash = None
     for email, name_ar, name_en, role in demo_users:
-        if User.query.filter_by(email=email).first():
+        if email in existing:
             continue
         u = User(email=email, name_ar=name_ar, name_en=name_en, role=role)
-        u.set_password('demo123')
+        # Demo accounts share one password: hash it once, not once per user
+        if demo_hash is None:
+            u.set_password('demo123')
+            demo_hash = u.password_hash
+        else:
+            u.password_hash = demo_hash
         db.session.add(u)
     db.session.commit()
     print('  Created demo users (password: demo123)')
@@ -259,8 +210,9 @@ def seed_demo_classroom():
 
 def seed_verse_activities():
     """Create 2-3 activities per curriculum unit for the Verses Adventure Map."""
-    from app.models.journey import Activity, ActivityType, ActivitySource, QuestDifficulty
-    from app.models.curriculum import Track, Unit
+    from app.models.journey import Activity
+    from app.utils.curriculum_cache import get_curriculum
+    from app.utils.seeding import seed_unit_activities
 
     # Check if already seeded (look for activities with unit_id set)
     existing = Activity.query.filter(Activity.unit_id.isnot(None)).first()
@@ -268,34 +220,11 @@ def seed_verse_activities():
         print('  Verse activities already exist.')
         return
 
-    activity_templates = [
-        (ActivityType.CODING, 'تمرين برمجي', 'Coding Exercise', 20, 10),
-        (ActivityType.QUIZ, 'اختبار قصير', 'Quick Quiz', 15, 8),
-        (ActivityType.GAME, 'لعبة تفاعلية', 'Interactive Game', 25, 12),
-    ]
-    all_tracks = Track.query.all()
-    sort_order = 100
-    count = 0
-    for t in all_tracks:
-        units = Unit.query.filter_by(track_id=t.id).order_by(Unit.level_id, Unit.sort_order).all()
-        for unit in units:
-            for j, (atype, ar_label, en_label, xp, coins) in enumerate(activity_templates):
-                if j == 2 and hash(unit.id) % 3 == 0:
-                    continue
-                db.session.add(Activity(
-                    title=f'{en_label}: {unit.name_en or unit.name}',
-                    title_ar=f'{ar_label}: {unit.name}',
-                    activity_type=atype,
-                    source=ActivitySource.SELF_PACED,
-                    difficulty=QuestDifficulty.BEGINNER,
-                    xp_reward=xp, coin_reward=coins,
-                    track_id=t.id, level_id=unit.level_id, unit_id=unit.id,
-                    estimated_minutes=10, sort_order=sort_order,
-                ))
-                sort_order += 1
-                count += 1
+    curriculum = get_curriculum()
+    units = [u for t in curriculum.tracks for u in curriculum.units(t.id)]
+    count = seed_unit_activities(units)
     db.session.commit()
-    print(f'  Created {count} verse activities across {len(all_tracks)} tracks.')
+    print(f'  Created {count} verse activities across {len(curriculum.tracks)} tracks.')
 
 
 if __name__ == '__main__':
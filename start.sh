@@ -16,4 +16,8 @@ export HMS_TEMPLATE_ID="${HMS_TEMPLATE_ID:-699560eb6236da36a7d8b3da}"
 echo "[START] DATABASE_URL set=${DATABASE_URL:+yes}"
 echo "[START] FLASK_ENV=$FLASK_ENV"
 
-exec gunicorn --worker-class gevent -w 1 --bind 0.0.0.0:${PORT:-8080} run:app
+# More than one worker needs REDIS_URL (message queue + room state); see docs/scaling.md
+export WEB_CONCURRENCY="${WEB_CONCURRENCY:-1}"
+echo "[START] WEB_CONCURRENCY=$WEB_CONCURRENCY"
+
+exec gunicorn --worker-class gevent -w "$WEB_CONCURRENCY" --bind 0.0.0.0:${PORT:-8080} run:app
@@ -0,0 +1,110 @@
+"""Query budget for the student dashboard (``app.utils.student_dashboard``).
+
+Run with ``python -m unittest discover tests`` (or pytest).
+"""
+import unittest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event
+from app import create_app
+from app.extensions import db
+from app.models.user import User
+from app.models.curriculum import Track, Unit
+from app.models.classroom import Group, GroupStudent, Session, SessionStatus
+from app.models.homework import Homework, HomeworkSubmission
+from app.models.journey import StudentUnitProgress
+from app.utils import curriculum_cache, hud, leaderboard, track_progress
+from app.utils.redis_client import get_redis
+
+STUDENT_EMAIL = 'student1@shalaby-verse.com'  # seeded by app.seed
+STUDENT_PASSWORD = 'demo123'
+# A request with every cache cold: user load (1), HUD (1), one per dashboard
+# section (8: groups, sessions, recent XP, badges, ungraded submissions,
+# homework due, unread notifications, unit progress), curriculum graph and
+# track totals (6) and the leaderboard rebuild plus its top-10 read (6).
+QUERY_BUDGET = 22
+
+
+class StudentDashboardQueryBudgetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.app = create_app('testing')
+        # Seed in a context of its own so the measured requests start cold
+        with self.app.app_context():
+            student = User.query.filter_by(email=STUDENT_EMAIL).one()
+            student.onboarding_completed = True  # skip the onboarding redirect
+            db.session.commit()
+            self.student_id = student.id
+        self.client = self.app.test_client()
+        self.client.post('/login', data={'email': STUDENT_EMAIL, 'password': STUDENT_PASSWORD})
+
+    def clear_caches(self):
+        """Drop the HUD snapshot, the leaderboards, the curriculum graph and its count index."""
+        with self.app.app_context():
+            get_redis().delete(hud._key(self.student_id), leaderboard.BUILT_KEY)
+        curriculum_cache._state['graph'] = None
+        track_progress._index['built_at'] = 0.0
+
+    def render_dashboard(self):
+        """Return the number of queries one /student/ request makes with nothing cached."""
+        self.clear_caches()
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            self.assertEqual(self.client.get('/student/').status_code, 200)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        return len(statements)
+
+    def add_more_of_everything(self, n=5):
+        """Give the student ``n`` more groups (one per track), sessions, homework and unit progress."""
+        with self.app.app_context():
+            self._add_more_of_everything(n)
+
+    def _add_more_of_everything(self, n):
+        teacher_id = Group.query.first().teacher_id or self.student_id
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        tracks = Track.query.order_by(Track.sort_order).all()
+        for i in range(n):
+            track = tracks[i % len(tracks)]
+            group = Group(name=f'Budget group {i}', track_id=track.id, teacher_id=teacher_id)
+            db.session.add(group)
+            db.session.flush()
+            db.session.add(GroupStudent(group_id=group.id, student_id=self.student_id))
+            db.session.add(Session(group_id=group.id, teacher_id=teacher_id, title=f'Budget {i}',
+                                   scheduled_at=now + timedelta(days=i + 1),
+                                   status=SessionStatus.SCHEDULED))
+            for j in range(3):
+                homework = Homework(group_id=group.id, teacher_id=teacher_id,
+                                    title=f'Budget homework {i}.{j}',
+                                    due_date=now + timedelta(days=j + 1))
+                db.session.add(homework)
+                db.session.flush()
+                if j == 0:
+                    db.session.add(HomeworkSubmission(homework_id=homework.id,
+                                                      student_id=self.student_id, content='x'))
+            for unit in Unit.query.filter_by(track_id=track.id).limit(3):
+                if not StudentUnitProgress.query.filter_by(
+                        student_id=self.student_id, track_id=unit.track_id,
+                        level_id=unit.level_id, unit_id=unit.id).first():
+                    db.session.add(StudentUnitProgress(
+                        student_id=self.student_id, track_id=unit.track_id,
+                        level_id=unit.level_id, unit_id=unit.id, status='completed'))
+        db.session.commit()
+
+    def test_dashboard_within_query_budget(self):
+        self.assertLessEqual(self.render_dashboard(), QUERY_BUDGET)
+
+    def test_query_count_does_not_grow_with_student_data(self):
+        before = self.render_dashboard()
+        self.add_more_of_everything()
+        self.assertEqual(self.render_dashboard(), before)
+
+
+if __name__ == '__main__':
+    unittest.main()